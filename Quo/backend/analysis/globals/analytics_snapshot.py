@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+
+import database_async
+from analysis.transactionAnalysis import panels
+from .users import User
+from .transaction_sync import sync_user_data
+from .single_flight import SingleFlight
+
+# Precomputed per-user analytics snapshot
+# After every sync the default dashboard panels are built once in the background and stored in SQLite,
+# the endpoints serve them from there instead of recomputing everything on each page load
+
+# Bump whenever the shape of a stored panel changes, older snapshots are then ignored and rebuilt
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# Snapshots older than this (seconds) are still served but flagged stale and refreshed in the background
+SNAPSHOT_MAX_AGE = int(os.getenv("ANALYTICS_SNAPSHOT_MAX_AGE", "900"))
+
+# Panels in the snapshot, all computed with the default endpoint parameters on the filtered user
+# (transfers and loans removed). Requests with other parameters are computed on demand
+SNAPSHOT_PANELS = {
+    "spendingByCategory": panels.spending_by_category,
+    "enhancedSpendingByCategory": panels.enhanced_spending_by_category,
+    "groupedSpendingByPeriod:month": partial(panels.grouped_spending_by_period, period="month"),
+    "groupedSpendingByPeriod:year": partial(panels.grouped_spending_by_period, period="year"),
+    "groupedSpendingByPeriod:all": partial(panels.grouped_spending_by_period, period="all"),
+    "trends": partial(panels.spending_trends, months=6),
+    "savingsOpportunities": panels.savings_opportunities,
+    # Every payment is stored, the endpoint applies its limit
+    "recentPayments": partial(panels.recent_payments, limit=None)
+}
+
+# One build / refresh per user at a time
+snapshot_flight = SingleFlight("analytics_snapshot")
+
+# Strong references to the background tasks so they aren't garbage collected mid-run
+_background_tasks = set()
+
+# Users whose decoded snapshot is kept in memory (least recently used dropped first)
+SNAPSHOT_DECODED_MAX_ENTRIES = int(os.getenv("ANALYTICS_SNAPSHOT_DECODED_MAX_ENTRIES", "256"))
+
+# Decoded snapshot data per user, reused while the stored version doesn't change
+_decoded = OrderedDict()  # basiq_user_id -> (version, data)
+
+
+def snapshot_month(now: datetime = None) -> str:
+    # The month/year panels depend on the current date, a snapshot from another month is unusable
+    return (now or datetime.now()).strftime("%Y-%m")
+
+
+async def build_snapshot(basiq_user_id: str) -> dict:
+    # Computes every snapshot panel for the user and stores them as a new snapshot version
+    try:
+        # acreate syncs first, so the snapshot covers everything synced up to built_at
+        # (a sync finishing mid-build is newer than built_at and marks it stale again)
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
+        built_at = time.time()
+
+        snapshot_panels = {}
+        for name, compute in SNAPSHOT_PANELS.items():
+            try:
+                # CPU work, kept off the event loop so requests aren't held up by the build
+                snapshot_panels[name] = await asyncio.to_thread(compute, user)
+            except Exception as e:
+                print("Operation failed")
+
+        data = {"month": snapshot_month(), "panels": snapshot_panels}
+        encoded = await asyncio.to_thread(json.dumps, data, default=str)
+        result = await database_async.save_analytics_snapshot(
+            basiq_user_id, SNAPSHOT_SCHEMA_VERSION, built_at, encoded
+        )
+        if "error" in result:
+            print(f"Snapshot save error: {result['error']}")
+            return {"built": False, "error": result["error"]}
+
+        print(f"Built analytics snapshot v{result['version']} ({len(snapshot_panels)} panels)")
+        return {"built": True, "version": result["version"], "panels": len(snapshot_panels)}
+
+    except Exception as e:
+        print("Operation failed")
+        return {"built": False, "error": str(e)}
+
+
+async def refresh_snapshot(basiq_user_id: str) -> dict:
+    # Syncs the user, a successful sync rebuilds the snapshot through the sync listener,
+    # otherwise (nothing new / Basiq unavailable) it is rebuilt from the stored rows
+    result = await sync_user_data(basiq_user_id)
+    if result.get("synced"):
+        return result
+    return await snapshot_flight.do(("build", basiq_user_id), build_snapshot, basiq_user_id)
+
+
+def _run_in_background(key: tuple, fn, basiq_user_id: str):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # No event loop (scripts), the next request builds the snapshot instead
+        return
+
+    task = loop.create_task(snapshot_flight.do(key, fn, basiq_user_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def schedule_snapshot(basiq_user_id: str):
+    # Sync listener, rebuilds the snapshot without blocking the caller
+    _run_in_background(("build", basiq_user_id), build_snapshot, basiq_user_id)
+
+
+def schedule_refresh(basiq_user_id: str):
+    _run_in_background(("refresh", basiq_user_id), refresh_snapshot, basiq_user_id)
+
+
+async def load_snapshot(basiq_user_id: str):
+    # Stored snapshot with its decoded data, None if missing or built for another schema/month
+    result = await database_async.get_analytics_snapshot(basiq_user_id)
+    if "error" in result:
+        print(f"Snapshot load error: {result['error']}")
+        return None
+
+    snapshot = result["snapshot"]
+    if snapshot is None or snapshot["schema_version"] != SNAPSHOT_SCHEMA_VERSION:
+        return None
+
+    cached = _decoded.get(basiq_user_id)
+    if cached and cached[0] == snapshot["version"]:
+        data = cached[1]
+        _decoded.move_to_end(basiq_user_id)
+    else:
+        data = json.loads(snapshot["data"])
+        _decoded[basiq_user_id] = (snapshot["version"], data)
+        _decoded.move_to_end(basiq_user_id)
+        if len(_decoded) > SNAPSHOT_DECODED_MAX_ENTRIES:
+            _decoded.popitem(last=False)
+
+    if data.get("month") != snapshot_month():
+        return None
+
+    return {
+        "version": snapshot["version"],
+        "built_at": snapshot["built_at"],
+        "panels": data["panels"]
+    }
+
+
+async def is_stale(basiq_user_id: str, built_at: float) -> bool:
+    # Stale once it is older than SNAPSHOT_MAX_AGE or a sync happened after it was built
+    if time.time() - built_at > SNAPSHOT_MAX_AGE:
+        return True
+
+    state = await database_async.get_sync_state(basiq_user_id)
+    if "error" in state or not state.get("last_synced_at"):
+        # Never synced (or the connection was re-saved), the stored rows are about to change
+        return True
+
+    return state["last_synced_at"] > built_at
+
+
+async def get_snapshot_panel(basiq_user_id: str, panel: str):
+    # Snapshot copy of a panel plus its staleness info, None when the caller has to compute it
+    # Missing snapshots are built in the background, stale ones are served and refreshed
+    snapshot = await load_snapshot(basiq_user_id)
+    if snapshot is None:
+        schedule_snapshot(basiq_user_id)
+        return None
+
+    if panel not in snapshot["panels"]:
+        return None
+
+    stale = await is_stale(basiq_user_id, snapshot["built_at"])
+    if stale:
+        schedule_refresh(basiq_user_id)
+
+    return {
+        "data": snapshot["panels"][panel],
+        "meta": {
+            "from_snapshot": True,
+            "version": snapshot["version"],
+            "built_at": snapshot["built_at"],
+            "age_seconds": round(time.time() - snapshot["built_at"], 1),
+            "stale": stale
+        }
+    }
+
+
+def on_demand_meta() -> dict:
+    # Snapshot info attached to responses computed per request
+    return {"from_snapshot": False}
@@ -0,0 +1,124 @@
+from .basiq_token import aget_server_token
+from .basiq_transport import async_basiq_transport
+from .basiq_manager import parse_transactions, parse_accounts, transaction_query, DEFAULT_PAGE_SIZE, DEFAULT_MAX_PAGES
+
+class AsyncBasiqAPI:
+    # Async counterpart of BasiqAPI (basiq_manager.py) built on httpx.AsyncClient
+    # Same methods and return shapes, but every call is awaited so the endpoints never block the event loop
+    def __init__(self, api_key: str, User=None, user_id: str = None):
+        self.api_key = api_key
+        self.user = User
+        # Endpoints that only know the Basiq user id can pass it directly
+        self.user_id = user_id or (User.user_id if User else None)
+
+    async def getToken(self) -> str:
+        # Shared SERVER_ACCESS token (see basiq_token.py)
+        try:
+            return await aget_server_token()
+        except Exception as e:
+            print("Operation failed")
+
+    async def iter_transaction_pages(self, page_size: int = DEFAULT_PAGE_SIZE, from_date=None, to_date=None,
+                                     account_id: str = None, max_pages: int = DEFAULT_MAX_PAGES):
+        # Async generator over raw transaction pages, follows links.next (see BasiqAPI.iter_transaction_pages)
+        auth_token = await self.getToken()
+        if not auth_token:
+            print("Error when obtaining Auth Token (Getting Transaction Data)")
+            raise Exception("Failed to get Basiq server token")
+
+        url = f"/users/{self.user_id}/transactions"
+        params = transaction_query(page_size, from_date, to_date, account_id)
+        pages = 0
+
+        while url and (max_pages is None or pages < max_pages):
+            response = await async_basiq_transport.get(url, token=auth_token, params=params)
+            if response.status_code != 200:
+                # Raise instead of stopping quietly so callers never mistake a failed fetch for the last page
+                print(f"Error: {response.status_code}, {response.text}")
+                raise Exception(f"Failed to fetch transactions: {response.status_code}")
+
+            data = response.json()
+            pages += 1
+            yield data.get('data', [])
+
+            next_url = data.get('links', {}).get('next')
+            url = next_url if next_url != url else None
+            params = None
+
+        if url:
+            # Budget used up with pages left, callers that need the full range pass max_pages=None
+            print(f"Transaction paging stopped after {pages} pages (max_pages), older transactions were not fetched")
+
+    async def getTransactionData(self, filter_transfer: bool, filter_loans: bool, **page_options) -> list:
+        auth_token = await self.getToken()
+        if not auth_token:
+            print("Error when obtaining Auth Token (Getting Transaction Data)")
+            return
+
+        try:
+            current_data = []
+            async for page in self.iter_transaction_pages(**page_options):
+                current_data.extend(parse_transactions(page, filter_transfer, filter_loans))
+            return current_data
+        except Exception as e:
+            print("Operation failed")
+            return None
+
+    async def get_accounts(self) -> list:
+        raw_accounts = await self.get_raw_accounts()
+        if raw_accounts is None:
+            return None
+        return parse_accounts(raw_accounts)
+
+    async def get_raw_accounts(self) -> list:
+        # Unparsed account objects, used by the transaction sync to store the full account details
+        auth_token = await self.getToken()
+        if not auth_token:
+            print("Error when obtaining Auth Token (Grabbing Accounts)")
+            return
+
+        try:
+            response = await async_basiq_transport.get(f"/users/{self.user_id}/accounts", token=auth_token)
+            accounts = []
+            if response.status_code == 200:
+                data = response.json()
+                accounts = data['data']
+            return accounts
+
+        except Exception as e:
+            print("Operation failed")
+
+    async def get_single_account(self, account_id: str) -> dict:
+        auth_token = await self.getToken()
+        if not auth_token:
+            print("Error when obtaining Auth Token (Grabbing Accounts)")
+            return
+
+        try:
+            response = await async_basiq_transport.get(
+                f"/users/{self.user_id}/accounts/{account_id}",
+                token=auth_token
+            )
+            if response.status_code == 200:
+                return response.json()
+
+            return None
+        except Exception as e:
+            print(f"Failed getting accounts in Manager Globals")
+
+    async def create_account(self, user_personal_data: dict) -> dict:
+        # Creates a Basiq user, returns the created user or None
+        auth_token = await self.getToken()
+        if not auth_token:
+            print("Error when obtaining Auth Token (Creating Account)")
+            return
+
+        try:
+            response = await async_basiq_transport.post("/users", token=auth_token, json=user_personal_data)
+            if response.status_code == 201:
+                return response.json()
+
+            print(f"Error: {response.status_code}, {response.text}")
+            return None
+        except Exception as e:
+            print("Operation failed")
@@ -1,31 +1,30 @@
-import requests
 import json
 import os
+from .basiq_token import get_server_token
+from .basiq_transport import basiq_transport
+from .normalizer import normalize_transaction, amount_direction
+
+# Transaction paging, Basiq allows up to 500 per page
+DEFAULT_PAGE_SIZE = int(os.getenv("BASIQ_PAGE_SIZE", "500"))
+# Upper bound on pages per fetch so a runaway cursor can't loop forever
+DEFAULT_MAX_PAGES = int(os.getenv("BASIQ_MAX_TRANSACTION_PAGES", "40"))
 
 class BasiqAPI:
     # Class that incorporates most of the Basiq API requests
     def __init__(self, api_key: str, User):
         self.api_key = api_key
         self.user = User
-        self.auth_token = self.getToken()
+
+    @property
+    def auth_token(self) -> str:
+        # Token comes from the shared provider so creating a BasiqAPI is free
+        return self.getToken()
         
     def getToken(self) -> str:
         # Retrieves the token needed to be used for other API requests (VITAL)
-        url = "https://au-api.basiq.io/token"
-
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/x-www-form-urlencoded",
-            "Authorization": f"Basic {self.api_key}",
-            "basiq-version": "3.0"
-        }
-
+        # Cached per process, see basiq_token.py
         try:
-            response = requests.post(url, headers=headers)
-            response = json.loads(response.text)
-            Access_Token = response['access_token']
-            
-            return Access_Token
+            return get_server_token()
         except Exception as e:
             print("Operation failed") 
 
@@ -42,7 +41,7 @@ class BasiqAPI:
         
         url = f"https://au-api.basiq.io/users/{self.user.user_id}/identities"
         try:
-            response = requests.get(url, headers)
+            response = basiq_transport.get(url, headers=headers)
             
             identities = []
             if response.status_code == 200:
@@ -55,71 +54,53 @@ class BasiqAPI:
         except Exception as e:
             print("Operation failed")
         
-    def getTransactionData(self, filter_transfer: bool, filter_loans: bool) -> dict:
+    def iter_transaction_pages(self, page_size: int = DEFAULT_PAGE_SIZE, from_date=None, to_date=None,
+                               account_id: str = None, max_pages: int = DEFAULT_MAX_PAGES):
+        # Generator over raw transaction pages, follows Basiq's links.next cursor
+        # Date range and account are pushed to the API as a filter so only the needed rows come back
+        auth_token = self.auth_token
+        if not auth_token:
+            print("Error when obtaining Auth Token (Getting Transaction Data)")
+            raise Exception("Failed to get Basiq server token")
+
+        url = f"/users/{self.user.user_id}/transactions"
+        params = transaction_query(page_size, from_date, to_date, account_id)
+        pages = 0
+
+        while url and (max_pages is None or pages < max_pages):
+            response = basiq_transport.get(url, token=auth_token, params=params)
+            if response.status_code != 200:
+                # Raise instead of stopping quietly so callers never mistake a failed fetch for the last page
+                print(f"Error: {response.status_code}, {response.text}")
+                raise Exception(f"Failed to fetch transactions: {response.status_code}")
+
+            data = response.json()
+            pages += 1
+            yield data.get('data', [])
+
+            # links.next already carries the query, so params are only sent on the first page
+            next_url = data.get('links', {}).get('next')
+            url = next_url if next_url != url else None
+            params = None
+
+        if url:
+            # Budget used up with pages left, callers that need the full range pass max_pages=None
+            print(f"Transaction paging stopped after {pages} pages (max_pages), older transactions were not fetched")
+
+    def getTransactionData(self, filter_transfer: bool, filter_loans: bool, **page_options) -> dict:
         # The most important function in retrieving user transactions.
         # This sorts each individual transaction by their description, category, date, amount, and its mode of payment
-        current_data = []
-        
-        def insert_transaction():
-            transaction_id = i.get('id')
-            description = i.get('description', 'No Description')
-            type = i.get('type')
-            post_date = i.get('postDate', 'No Date')
-            sub_class = i.get('subClass')
-            transaction_amount = i.get('amount')
-
-            if sub_class:
-                category = sub_class.get('title', 'No Category')
-            else:
-                category = 'No Category'
-
-            data_payload = {
-                'id' : transaction_id,
-                'description': description,
-                'type': type,
-                'category': category,
-                'date': post_date,
-                'amount': abs(float(transaction_amount)),
-                'mode': mode
-                }
-            
-            current_data.append(data_payload)
-        
+        # page_options are passed to iter_transaction_pages (page_size, from_date, to_date, account_id, max_pages)
         if not self.auth_token:
             print("Error when obtaining Auth Token (Getting Transaction Data)")
             return
                 
-        headers = {
-        "accept": "application/json",
-        "authorization": f"Bearer {self.auth_token}"
-        }
-        # We can remove the limit or increase it to our liking depending on how many transactions you want
-        url = f"https://au-api.basiq.io/users/{self.user.user_id}/transactions?limit=500"
         try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                
-                for i in data['data']:
-                    mode = i.get('class')
-                    
-                    if mode == "transfer":
-                        if filter_transfer:
-                            continue
-                        insert_transaction()
-                        
-                    if mode == "loan-interest" or mode == "loan-repayment":
-                        if filter_loans:
-                            continue
-                        insert_transaction()
-                        
-                    insert_transaction()
-                    
-                   
-                return current_data
-            else:
-                print(f"Error: {response.status_code}, {response.text}")
-                return None
+            current_data = []
+            # Each page is parsed as soon as it arrives
+            for page in self.iter_transaction_pages(**page_options):
+                current_data.extend(parse_transactions(page, filter_transfer, filter_loans))
+            return current_data
         except Exception as e:
             print("Operation failed")
             return None
@@ -139,19 +120,11 @@ class BasiqAPI:
         }
         
         try:
-            response = requests.get(url, headers=headers)
+            response = basiq_transport.get(url, headers=headers)
             accounts = []
             if response.status_code == 200:
                 data = response.json()
-                # The only data we get from the account is its num, name, balance and institution (ANZ, ETC)
-                for account in data['data']:
-                    #print(account)
-                    account = {
-                        "accountNum": account['accountNo'],
-                        "accountName": account['name'],
-                        "balance": account['balance'],
-                        "institution": account['institution']
-                    } 
+                accounts = parse_accounts(data['data'])
             return accounts
 
         except Exception as e:
@@ -170,14 +143,11 @@ class BasiqAPI:
         }
         
         try:
-            response = requests.get(url, headers=headers)
-            accounts = []
+            response = basiq_transport.get(url, headers=headers)
             if response.status_code == 200:
-                data = response.json()
-                # The only data we get from the account is its num, name, balance and institution (ANZ, ETC)
-                # print(data)
+                return response.json()
             
-            return accounts
+            return None
         except Exception as e:
             print(f"Failed getting accounts in Manager Globals")
             
@@ -194,7 +164,94 @@ class BasiqAPI:
             "authorization": f"Bearer {self.auth_token}"
             }
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = basiq_transport.post(url, json=payload, headers=headers)
+            if response.status_code == 201:
+                return response.json()
+            
+            print(f"Error: {response.status_code}, {response.text}")
+            return None
             
         except Exception as e:
             print("Operation failed")
+
+
+# Shared by BasiqAPI and AsyncBasiqAPI so both clients return the same shapes
+
+def transaction_query(page_size: int = DEFAULT_PAGE_SIZE, from_date=None, to_date=None, account_id: str = None) -> dict:
+    # Query params for the first page of /users/{id}/transactions
+    params = {"limit": page_size}
+    transaction_filter = build_transaction_filter(from_date, to_date, account_id)
+    if transaction_filter:
+        params["filter"] = transaction_filter
+    return params
+
+def build_transaction_filter(from_date=None, to_date=None, account_id: str = None) -> str:
+    # Basiq filter syntax, e.g. account.id.eq('x'),transaction.postDate.bt('2024-01-01','2024-02-01')
+    filters = []
+    if account_id:
+        filters.append(f"account.id.eq('{account_id}')")
+
+    start = format_filter_date(from_date)
+    end = format_filter_date(to_date)
+    if start and end:
+        filters.append(f"transaction.postDate.bt('{start}','{end}')")
+    elif start:
+        filters.append(f"transaction.postDate.gteq('{start}')")
+    elif end:
+        filters.append(f"transaction.postDate.lteq('{end}')")
+
+    return ",".join(filters)
+
+def format_filter_date(value) -> str:
+    # Accepts datetime/date objects or ISO strings
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value[:10]
+    return value.strftime('%Y-%m-%d')
+
+def parse_transactions(raw_transactions: list, filter_transfer: bool, filter_loans: bool) -> list:
+    # Turns raw Basiq transactions into the payload User.fetch_transactions expects
+    current_data = []
+    
+    for i in raw_transactions:
+        mode = i.get('class')
+        
+        if mode == "transfer" and filter_transfer:
+            continue
+            
+        if (mode == "loan-interest" or mode == "loan-repayment") and filter_loans:
+            continue
+            
+        current_data.append(parse_transaction(i))
+    
+    return current_data
+
+def parse_transaction(i: dict) -> dict:
+    # Payload shape used by User.build_transactions, built from the shared normalized record
+    record = normalize_transaction(i)
+
+    return {
+        'id' : record['id'],
+        'description': record['description'],
+        'type': record['type'],
+        'category': record['category'],
+        'date': record['post_date'] or record['transaction_date'] or 'No Date',
+        'amount': abs(record['amount']),
+        'mode': record['class'],
+        'account_id': record['account_id'],
+        'direction': amount_direction(record['amount'])
+        }
+
+def parse_accounts(raw_accounts: list) -> list:
+    # The only data we get from the account is its num, name, balance and institution (ANZ, ETC)
+    accounts = []
+    for account in raw_accounts:
+        accounts.append({
+            "id": account.get('id'),
+            "accountNum": account.get('accountNo'),
+            "accountName": account.get('name') or '',
+            "balance": account.get('balance', 0),
+            "institution": account.get('institution')
+        })
+    return accounts
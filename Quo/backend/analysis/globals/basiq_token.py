@@ -0,0 +1,157 @@
+import asyncio
+import os
+import threading
+import time
+
+from .basiq_transport import basiq_transport, async_basiq_transport
+
+# Shared SERVER_ACCESS token for the whole process
+# Before this every endpoint and every BasiqAPI instance posted to /token on its own,
+# now one token is kept for its expires_in lifetime and refreshed shortly before it runs out
+
+TOKEN_URL = "/token"
+
+# Refresh this many seconds before Basiq says the token expires
+REFRESH_MARGIN = int(os.getenv("BASIQ_TOKEN_REFRESH_MARGIN", "300"))
+
+# Never hand out a token that has less than this many seconds left
+EXPIRY_SKEW = 30
+
+
+class BasiqTokenProvider:
+    # Caches one SERVER_ACCESS token and refreshes it in the background
+    # Concurrent callers that find the token missing/expired wait on the same refresh
+
+    def __init__(self, refresh_margin: int = REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+        self._async_lock = None
+        self.refresh_count = 0
+
+    def _is_valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expires_at - EXPIRY_SKEW
+
+    def get_token(self) -> str:
+        # Fast path, no lock needed to read a valid token
+        if self._is_valid():
+            return self._token
+
+        with self._lock:
+            # Someone else may have refreshed while we were waiting on the lock
+            if self._is_valid():
+                return self._token
+            return self._refresh_locked()
+
+    async def aget_token(self) -> str:
+        # Async version for the endpoints, waits on the refresh without blocking the event loop
+        if self._is_valid():
+            return self._token
+
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+
+        async with self._async_lock:
+            if self._is_valid():
+                return self._token
+            return await self._arefresh()
+
+    def refresh(self) -> str:
+        # Forces a new token (used by the background timer)
+        with self._lock:
+            return self._refresh_locked()
+
+    def invalidate(self):
+        # Drop the cached token, e.g. after Basiq rejects it with a 401
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def _refresh_locked(self) -> str:
+        basiq_api_key = os.getenv("BASIQ_API_KEY")
+        if not basiq_api_key:
+            raise Exception("Basiq API key not configured")
+
+        response = basiq_transport.post(
+            TOKEN_URL,
+            headers={
+                "content-type": "application/x-www-form-urlencoded",
+                "Authorization": f"Basic {basiq_api_key}"
+            },
+            data={"scope": "SERVER_ACCESS"}
+        )
+
+        if response.status_code != 200:
+            print(f"❌ Server token error: {response.status_code}")
+            raise Exception("Failed to get Basiq server token")
+
+        token_data = response.json()
+        self._store(token_data["access_token"], int(token_data.get("expires_in", 3600)))
+        return self._token
+
+    async def _arefresh(self) -> str:
+        basiq_api_key = os.getenv("BASIQ_API_KEY")
+        if not basiq_api_key:
+            raise Exception("Basiq API key not configured")
+
+        response = await async_basiq_transport.post(
+            TOKEN_URL,
+            headers={
+                "content-type": "application/x-www-form-urlencoded",
+                "Authorization": f"Basic {basiq_api_key}"
+            },
+            data={"scope": "SERVER_ACCESS"}
+        )
+
+        if response.status_code != 200:
+            print(f"❌ Server token error: {response.status_code}")
+            raise Exception("Failed to get Basiq server token")
+
+        token_data = response.json()
+        with self._lock:
+            self._store(token_data["access_token"], int(token_data.get("expires_in", 3600)))
+        return self._token
+
+    def _store(self, token: str, expires_in: int):
+        self._token = token
+        self._expires_at = time.monotonic() + expires_in
+        self.refresh_count += 1
+        self._schedule_refresh(expires_in)
+
+    def _schedule_refresh(self, expires_in: int):
+        # Refresh ahead of expiry so requests never wait on the token round trip
+        if self._timer:
+            self._timer.cancel()
+
+        delay = max(expires_in - self.refresh_margin, EXPIRY_SKEW)
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep the old token until it expires, the next caller will retry
+            print("Background token refresh failed")
+
+    def stats(self) -> dict:
+        return {
+            "has_token": self._token is not None,
+            "seconds_left": max(0, round(self._expires_at - time.monotonic())) if self._token else 0,
+            "refresh_count": self.refresh_count
+        }
+
+
+# One provider per process
+token_provider = BasiqTokenProvider()
+
+
+def get_server_token() -> str:
+    return token_provider.get_token()
+
+
+async def aget_server_token() -> str:
+    return await token_provider.aget_token()
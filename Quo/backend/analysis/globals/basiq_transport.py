@@ -0,0 +1,138 @@
+import os
+import threading
+
+import httpx
+
+# Single pooled HTTP layer for all Basiq traffic
+# Bare requests.get/post opened a new TCP + TLS connection to au-api.basiq.io on every call,
+# this keeps connections alive and reuses them across requests
+
+BASIQ_BASE_URL = "https://au-api.basiq.io"
+
+# Pool settings (can be tuned per deployment through env vars)
+POOL_SIZE = int(os.getenv("BASIQ_POOL_SIZE", "20"))
+KEEPALIVE_CONNECTIONS = int(os.getenv("BASIQ_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("BASIQ_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("BASIQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("BASIQ_READ_TIMEOUT", "30"))
+
+
+def http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    try:
+        import h2
+        return True
+    except ImportError:
+        return False
+
+
+class BasiqTransport:
+    # Owns one pooled httpx.Client, created on first use
+    # httpx pools per host so every Basiq call shares the same keep-alive connections
+
+    def __init__(self, pool_size: int = POOL_SIZE, keepalive_connections: int = KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = KEEPALIVE_EXPIRY, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, http2: bool = None):
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http2 = http2_available() if http2 is None else http2
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        base_url=BASIQ_BASE_URL,
+                        limits=self.limits,
+                        timeout=self.timeout,
+                        http2=self.http2,
+                        headers={"accept": "application/json", "basiq-version": "3.0"}
+                    )
+        return self._client
+
+    def request(self, method: str, url: str, token: str = None, headers: dict = None, **kwargs) -> httpx.Response:
+        # url can be a path ("/users/...") or a full Basiq url (e.g. links.next)
+        request_headers = dict(headers or {})
+        if token:
+            request_headers["authorization"] = f"Bearer {token}"
+
+        return self.client.request(method, url, headers=request_headers, **kwargs)
+
+    def get(self, url: str, token: str = None, **kwargs) -> httpx.Response:
+        return self.request("GET", url, token=token, **kwargs)
+
+    def post(self, url: str, token: str = None, **kwargs) -> httpx.Response:
+        return self.request("POST", url, token=token, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+# One transport per process
+basiq_transport = BasiqTransport()
+
+
+# Async side, used by the FastAPI endpoints so a slow Basiq response doesn't block the event loop
+ASYNC_POOL_SIZE = int(os.getenv("BASIQ_ASYNC_POOL_SIZE", "200"))
+ASYNC_KEEPALIVE_CONNECTIONS = int(os.getenv("BASIQ_ASYNC_KEEPALIVE_CONNECTIONS", "50"))
+
+
+class AsyncBasiqTransport:
+    # Same as BasiqTransport but on httpx.AsyncClient
+    # The pool is sized for hundreds of in-flight calls per worker
+
+    def __init__(self, pool_size: int = ASYNC_POOL_SIZE, keepalive_connections: int = ASYNC_KEEPALIVE_CONNECTIONS,
+                 keepalive_expiry: float = KEEPALIVE_EXPIRY, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, http2: bool = None):
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http2 = http2_available() if http2 is None else http2
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=BASIQ_BASE_URL,
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                headers={"accept": "application/json", "basiq-version": "3.0"}
+            )
+        return self._client
+
+    async def request(self, method: str, url: str, token: str = None, headers: dict = None, **kwargs) -> httpx.Response:
+        request_headers = dict(headers or {})
+        if token:
+            request_headers["authorization"] = f"Bearer {token}"
+
+        return await self.client.request(method, url, headers=request_headers, **kwargs)
+
+    async def get(self, url: str, token: str = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, token=token, **kwargs)
+
+    async def post(self, url: str, token: str = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, token=token, **kwargs)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async_basiq_transport = AsyncBasiqTransport()
@@ -0,0 +1,71 @@
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+# Shared tokenizer for transaction descriptions
+# EnhancedTransactionAnalysis (keywords) and SubscriptionDetector (merchant key) both tokenize the same
+# descriptions over and over. Patterns are compiled once and both results come out of one cached call
+# per raw description, merchant descriptions repeat a lot so nearly every call is a cache hit
+
+# Distinct descriptions kept
+DESCRIPTION_CACHE_SIZE = int(os.getenv("DESCRIPTION_CACHE_SIZE", "65536"))
+
+# Words that never make a useful keyword
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during',
+    'before', 'after', 'above', 'below', 'between', 'under', 'pty', 'ltd',
+    'inc', 'corp', 'co', 'payment', 'transfer', 'purchase', 'transaction'
+})
+
+_SPECIAL_CHARS = re.compile(r'[^\w\s]')
+
+# Transaction codes dropped from the merchant key, applied in this order
+_LONG_NUMBERS = re.compile(r'\b\d{4,}\b')  # long numbers
+_REFERENCE_NUMBERS = re.compile(r'#\d+')  # reference numbers
+_MASKED_NUMBERS = re.compile(r'\*\d+')  # masked numbers
+
+
+class DescriptionTokens(NamedTuple):
+    keywords: tuple  # meaningful words, stop words / short words / numbers removed
+    merchant_key: str  # first 3 words of 3+ letters once transaction codes are removed
+
+
+@lru_cache(maxsize=DESCRIPTION_CACHE_SIZE)
+def tokenize(description: str) -> DescriptionTokens:
+    lowered = description.lower()
+
+    keywords = tuple(
+        word for word in _SPECIAL_CHARS.sub(' ', lowered).split()
+        if word not in STOP_WORDS
+        and len(word) > 2
+        and not word.isdigit()
+    )
+
+    stripped = _LONG_NUMBERS.sub('', lowered)
+    stripped = _REFERENCE_NUMBERS.sub('', stripped)
+    stripped = _MASKED_NUMBERS.sub('', stripped)
+    merchant_key = ' '.join([word for word in _SPECIAL_CHARS.sub(' ', stripped).split() if len(word) > 2][:3])
+
+    return DescriptionTokens(keywords, merchant_key)
+
+
+def extract_keywords(description: str) -> list:
+    return list(tokenize(description).keywords)
+
+
+def merchant_key(description: str) -> str:
+    return tokenize(description).merchant_key
+
+
+def cache_stats() -> dict:
+    info = tokenize.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0
+    }
@@ -0,0 +1,160 @@
+import numpy as np
+
+# Sparse keyword co-occurrence
+# Keywords are interned to integer ids and every basket (e.g. a day of transactions) becomes a row of
+# a one-hot basket x keyword incidence matrix, stored as sorted (basket, keyword) cells. Pairs are
+# counted as integer codes with numpy, each unordered pair is stored once and rare keywords/pairs
+# can be pruned before anything is expanded into dicts
+
+# Pending pair codes are reduced (np.unique) whenever this many pile up, bounds peak memory
+PAIR_CHUNK = 1_000_000
+
+
+def _reduce(codes: list, counts: list) -> tuple:
+    # Sums the counts of equal pair codes
+    codes = np.concatenate(codes)
+    counts = np.concatenate(counts)
+    unique, inverse = np.unique(codes, return_inverse=True)
+    return unique, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+class KeywordCooccurrence:
+    # keywords: id -> keyword, first < second are keyword ids, counts the number of baskets
+    # both keywords appear in, support the number of baskets each keyword appears in
+
+    def __init__(self, keywords: list, first: np.ndarray, second: np.ndarray,
+                 counts: np.ndarray, support: np.ndarray):
+        self.keywords = keywords
+        self.first = first
+        self.second = second
+        self.counts = counts
+        self.support = support
+
+    @classmethod
+    def build(cls, items, tokenize, min_support: int = 1) -> "KeywordCooccurrence":
+        # items: (basket key, text) pairs, tokenize: text -> keywords
+        # min_support drops keywords and pairs seen in fewer baskets than that
+        vocabulary = {}  # keyword -> id
+        text_ids = {}  # text -> keyword ids, descriptions repeat a lot
+        basket_codes = {}
+        rows = []
+        cols = []
+
+        for basket, text in items:
+            ids = text_ids.get(text)
+            if ids is None:
+                ids = [vocabulary.setdefault(keyword, len(vocabulary))
+                       for keyword in dict.fromkeys(tokenize(text))]
+                text_ids[text] = ids
+            if ids:
+                code = basket_codes.setdefault(basket, len(basket_codes))
+                rows.extend([code] * len(ids))
+                cols.extend(ids)
+
+        keywords = list(vocabulary)
+        size = len(keywords)
+        if not size:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(keywords, empty, empty, empty, np.zeros(0, dtype=np.int64))
+
+        # Incidence cells, one per (basket, keyword), sorted basket-major
+        cells = np.unique(np.asarray(rows, dtype=np.int64) * size + np.asarray(cols, dtype=np.int64))
+        rows = cells // size
+        cols = cells % size
+
+        support = np.bincount(cols, minlength=size)
+        if min_support > 1:
+            # A pair can't be seen in more baskets than either of its keywords
+            keep = support[cols] >= min_support
+            rows = rows[keep]
+            cols = cols[keep]
+
+        # Every basket's keyword ids are ascending, its i < j cells give each pair once as a < b
+        bounds = np.flatnonzero(np.diff(rows)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(rows)]))
+
+        triangles = {}  # basket size -> upper triangle indices
+        pending, pending_counts, pending_size = [], [], 0
+        reduced, reduced_counts = [], []
+
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            n = end - start
+            if n < 2:
+                continue
+            triangle = triangles.get(n)
+            if triangle is None:
+                triangle = triangles[n] = np.triu_indices(n, 1)
+
+            ids = cols[start:end]
+            pair_codes = ids[triangle[0]] * size + ids[triangle[1]]
+            pending.append(pair_codes)
+            pending_counts.append(np.ones(len(pair_codes), dtype=np.int64))
+            pending_size += len(pair_codes)
+
+            if pending_size >= PAIR_CHUNK:
+                unique, counts = _reduce(pending, pending_counts)
+                reduced.append(unique)
+                reduced_counts.append(counts)
+                pending, pending_counts, pending_size = [], [], 0
+
+        if pending:
+            unique, counts = _reduce(pending, pending_counts)
+            reduced.append(unique)
+            reduced_counts.append(counts)
+
+        if not reduced:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(keywords, empty, empty, empty, support)
+
+        unique, counts = _reduce(reduced, reduced_counts)
+        if min_support > 1:
+            keep = counts >= min_support
+            unique = unique[keep]
+            counts = counts[keep]
+
+        return cls(keywords, unique // size, unique % size, counts, support)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def top_pairs(self, k: int = 20) -> list:
+        # Most frequent pairs as (keyword, keyword, count)
+        order = np.argsort(-self.counts, kind="stable")[:k]
+        return [
+            (self.keywords[a], self.keywords[b], count)
+            for a, b, count in zip(self.first[order].tolist(), self.second[order].tolist(),
+                                   self.counts[order].tolist())
+        ]
+
+    def to_dict(self, top_k: int = None) -> dict:
+        # {keyword: {other keyword: count}} in both directions,
+        # top_k keeps only the k most frequent partners of every keyword
+        source = np.concatenate((self.first, self.second))
+        target = np.concatenate((self.second, self.first))
+        counts = np.concatenate((self.counts, self.counts))
+
+        # Grouped by source keyword, most frequent partner first
+        order = np.lexsort((-counts, source))
+        source = source[order]
+        target = target[order]
+        counts = counts[order]
+
+        if top_k is not None:
+            group_starts = np.flatnonzero(np.concatenate(([True], source[1:] != source[:-1])))
+            group_sizes = np.diff(np.concatenate((group_starts, [len(source)])))
+            rank = np.arange(len(source)) - np.repeat(group_starts, group_sizes)
+            keep = rank < top_k
+            source = source[keep]
+            target = target[keep]
+            counts = counts[keep]
+
+        keywords = self.keywords
+        matrix = {}
+        for a, b, count in zip(source.tolist(), target.tolist(), counts.tolist()):
+            partners = matrix.get(keywords[a])
+            if partners is None:
+                partners = matrix[keywords[a]] = {}
+            partners[keywords[b]] = count
+
+        return matrix
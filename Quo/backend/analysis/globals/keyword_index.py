@@ -0,0 +1,121 @@
+import threading
+from collections import Counter, OrderedDict
+
+from .description_tokenizer import tokenize
+
+# Inverted keyword index over a list of transactions
+# Every description is tokenized once, each keyword keeps a posting list of the positions of the
+# transactions it appears in (plus where in the description it first appears). Topic assignment for a
+# subset of transactions walks the postings of the top keywords only, and the index is reused for every
+# category and every request on the same cached transaction group
+
+# Topic results remembered per subset of transactions (cleared whenever a transaction is added)
+TOPIC_CACHE_SIZE = 64
+
+
+class KeywordIndex:
+    def __init__(self, transactions=()):
+        self.transactions = []
+        self.keywords = []  # position -> keywords of that transaction, in description order
+        self.postings = {}  # keyword -> [position, ...] ascending
+        self.first_offsets = {}  # keyword -> [offset of the keyword's first occurrence, ...] parallel to postings
+
+        self._positions = {}  # id(tx) -> position
+        self._topics = OrderedDict()
+        # add() runs on sync threads while topics() runs on request threads, both go through this lock
+        self._lock = threading.RLock()
+
+        for tx in transactions:
+            self.add(tx)
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def add(self, tx):
+        keywords = tokenize(tx.description).keywords
+
+        with self._lock:
+            position = len(self.transactions)
+            self.transactions.append(tx)
+            self.keywords.append(keywords)
+            self._positions[id(tx)] = position
+
+            seen = set()
+            for offset, keyword in enumerate(keywords):
+                if keyword not in seen:
+                    seen.add(keyword)
+                    self.postings.setdefault(keyword, []).append(position)
+                    self.first_offsets.setdefault(keyword, []).append(offset)
+
+            self._topics.clear()
+
+    def positions_of(self, transactions):
+        # Positions of the given transactions (same objects as indexed), None if one isn't indexed
+        positions = []
+        with self._lock:
+            for tx in transactions:
+                position = self._positions.get(id(tx))
+                if position is None:
+                    return None
+                positions.append(position)
+        return positions
+
+    def keyword_frequencies(self, positions) -> Counter:
+        # Occurrences of every keyword over the given transactions
+        frequencies = Counter()
+        with self._lock:
+            for position in positions:
+                frequencies.update(self.keywords[position])
+        return frequencies
+
+    def assign(self, positions, keywords) -> dict:
+        # position -> the keyword of keywords appearing first in that transaction's description,
+        # intersecting each keyword's posting list with positions
+        with self._lock:
+            posting_size = sum(len(self.postings.get(keyword, ())) for keyword in keywords)
+            if posting_size > len(positions) * 4:
+                # Small subset of a long history (e.g. one month), scanning its own keywords is cheaper
+                wanted = set(keywords)
+                assigned = {}
+                for position in positions:
+                    for keyword in self.keywords[position]:
+                        if keyword in wanted:
+                            assigned[position] = keyword
+                            break
+                return assigned
+
+            subset = set(positions)
+            assigned = {}  # position -> (offset, keyword)
+            for keyword in keywords:
+                for position, offset in zip(self.postings.get(keyword, ()), self.first_offsets.get(keyword, ())):
+                    if position in subset:
+                        best = assigned.get(position)
+                        if best is None or offset < best[0]:
+                            assigned[position] = (offset, keyword)
+            return {position: keyword for position, (offset, keyword) in assigned.items()}
+
+    def topics(self, positions, top_n: int = 20, min_count: int = 3) -> dict:
+        # Groups the transactions by their dominant top keyword ("Other" when they have none)
+        # Computed under the lock so an add() can't land halfway and leave a stale result in the cache
+        key = (tuple(positions), top_n, min_count)
+        with self._lock:
+            cached = self._topics.get(key)
+            if cached is not None:
+                self._topics.move_to_end(key)
+                return {label: list(txs) for label, txs in cached.items()}
+
+            frequencies = self.keyword_frequencies(positions)
+            top_keywords = [word for word, count in frequencies.most_common(top_n) if count >= min_count]
+            assigned = self.assign(positions, top_keywords)
+
+            grouped = {}
+            for position in positions:
+                keyword = assigned.get(position)
+                label = keyword.title() if keyword is not None else 'Other'
+                grouped.setdefault(label, []).append(self.transactions[position])
+
+            self._topics[key] = grouped
+            if len(self._topics) > TOPIC_CACHE_SIZE:
+                self._topics.popitem(last=False)
+
+        return {label: list(txs) for label, txs in grouped.items()}
@@ -0,0 +1,89 @@
+import re
+
+# Shared keyword matching engine
+# The category grouper and the subscription detector both walk an ordered table of labels, test every
+# keyword as a substring and return the first label with a hit. KeywordMatcher compiles such a table
+# once into a single regex and answers the same question in one pass over the text
+
+
+def trie_pattern(words) -> str:
+    # Regex alternation of words shaped as a prefix trie ("car(?:d(?:io)?)?" style), the engine
+    # branches on one character at a time instead of retrying every word at every position.
+    # Optional tails are greedy, so the longest word starting at a position is the one matched
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    # rules: ordered (label, keywords) pairs, earlier rules win like in the original loops
+    #
+    # The trie sits in a lookahead so it is tried at every position of the text, overlapping keywords
+    # ("sport" inside "transport") are still seen. At each position it reports the longest keyword
+    # starting there, every shorter keyword matching at that position is a prefix of it, so each
+    # keyword carries the best rule among its prefixes. The best rule over all positions is the
+    # first rule the original loops would have returned
+
+    def __init__(self, rules, ignore_case: bool = True):
+        self.ignore_case = ignore_case
+        self.labels = []
+
+        rule_of = {}  # keyword -> index of the first rule listing it
+        for index, (label, keywords) in enumerate(rules):
+            self.labels.append(label)
+            for keyword in keywords:
+                if keyword:
+                    keyword = keyword.lower() if ignore_case else keyword
+                    rule_of.setdefault(keyword, index)
+
+        # keyword -> best rule among the keywords that are a prefix of it (itself included)
+        self._best_rule = {
+            keyword: min(rule for prefix, rule in rule_of.items() if keyword.startswith(prefix))
+            for keyword in rule_of
+        }
+
+        # The leading character class lets the engine skip positions no keyword can start at
+        first_chars = "".join(sorted({re.escape(keyword[0]) for keyword in rule_of}))
+        self._pattern = re.compile(f"(?=[{first_chars}])(?=({trie_pattern(rule_of)}))") if rule_of else None
+        self._best_rule_of = self._best_rule.__getitem__
+
+    def _prepare(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def match_index(self, text: str):
+        # Index of the winning rule, None if no keyword occurs in text
+        if self._pattern is None or not text:
+            return None
+
+        found = self._pattern.findall(self._prepare(text))
+        if not found:
+            return None
+        return min(map(self._best_rule_of, found))
+
+    def match(self, text: str, default=None):
+        # Label of the winning rule
+        if self._pattern is None or not text:
+            return default
+
+        found = self._pattern.findall(self._prepare(text))
+        if not found:
+            return default
+        return self.labels[min(map(self._best_rule_of, found))]
+
+    def contains_any(self, text: str) -> bool:
+        # True if any keyword of any rule occurs in text
+        if self._pattern is None or not text:
+            return False
+        return self._pattern.search(self._prepare(text)) is not None
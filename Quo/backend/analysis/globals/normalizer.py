@@ -0,0 +1,86 @@
+from .transactions import parse_date
+
+# Single normalizer stage for raw Basiq transactions
+# Every raw payload is turned into one compact record exactly once (category, signed amount, parsed date,
+# account id, class), the store rows (transaction_sync) and BasiqAPI.parse_transaction are both built from these records
+
+UNCATEGORIZED = "Uncategorized"
+
+# Readable names for the Basiq class field, used when no other category is available
+CLASS_CATEGORY_MAP = {
+    "bank-fee": "Bank Fees",
+    "payment": "General Payment",
+    "cash-withdrawal": "Cash Withdrawal",
+    "transfer": "Transfers",
+    "loan-interest": "Loan Interest",
+    "refund": "Refunds",
+    "direct-credit": "Income",
+    "interest": "Interest Earned",
+    "loan-repayment": "Loan Repayment"
+}
+
+# Placeholder categories the endpoints break down further (see EnhancedTransactionAnalysis)
+SPECIAL_CATEGORIES = ['unknown', 'uncategorized', 'other', 'no category']
+
+
+def _title(obj) -> str:
+    return obj.get("title") if isinstance(obj, dict) else None
+
+
+def extract_category(raw: dict) -> str:
+    # enrich -> anzsic class -> group -> subdivision -> subClass -> class map
+    enrich = raw.get("enrich")
+    if isinstance(enrich, dict):
+        category_data = enrich.get("category")
+        if isinstance(category_data, dict):
+            anzsic = category_data.get("anzsic")
+            if isinstance(anzsic, dict):
+                title = _title(anzsic.get("class")) or _title(anzsic.get("group")) or _title(anzsic.get("subdivision"))
+                if title:
+                    return title
+
+    title = _title(raw.get("subClass"))
+    if title:
+        return title
+
+    class_name = raw.get("class")
+    if class_name:
+        return CLASS_CATEGORY_MAP.get(class_name, class_name.replace("-", " ").title())
+
+    return UNCATEGORIZED
+
+
+def extract_account_id(raw: dict) -> str:
+    # account is the account id (older payloads nest it in an object)
+    account = raw.get("account")
+    return account.get("id") if isinstance(account, dict) else account
+
+
+def normalize_transaction(raw: dict) -> dict:
+    # Raw Basiq transaction -> normalized record
+    # amount keeps its sign (negative = money out), date is the parsed postDate (transactionDate for pending rows)
+    date_str = raw.get("postDate") or raw.get("transactionDate")
+    try:
+        date = parse_date(date_str) if date_str else None
+    except ValueError:
+        date = None
+
+    return {
+        "id": raw.get("id"),
+        "account_id": extract_account_id(raw),
+        "description": raw.get("description", "No Description"),
+        "category": extract_category(raw),
+        "amount": float(raw.get("amount") or 0),
+        "class": raw.get("class"),
+        "type": raw.get("type"),
+        "direction": raw.get("direction"),
+        "status": raw.get("status"),
+        "post_date": raw.get("postDate"),
+        "transaction_date": raw.get("transactionDate"),
+        "date": date
+    }
+
+
+def amount_direction(signed_amount: float) -> str:
+    # Basiq amounts are negative for money leaving the account
+    return "debit" if signed_amount < 0 else "credit"
@@ -0,0 +1,47 @@
+import asyncio
+
+# Single-flight request coalescing
+# When a dashboard loads, several endpoints ask for the same user's data within a few milliseconds,
+# the first caller for a key runs the fetch and everyone else arriving meanwhile awaits that same task
+
+
+class SingleFlight:
+    # One in-flight task per key, the result (or exception) is shared by every caller waiting on it
+    # Nothing is kept once the task finishes, caching the result is left to the caller
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._in_flight = {}  # key -> asyncio.Task
+
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        # fn is an async function, it is only called if no fetch for key is already running
+        self.calls += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.coalesced += 1
+
+        # Shielded so one caller disconnecting doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# In-memory cache of parsed transactions (AllTransactions groups)
+# The dashboard fires several analysis endpoints for the same user at once and each one
+# built a new User, this lets them share the already parsed transactions and their aggregates
+
+# How long a cached list is served before it is rebuilt from the store (seconds)
+CACHE_TTL = int(os.getenv("TRANSACTION_CACHE_TTL", "120"))
+
+# Upper bound on the total number of Transaction objects held across all entries
+CACHE_MAX_TRANSACTIONS = int(os.getenv("TRANSACTION_CACHE_MAX_TRANSACTIONS", "200000"))
+
+
+class TransactionCache:
+    # Keyed by (basiq_user_id, filter_transfer, filter_loans)
+    # Entries expire after ttl seconds, the least recently used ones are evicted once
+    # the total transaction count goes over max_transactions
+
+    def __init__(self, ttl: int = CACHE_TTL, max_transactions: int = CACHE_MAX_TRANSACTIONS):
+        self.ttl = ttl
+        self.max_transactions = max_transactions
+        self._entries = OrderedDict()  # key -> (expires_at, AllTransactions)
+        self._size = 0
+        self._lock = threading.Lock()
+        # basiq_user_id -> bumped whenever the user's groups are dropped as stale (not on TTL/LRU eviction)
+        self._generations = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(basiq_user_id: str, filter_transfer: bool, filter_loans: bool) -> tuple:
+        return (basiq_user_id, bool(filter_transfer), bool(filter_loans))
+
+    def get(self, basiq_user_id: str, filter_transfer: bool, filter_loans: bool):
+        # Returns the cached list or None on a miss/expired entry
+        key = self.make_key(basiq_user_id, filter_transfer, filter_loans)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, group = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return group
+
+    def put(self, basiq_user_id: str, filter_transfer: bool, filter_loans: bool, group):
+        # group is an AllTransactions, its length counts towards max_transactions
+        key = self.make_key(basiq_user_id, filter_transfer, filter_loans)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # A single list bigger than the whole budget is not worth caching
+            if len(group) > self.max_transactions:
+                return
+
+            self._entries[key] = (time.monotonic() + self.ttl, group)
+            self._size += len(group)
+            self._evict()
+
+    def extend(self, basiq_user_id: str, rows_for) -> int:
+        # Applies freshly synced rows to every cached group of this user instead of dropping them
+        # rows_for(filter_transfer, filter_loans) returns the new Transaction objects for that filter variant
+        # add() skips ids it already holds, so if a re-synced row changed (amount, category, ...) the user's
+        # groups are dropped and rebuilt from the store on the next request instead
+        added = 0
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == basiq_user_id]
+            if not keys:
+                return 0
+
+            # Unfiltered rows, a changed category can also move a row in or out of the filtered variants
+            all_rows = rows_for(False, False)
+            if any(self._entries[key][1].is_changed(tx) for key in keys for tx in all_rows):
+                for key in keys:
+                    self._remove(key)
+                self._bump(basiq_user_id)
+                return 0
+
+            for key in keys:
+                _, filter_transfer, filter_loans = key
+                new_rows = self._entries[key][1].extend(rows_for(filter_transfer, filter_loans))
+                self._size += new_rows
+                added += new_rows
+
+            self._evict()
+        return added
+
+    def invalidate(self, basiq_user_id: str):
+        # Drops every filter variant cached for this user
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == basiq_user_id]:
+                self._remove(key)
+            self._bump(basiq_user_id)
+
+    def generation(self, basiq_user_id: str) -> int:
+        # Groups built under an older generation hold rows that changed since
+        with self._lock:
+            return self._generations.get(basiq_user_id, 0)
+
+    def _bump(self, basiq_user_id: str):
+        # Caller holds the lock
+        self._generations[basiq_user_id] = self._generations.get(basiq_user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key: tuple):
+        # Caller holds the lock
+        _, group = self._entries.pop(key)
+        self._size -= len(group)
+
+    def _evict(self):
+        # Caller holds the lock, evicts from the least recently used end until we are back under budget
+        while self._size > self.max_transactions:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "transactions": self._size,
+                "max_transactions": self.max_transactions,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# One cache per process
+transaction_cache = TransactionCache()
@@ -0,0 +1,230 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import database
+import database_async
+from .basiq_async import AsyncBasiqAPI
+from .normalizer import normalize_transaction, amount_direction
+from .transaction_cache import transaction_cache
+from .transactions import Transaction
+from .single_flight import SingleFlight
+
+# Incremental sync of Basiq transactions/accounts into the local SQLite store
+# Analysis reads the stored rows, Basiq is only asked for what changed since the last sync
+
+# Skip the network entirely if the user was synced this recently (seconds)
+SYNC_INTERVAL = int(os.getenv("TRANSACTION_SYNC_INTERVAL", "300"))
+
+# Re-fetch a few days before the watermark, banks post some transactions late
+SYNC_OVERLAP_DAYS = int(os.getenv("TRANSACTION_SYNC_OVERLAP_DAYS", "7"))
+
+# Concurrent syncs of the same user share one run (dashboard bursts hit several endpoints at once)
+sync_flight = SingleFlight("transaction_sync")
+
+# Classes removed by the filter_transfer / filter_loans flags used across the endpoints
+TRANSFER_CLASSES = ["transfer"]
+LOAN_CLASSES = ["loan-interest", "loan-repayment"]
+
+# Called with the Basiq user id after every successful sync (e.g. the analytics snapshot rebuild)
+sync_listeners = []
+
+
+def add_sync_listener(listener):
+    # listener(basiq_user_id) must not block, schedule any real work as a task
+    if listener not in sync_listeners:
+        sync_listeners.append(listener)
+
+
+def to_transaction_row(raw: dict) -> dict:
+    # Raw Basiq transaction -> row for the transactions table (the normalized record, see normalizer.py)
+    return normalize_transaction(raw)
+
+
+def to_account_row(raw: dict) -> dict:
+    # Raw Basiq account -> row for the accounts table
+    institution = raw.get("institution")
+    if isinstance(institution, dict):
+        institution = institution.get("name")
+    elif not isinstance(institution, str):
+        # Fall back to the institution on the connection
+        connection = raw.get("connection")
+        inst = connection.get("institution") if isinstance(connection, dict) else None
+        institution = inst.get("name") if isinstance(inst, dict) else None
+
+    account_class = raw.get("class")
+    account_type = raw.get("type") or (account_class.get("type") if isinstance(account_class, dict) else None)
+
+    return {
+        "id": raw.get("id"),
+        "name": raw.get("name") or raw.get("accountName"),
+        "account_no": raw.get("accountNo") or raw.get("accountNumber"),
+        "balance": float(raw.get("balance") or 0),
+        "available_balance": float(raw.get("availableFunds") or raw.get("availableBalance") or raw.get("available") or 0),
+        "account_type": account_type,
+        "institution": institution,
+        "status": raw.get("status"),
+        "last_updated": raw.get("lastUpdated") or raw.get("lastRefreshed")
+    }
+
+
+async def sync_user_data(basiq_user_id: str, force: bool = False) -> dict:
+    # Pulls new transactions + current accounts for a Basiq user into the store
+    # Returns a small summary, never raises so callers can fall back to the stored rows
+    return await sync_flight.do((basiq_user_id, force), _sync_user_data, basiq_user_id, force)
+
+
+async def _sync_user_data(basiq_user_id: str, force: bool) -> dict:
+    state = await database_async.get_sync_state(basiq_user_id)
+    if "error" in state:
+        print(f"Sync state error: {state['error']}")
+        return {"synced": False, "error": state["error"]}
+
+    last_synced_at = state.get("last_synced_at")
+    if not force and last_synced_at and time.time() - last_synced_at < SYNC_INTERVAL:
+        return {"synced": False, "reason": "fresh"}
+
+    # Only ask Basiq for transactions from just before the newest one we have
+    from_date = None
+    if state.get("last_post_date"):
+        watermark = datetime.strptime(state["last_post_date"][:10], "%Y-%m-%d")
+        from_date = watermark - timedelta(days=SYNC_OVERLAP_DAYS)
+
+    api = AsyncBasiqAPI(os.getenv("BASIQ_API_KEY"), user_id=basiq_user_id)
+
+    try:
+        synced_rows = []
+        # No page budget: a truncated fetch would leave a gap behind the watermark recorded below
+        async for page in api.iter_transaction_pages(from_date=from_date, max_pages=None):
+            # Pending transactions have no postDate yet, they are picked up once posted
+            rows = [to_transaction_row(tx) for tx in page if tx.get("id") and tx.get("postDate")]
+            if rows:
+                result = await database_async.upsert_transactions(basiq_user_id, rows)
+                if "error" in result:
+                    print(f"Transaction upsert error: {result['error']}")
+                    return {"synced": False, "error": result["error"]}
+                synced_rows.extend(rows)
+        new_rows = len(synced_rows)
+
+        raw_accounts = await api.get_raw_accounts()
+        if raw_accounts:
+            await database_async.upsert_accounts(basiq_user_id, [to_account_row(acc) for acc in raw_accounts if acc.get("id")])
+
+        await database_async.update_sync_state(basiq_user_id, time.time())
+
+        # Apply just the synced rows to the cached groups (dropped instead if a row they hold changed)
+        # Parsing the rows and the index updates are CPU work under the cache lock, so off the event loop like the upserts
+        if synced_rows:
+            await asyncio.to_thread(
+                transaction_cache.extend, basiq_user_id, lambda ft, fl: rows_to_transactions(synced_rows, ft, fl)
+            )
+
+        print(f"Synced {new_rows} transactions for Basiq user (from {from_date or 'start'})")
+
+        for listener in sync_listeners:
+            try:
+                listener(basiq_user_id)
+            except Exception as e:
+                print("Operation failed")
+
+        return {"synced": True, "transactions": new_rows, "from_date": from_date}
+
+    except Exception as e:
+        print("Operation failed")
+        return {"synced": False, "error": str(e)}
+
+
+def excluded_classes(filter_transfer: bool, filter_loans: bool) -> list:
+    classes = []
+    if filter_transfer:
+        classes.extend(TRANSFER_CLASSES)
+    if filter_loans:
+        classes.extend(LOAN_CLASSES)
+    return classes
+
+
+def to_payload(row: dict) -> dict:
+    # Stored row -> the payload shape of BasiqAPI.getTransactionData
+    return {
+        'id': row["id"],
+        'description': row["description"],
+        'type': None,
+        'category': row["category"],
+        'date': row["post_date"],
+        'amount': abs(row["amount"]),
+        'mode': row["class"],
+        'account_id': row["account_id"],
+        'direction': amount_direction(row["amount"])
+    }
+
+
+def stored_transaction_payloads(result: dict) -> list:
+    # database.get_transactions result -> payloads in the same shape as BasiqAPI.getTransactionData
+    if "error" in result:
+        print(f"Transaction store error: {result['error']}")
+        return []
+
+    return [to_payload(row) for row in result["transactions"]]
+
+
+def load_stored_transactions(basiq_user_id: str, filter_transfer: bool, filter_loans: bool) -> list:
+    # Blocking read, for worker threads and scripts (the event loop uses aload_stored_transactions)
+    return stored_transaction_payloads(
+        database.get_transactions(basiq_user_id, excluded_classes(filter_transfer, filter_loans))
+    )
+
+
+async def aload_stored_transactions(basiq_user_id: str, filter_transfer: bool, filter_loans: bool) -> list:
+    return stored_transaction_payloads(
+        await database_async.get_transactions(basiq_user_id, excluded_classes(filter_transfer, filter_loans))
+    )
+
+
+def rows_to_transactions(rows: list, filter_transfer: bool, filter_loans: bool) -> list:
+    # Freshly synced rows -> Transaction objects for one filter variant of the cache
+    excluded = excluded_classes(filter_transfer, filter_loans)
+    transactions = []
+    for row in rows:
+        if row["class"] in excluded:
+            continue
+        try:
+            transactions.append(Transaction.from_payload(to_payload(row)))
+        except Exception as e:
+            print("Operation failed")
+    return transactions
+
+
+def stored_account_payloads(result: dict) -> list:
+    # database.get_accounts result -> accounts in the same shape as BasiqAPI.get_accounts
+    if "error" in result:
+        print(f"Account store error: {result['error']}")
+        return []
+
+    return [
+        {
+            "id": row["id"],
+            "accountNum": row["account_no"],
+            "accountName": row["name"] or '',
+            "balance": row["balance"] or 0,
+            "institution": row["institution"]
+        }
+        for row in result["accounts"]
+    ]
+
+
+def load_stored_accounts(basiq_user_id: str) -> list:
+    # Blocking read, for worker threads and scripts (the event loop uses aload_stored_accounts)
+    return stored_account_payloads(database.get_accounts(basiq_user_id))
+
+
+async def aload_stored_accounts(basiq_user_id: str) -> list:
+    return stored_account_payloads(await database_async.get_accounts(basiq_user_id))
+
+
+async def get_account_name(basiq_user_id: str, account_id: str, default: str = None) -> str:
+    # Account name from the local store, replaces the per-request /accounts/{id} call
+    for account in await aload_stored_accounts(basiq_user_id):
+        if account["id"] == account_id:
+            return account["accountName"] or default
+    return default
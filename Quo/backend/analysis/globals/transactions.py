@@ -1,52 +1,248 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from collections import defaultdict
+from functools import lru_cache
+import threading
+from bisect import bisect_left, bisect_right
 import calendar
 
+from .keyword_index import KeywordIndex
+
+
+@lru_cache(maxsize=65536)
+def _parse_date_string(value: str) -> datetime:
+    # Basiq postDates are fixed format ('2024-05-01T00:00:00Z'), slicing is several times faster than strptime
+    # Many transactions share a timestamp (often midnight), hence the cache
+    if len(value) == 20 and value[10] == 'T' and value[19] == 'Z':
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                        int(value[11:13]), int(value[14:16]), int(value[17:19]))
+
+    # Anything else (offsets, fractions, plain dates) goes through fromisoformat
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_date(value) -> datetime:
+    # Always returns a naive (UTC) datetime, accepts a datetime as is
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    return _parse_date_string(value)
+
+
+def start_of_month(now: datetime = None) -> datetime:
+    now = now or datetime.now()
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def start_of_year(now: datetime = None) -> datetime:
+    now = now or datetime.now()
+    return now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def period_start(period: str, now: datetime = None):
+    # Start of the "month" / "year" periods the endpoints filter by, None means all time
+    if period == "month":
+        return start_of_month(now)
+    if period == "year":
+        return start_of_year(now)
+    return None
+
+
 class Transaction:
     # Holds information about ONE transaction. (Can add functions to this however its not of use now)
     # This is only used to basically store information instead of a ugly list or dict
+    # __slots__ keeps each object small, the caches hold a lot of these
+    __slots__ = ('id', 'description', 'category', 'date', 'amount', 'mode', 'type', 'account_id', 'direction')
     
-    def __init__(self, description: str, category: str, date: str, amount: float, mode: str):
+    def __init__(self, description: str, category: str, date, amount: float, mode: str,
+                 id: str = None, type: str = None, account_id: str = None, direction: str = None):
+        self.id = id
         self.description = description
         self.category = category
-        self.date = datetime.strptime(date, '%Y-%m-%dT%H:%M:%SZ')
+        self.date = parse_date(date)
         self.amount = amount
         self.mode = mode
+        self.type = type
+        self.account_id = account_id
+        # 'debit' (money out) or 'credit', amount itself is always positive
+        self.direction = direction
+        
+    @classmethod
+    def from_payload(cls, tx: dict) -> "Transaction":
+        # Builds a Transaction from the dicts returned by getTransactionData / load_stored_transactions
+        return cls(
+            tx['description'],
+            tx['category'],
+            tx['date'],
+            tx['amount'],
+            tx['mode'],
+            id=tx.get('id'),
+            type=tx.get('type'),
+            account_id=tx.get('account_id'),
+            direction=tx.get('direction')
+        )
+
+    def same_as(self, other: "Transaction") -> bool:
+        # Field by field comparison, used to spot a re-synced row whose data changed
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
         
 class AllTransactions:
     # Holds a list of transactions, 
+    # Keeps running totals/counts per category and per (year, month) so the *_points methods never rescan,
+    # add()/extend() update them so a delta sync only has to apply the new rows
+    # A cached group is shared by request threads (dashboard panels, snapshot builds) while syncs add rows
+    # from the event loop, the lazily built indexes and add() all run under one lock
     def __init__(self, transactions: list[Transaction]):
-        self.transactions = transactions
-        self.grouped = self.group_by_year_and_month()
+        self.transactions = []
+        self.category_totals = {}
+        self.category_counts = {}
+        self.month_totals = {}  # (year, month_num) -> total
+        self.month_counts = {}
+
+        self._by_id = {}  # id -> Transaction
+        self._grouped = None
+        # Date sorted index (dates + positions into self.transactions), built on first slice()
+        self._index_dates = None
+        self._index_positions = None
+        # account_id -> AllTransactions of that account, built on first account()
+        self._by_account = None
+        # Inverted keyword index of the descriptions, built on first keyword_index
+        self._keyword_index = None
+
+        self._lock = threading.RLock()
+
+        self.extend(transactions)
+
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        # Built on first use, add() keeps it up to date afterwards
+        with self._lock:
+            if self._keyword_index is None:
+                self._keyword_index = KeywordIndex(self.transactions)
+            return self._keyword_index
+
+    @property
+    def grouped(self) -> dict:
+        # Built on first use, add() keeps it up to date afterwards
+        with self._lock:
+            if self._grouped is None:
+                self._grouped = self.group_by_year_and_month()
+            return self._grouped
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def add(self, tx: Transaction) -> bool:
+        # Returns False if a transaction with the same id is already held
+        with self._lock:
+            return self._add(tx)
+
+    def _add(self, tx: Transaction) -> bool:
+        if tx.id is not None:
+            if tx.id in self._by_id:
+                return False
+            self._by_id[tx.id] = tx
+
+        self.transactions.append(tx)
+        self.category_totals[tx.category] = self.category_totals.get(tx.category, 0.0) + tx.amount
+        self.category_counts[tx.category] = self.category_counts.get(tx.category, 0) + 1
+
+        month = (tx.date.year, tx.date.month)
+        self.month_totals[month] = self.month_totals.get(month, 0.0) + tx.amount
+        self.month_counts[month] = self.month_counts.get(month, 0) + 1
+
+        if self._grouped is not None:
+            month_key = (tx.date.month, calendar.month_name[tx.date.month])
+            self._grouped.setdefault(tx.date.year, {}).setdefault(month_key, []).append(tx)
+
+        if self._index_dates is not None:
+            i = bisect_right(self._index_dates, tx.date)
+            self._index_dates.insert(i, tx.date)
+            self._index_positions.insert(i, len(self.transactions) - 1)
+
+        if self._by_account is not None:
+            self._by_account.setdefault(tx.account_id, AllTransactions([])).add(tx)
+
+        if self._keyword_index is not None:
+            self._keyword_index.add(tx)
+
+        return True
+
+    def is_changed(self, tx: Transaction) -> bool:
+        # True if a transaction with the same id is held but its data differs (e.g. re-categorized upstream)
+        with self._lock:
+            held = self._by_id.get(tx.id) if tx.id is not None else None
+            return held is not None and not held.same_as(tx)
+
+    def extend(self, transactions: list[Transaction]) -> int:
+        # Returns how many rows were actually new
+        added = 0
+        for tx in transactions:
+            if self.add(tx):
+                added += 1
+        return added
     
+    def _build_index(self):
+        order = sorted(range(len(self.transactions)), key=lambda i: self.transactions[i].date)
+        self._index_dates = [self.transactions[i].date for i in order]
+        self._index_positions = order
+
+    def slice(self, start: datetime = None, end: datetime = None) -> list:
+        # Transactions with start <= date < end (either bound can be None), found with bisect on the date index
+        # Only the matching rows are touched, they come back in the same order as self.transactions
+        with self._lock:
+            if self._index_dates is None:
+                self._build_index()
+
+            lo = bisect_left(self._index_dates, start) if start is not None else 0
+            hi = bisect_left(self._index_dates, end) if end is not None else len(self._index_dates)
+
+            positions = sorted(self._index_positions[lo:hi])
+            return [self.transactions[i] for i in positions]
+
+    def account(self, account_id: str) -> "AllTransactions":
+        # Transactions of one account, served from the rows already held (no Basiq call)
+        # The sub group has its own aggregates and date index
+        with self._lock:
+            if self._by_account is None:
+                by_account = {}
+                for tx in self.transactions:
+                    by_account.setdefault(tx.account_id, []).append(tx)
+                self._by_account = {acc: AllTransactions(txs) for acc, txs in by_account.items()}
+
+            if account_id not in self._by_account:
+                return AllTransactions([])
+            return self._by_account[account_id]
+
+    def period_slice(self, period: str, now: datetime = None) -> list:
+        # "month" -> this month, "year" -> this year, anything else -> all transactions
+        start = period_start(period, now)
+        if start is None:
+            return list(self.transactions)
+        return self.slice(start)
+
     # Groups transactions by their year and month and returns a list
     def group_by_year_and_month(self):
-        grouped = defaultdict(lambda: defaultdict(list))
+        # One pass over the rows, add() keeps self.grouped current afterwards
+        grouped = {}
         for tx in self.transactions:
-            year = tx.date.year
-            month_num = tx.date.month
-            month_name = calendar.month_name[month_num]
-            grouped[year][(month_num, month_name)].append(tx)
-        return grouped
+            month_key = (tx.date.month, calendar.month_name[tx.date.month])
+            grouped.setdefault(tx.date.year, {}).setdefault(month_key, []).append(tx)
+
+        # Years and months in calendar order, rows keep their original order
+        return {year: dict(sorted(months.items())) for year, months in sorted(grouped.items())}
     
     def get_total_by_category(self):
-        totals = defaultdict(float)
-        for tx in self.transactions:
-            totals[tx.category] += tx.amount
-        return dict(totals)
+        return dict(self.category_totals)
     
         
     def get_average_by_category(self):
-        totals = defaultdict(float)
-        counts = defaultdict(int)
-
-        for tx in self.transactions:
-            totals[tx.category] += tx.amount
-            counts[tx.category] += 1
-
         averages = {}
-        for category in totals:
-            averages[category] = round(totals[category] / counts[category], 2)
+        for category, total in self.category_totals.items():
+            averages[category] = round(total / self.category_counts[category], 2)
 
         return averages
             
@@ -88,14 +284,13 @@ class AllTransactions:
         x_points = []
         y_points = []
 
-        if year not in self.grouped:
+        months = sorted(month for (month_year, month) in self.month_totals if month_year == year)
+        if not months:
             print("Couldn't find that year in transactions")
             return [], []
 
-        months = self.grouped[year]
-        for (month_num, month_name) in sorted(months.keys()):
-            total = sum(tx.amount for tx in months[(month_num, month_name)])
-            x_points.append(month_name)
-            y_points.append(total)
+        for month_num in months:
+            x_points.append(calendar.month_name[month_num])
+            y_points.append(self.month_totals[(year, month_num)])
 
-        return x_points, y_points
\ No newline at end of file
+        return x_points, y_points
@@ -1,17 +1,132 @@
+import asyncio
 from collections import defaultdict
 from .basiq_manager import BasiqAPI
+from .transaction_sync import (
+    sync_user_data, load_stored_transactions, load_stored_accounts,
+    aload_stored_transactions, aload_stored_accounts
+)
+from .transaction_cache import transaction_cache
+from .single_flight import SingleFlight
 from typing import List, Dict, Optional
 import os
 from .transactions import Transaction, AllTransactions
 
+# Concurrent User.acreate calls for the same cache key share one load
+user_flight = SingleFlight("user_transactions")
+
+
+def _check_off_event_loop(what: str):
+    # The lazy store reads below block, on the event loop they would stall every request
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    raise RuntimeError(f"User.{what} read on the event loop, load it with User.acreate / prefetch first")
+
 class User:
-    def __init__(self, user_id: str, filter_transfer: bool, filter_loans: bool):
+    def __init__(self, user_id: str, filter_transfer: bool, filter_loans: bool, use_store: bool = False):
         self.user_id = user_id
         self.filter_transfer = filter_transfer
         self.filter_loans = filter_loans
         self.BasiqManager = self.create_API_Interface()
-        self.transactions = self.fetch_transactions()
-        self.accounts = self.get_accounts()
+        # use_store=True reads from the local transaction store (User.acreate) instead of calling Basiq
+        self.use_store = use_store
+
+        # Nothing is fetched here, transactions/accounts load on first access (or through prefetch)
+        self._transactions = None
+        self._accounts = None
+        # AllTransactions shared through the transaction cache (aggregates already computed)
+        self._group = None
+        # The list handed out with _group, user.transactions still being this object means it wasn't replaced
+        self._group_rows = None
+        # transaction_cache generation the group was taken under
+        self._group_generation = None
+
+    @classmethod
+    async def acreate(cls, user_id: str, filter_transfer: bool, filter_loans: bool,
+                      transactions: bool = True, accounts: bool = False) -> "User":
+        # Async factory for the FastAPI endpoints
+        # Only warms what the endpoint asks for, anything else has to be prefetched before it is used
+        # on the event loop (worker threads can still load it lazily)
+        user = cls(user_id, filter_transfer, filter_loans, use_store=True)
+        await user.prefetch(transactions=transactions, accounts=accounts)
+        return user
+
+    @property
+    def transactions(self) -> List[Transaction]:
+        if self._transactions is None:
+            if self.use_store:
+                group = transaction_cache.get(self.user_id, self.filter_transfer, self.filter_loans)
+                if group is None:
+                    _check_off_event_loop("transactions")
+                    group = AllTransactions(self.build_transactions(
+                        load_stored_transactions(self.user_id, self.filter_transfer, self.filter_loans)
+                    ))
+                self._use_group(group)
+            else:
+                self._transactions = self.fetch_transactions()
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, value: List[Transaction]):
+        self._transactions = value
+        self._group = None
+
+    def _use_group(self, group: AllTransactions):
+        self._group = group
+        self._transactions = list(group.transactions)
+        self._group_rows = self._transactions
+        self._group_generation = transaction_cache.generation(self.user_id)
+
+    @property
+    def accounts(self) -> list:
+        if self._accounts is None:
+            if self.use_store:
+                _check_off_event_loop("accounts")
+                self._accounts = load_stored_accounts(self.user_id)
+            else:
+                self._accounts = self.get_accounts() or []
+        return self._accounts
+
+    @accounts.setter
+    def accounts(self, value: list):
+        self._accounts = value
+
+    async def prefetch(self, transactions: bool = True, accounts: bool = True):
+        # Warms transactions and/or accounts in parallel without blocking the event loop
+        jobs = []
+        if transactions and self._transactions is None:
+            jobs.append(self._aload_transactions())
+        if accounts and self._accounts is None:
+            jobs.append(self._aload_accounts())
+
+        if jobs:
+            await asyncio.gather(*jobs)
+
+    async def _aload_transactions(self):
+        # Endpoints fired together for the same user share one parsed list (see transaction_cache.py)
+        group = transaction_cache.get(self.user_id, self.filter_transfer, self.filter_loans)
+        if group is None:
+            key = transaction_cache.make_key(self.user_id, self.filter_transfer, self.filter_loans)
+            group = await user_flight.do(key, self.load_transactions)
+
+        self._use_group(group)
+
+    async def _aload_accounts(self):
+        # The sync is coalesced/skipped when fresh, so this is usually just the store read
+        await sync_user_data(self.user_id)
+        self._accounts = await aload_stored_accounts(self.user_id)
+
+    async def load_transactions(self) -> AllTransactions:
+        # Sync + read from the store, result goes into the transaction cache
+        await sync_user_data(self.user_id)
+
+        # The store read runs on the DB threads, the event loop keeps serving other requests meanwhile
+        stored = await aload_stored_transactions(self.user_id, self.filter_transfer, self.filter_loans)
+        # Parsing every row and building the aggregates is CPU work on the whole history, keep it off the loop too
+        group = await asyncio.to_thread(lambda: AllTransactions(self.build_transactions(stored)))
+        transaction_cache.put(self.user_id, self.filter_transfer, self.filter_loans, group)
+        return group
     
     def create_API_Interface(self) -> BasiqAPI:
         # Every user has a BasiqAPI class to ensure we can make future API calls corresponding with a certain user
@@ -22,44 +137,64 @@ class User:
     def fetch_transactions(self) -> List[Transaction]:
         try:
             data = self.BasiqManager.getTransactionData(self.filter_transfer, self.filter_loans)
-
-            if not data:
-                print(f"No transaction data returned for user")
-                return [] # Return empty list 
-            
-            if isinstance(data, str): # incase of error
-                print(f"error fetching transactions")
-                return [] # Return empty list
-
-            transactions = []
-            for tx in data:
-                #print(data) DEBUG PRINTS LOTS OF TRANSACTIONS
-                try:
-                    new_transaction = Transaction(
-                        tx['description'], 
-                        tx['category'], 
-                        tx['date'], 
-                        tx['amount'], 
-                        tx['mode']
-                    )
-                    transactions.append(new_transaction)
-                except Exception as e:
-                    print("Operation failed")
-                    continue
-            
-            return transactions
+            return self.build_transactions(data)
             
         except Exception as e:
             print("Operation failed")
             return []  # Return empty list on error            
-                    
+    
+    def build_transactions(self, data: list) -> List[Transaction]:
+        # Converts the payload from getTransactionData into Transaction objects
+        if not data:
+            print(f"No transaction data returned for user")
+            return [] # Return empty list 
+        
+        if isinstance(data, str): # incase of error
+            print(f"error fetching transactions")
+            return [] # Return empty list
 
+        transactions = []
+        for tx in data:
+            #print(data) DEBUG PRINTS LOTS OF TRANSACTIONS
+            try:
+                transactions.append(Transaction.from_payload(tx))
+            except Exception as e:
+                print("Operation failed")
+                continue
+        
+        return transactions
         
     def get_accounts(self) -> dict:
         return self.BasiqManager.get_accounts()
         
     def get_transaction_group(self) -> AllTransactions:
+        # Reuse the cached group (and its precomputed aggregates) unless transactions were replaced
+        if self._group is not None and self._transactions is self._group_rows:
+            if self.use_store:
+                self._refresh_group()
+            return self._group
         return AllTransactions(self.transactions)
+
+    def _refresh_group(self):
+        # A re-synced row that changed drops the user's cached groups (TransactionCache.extend bumps the
+        # generation), switch to the group that replaced ours or reload it from the store when off the event loop
+        if transaction_cache.generation(self.user_id) == self._group_generation:
+            return
+
+        current = transaction_cache.get(self.user_id, self.filter_transfer, self.filter_loans)
+        if current is not None:
+            self._use_group(current)
+            return
+
+        try:
+            asyncio.get_running_loop()
+            # Can't block on the store here, this request finishes on the rows it started with
+            return
+        except RuntimeError:
+            pass
+
+        self._transactions = None
+        self.transactions  # reloads through the store and _use_group
     
     def account_analysis(self) -> dict:
         # THIS IS A ROUGH ESTIMATE AND YOU SHOULD NOT MAKE FINANCIAL CONCLUSIONS HERE
@@ -150,7 +285,7 @@ class UserManager:
         
     def fetch_all_transactions(self):
         for user in self.users.values():
-            user.fetch_transactions()
+            user.transactions = user.fetch_transactions()
             
     def fetch_user(self, user_id: str):
         return self.users[user_id]
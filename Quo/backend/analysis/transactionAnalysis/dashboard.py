@@ -0,0 +1,160 @@
+import asyncio
+
+import database_async
+from analysis.globals.users import User
+from analysis.globals.transaction_sync import sync_user_data, get_account_name
+from analysis.globals.analytics_snapshot import get_snapshot_panel, on_demand_meta
+from analysis.transactionAnalysis import panels
+
+# Batch dashboard
+# The frontend used to call every analysis endpoint separately, each one resolving the user and loading
+# its transactions again. Here one request resolves the user once, loads each transaction variant once
+# and computes the requested panels concurrently
+
+# Panels served when the request doesn't list any
+DEFAULT_PANELS = [
+    "enhancedSpendingByCategory",
+    "groupedSpendingByPeriod",
+    "trends",
+    "savingsOpportunities",
+    "recentPayments",
+    "accounts"
+]
+
+
+class DashboardContext:
+    # Data shared by all panels of one dashboard request, every piece is loaded at most once
+
+    def __init__(self, user_id: str, basiq_user_id: str):
+        self.user_id = user_id
+        self.basiq_user_id = basiq_user_id
+        self._users = {}  # (filter_transfer, filter_loans) -> Task[User]
+
+    async def user(self, filtered: bool = True) -> User:
+        # filtered=True removes transfers/loans like the analysis endpoints,
+        # filtered=False is the unfiltered view the account-scoped panels use
+        key = (filtered, filtered)
+        task = self._users.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_user(filtered))
+            self._users[key] = task
+        return await task
+
+    async def _load_user(self, filtered: bool) -> User:
+        user = await User.acreate(self.basiq_user_id, filter_transfer=filtered, filter_loans=filtered)
+        # Shared by the panel threads below, AllTransactions builds its lazy indexes under a lock
+        return user
+
+    async def serve(self, snapshot_panel, compute, filtered: bool = True) -> dict:
+        # Snapshot copy when the panel is asked for with its default params, computed otherwise
+        if snapshot_panel:
+            cached = await get_snapshot_panel(self.basiq_user_id, snapshot_panel)
+            if cached:
+                return {**cached["data"], "snapshot": cached["meta"]}
+
+        user = await self.user(filtered)
+        # The panels are plain CPU work, a worker thread each lets them run side by side
+        data = await asyncio.to_thread(compute, user)
+        return {**data, "snapshot": on_demand_meta()}
+
+
+async def spending_by_category_panel(ctx: DashboardContext, params: dict) -> dict:
+    return await ctx.serve("spendingByCategory", panels.spending_by_category)
+
+
+async def enhanced_spending_panel(ctx: DashboardContext, params: dict) -> dict:
+    return await ctx.serve("enhancedSpendingByCategory", panels.enhanced_spending_by_category)
+
+
+async def grouped_spending_panel(ctx: DashboardContext, params: dict) -> dict:
+    period = params.get("period", "month")
+    group_categories = bool(params.get("group_categories", True))
+    account_id = params.get("account_id")
+
+    if account_id:
+        account_name = await get_account_name(ctx.basiq_user_id, account_id, default=account_id)
+        return await ctx.serve(None, lambda user: panels.grouped_spending_by_period(
+            user, period, group_categories, account_id=account_id, account_name=account_name
+        ), filtered=False)
+
+    snapshot_panel = f"groupedSpendingByPeriod:{period}" if group_categories else None
+    return await ctx.serve(snapshot_panel, lambda user: panels.grouped_spending_by_period(
+        user, period, group_categories
+    ))
+
+
+async def trends_panel(ctx: DashboardContext, params: dict) -> dict:
+    months = int(params.get("months", 6))
+    account_id = params.get("account_id")
+
+    snapshot_panel = "trends" if months == 6 and not account_id else None
+    return await ctx.serve(snapshot_panel, lambda user: panels.spending_trends(user, months, account_id=account_id))
+
+
+async def savings_panel(ctx: DashboardContext, params: dict) -> dict:
+    account_id = params.get("account_id")
+
+    snapshot_panel = "savingsOpportunities" if not account_id else None
+    return await ctx.serve(snapshot_panel, lambda user: panels.savings_opportunities(user, account_id=account_id))
+
+
+async def recent_payments_panel(ctx: DashboardContext, params: dict) -> dict:
+    limit = int(params.get("limit", 20))
+
+    # The snapshot keeps every payment, only the limit is applied here
+    result = await ctx.serve("recentPayments", lambda user: panels.recent_payments(user, limit=None))
+    return {**result, "transactions": result["transactions"][:limit]}
+
+
+async def accounts_panel(ctx: DashboardContext, params: dict) -> dict:
+    connections_list = panels.connection_list(await database_async.get_user_basiq_connections(int(ctx.user_id)))
+
+    # Accounts are read from the local store, the sync is shared with the transaction loads above
+    await sync_user_data(ctx.basiq_user_id)
+    stored_accounts = await database_async.get_accounts(ctx.basiq_user_id)
+
+    if "error" in stored_accounts:
+        print(f"Account store error: {stored_accounts['error']}")
+        return {
+            "accounts": [],
+            "message": "Unable to fetch accounts from Basiq",
+            "defaultAccountId": None
+        }
+
+    return panels.accounts_overview(stored_accounts["accounts"], connections_list)
+
+
+# Panel name (same as the single endpoint) -> async builder(ctx, params)
+DASHBOARD_PANELS = {
+    "spendingByCategory": spending_by_category_panel,
+    "enhancedSpendingByCategory": enhanced_spending_panel,
+    "groupedSpendingByPeriod": grouped_spending_panel,
+    "trends": trends_panel,
+    "savingsOpportunities": savings_panel,
+    "recentPayments": recent_payments_panel,
+    "accounts": accounts_panel
+}
+
+
+async def compute_panel(ctx: DashboardContext, name: str, params: dict) -> dict:
+    # A failing panel only fails its own entry, the rest of the dashboard is still returned
+    builder = DASHBOARD_PANELS.get(name)
+    if builder is None:
+        return {"error": f"Unknown panel: {name}"}
+
+    try:
+        return await builder(ctx, params or {})
+    except Exception as e:
+        print("Operation failed")
+        return {"error": str(e)}
+
+
+async def build_dashboard(user_id: str, basiq_user_id: str, panel_requests: list) -> dict:
+    # panel_requests: [(response key, panel name, params)]
+    ctx = DashboardContext(user_id, basiq_user_id)
+
+    results = await asyncio.gather(*[
+        compute_panel(ctx, name, params) for _, name, params in panel_requests
+    ])
+
+    return {key: result for (key, _, _), result in zip(panel_requests, results)}
@@ -4,71 +4,49 @@ from collections import defaultdict, Counter
 from typing import List, Dict, Tuple, Set
 import string
 from ...globals.transactions import Transaction, AllTransactions
+from ...globals.keyword_cooccurrence import KeywordCooccurrence
+from ...globals.description_tokenizer import STOP_WORDS, extract_keywords
+from ...globals.keyword_index import KeywordIndex
+
+# Categories broken down into keyword topics by analyze_unknown_transactions
+UNKNOWN_CATEGORIES = ['unknown', 'uncategorized', 'other']
 
 class EnhancedTransactionAnalysis:
-    def __init__(self, transactions: List[Transaction]):
+    def __init__(self, transactions: List[Transaction], keyword_index: KeywordIndex = None):
         self.transactions = transactions
-        self.stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during',
-            'before', 'after', 'above', 'below', 'between', 'under', 'pty', 'ltd',
-            'inc', 'corp', 'co', 'payment', 'transfer', 'purchase', 'transaction'
-        }
+        self.stop_words = STOP_WORDS
+        # Shared index holding these transactions (e.g. the cached user's AllTransactions.keyword_index),
+        # a private one is built on first use otherwise
+        self.keyword_index = keyword_index
         
     def extract_keywords(self, text: str) -> List[str]:
         """Extract meaningful keywords from transaction description"""
-        # Convert to lowercase and remove special characters
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # Split into words
-        words = text.split()
-        
-        # Remove stop words and short words
-        keywords = [
-            word for word in words 
-            if word not in self.stop_words 
-            and len(word) > 2
-            and not word.isdigit()
-        ]
-        
-        return keywords
+        # Lowercase, special characters removed, stop words / short words / numbers dropped
+        # (cached per description, see description_tokenizer)
+        return extract_keywords(text)
+    
+    def _index_positions(self, transactions: List[Transaction]) -> Tuple[KeywordIndex, List[int]]:
+        # Index + positions of the given transactions, falls back to a private index of
+        # self.transactions when the shared one doesn't hold them
+        if self.keyword_index is not None:
+            positions = self.keyword_index.positions_of(transactions)
+            if positions is not None:
+                return self.keyword_index, positions
+        
+        self.keyword_index = KeywordIndex(self.transactions)
+        return self.keyword_index, self.keyword_index.positions_of(transactions)
     
     def analyze_unknown_transactions(self) -> Dict[str, List[Transaction]]:
         """Group unknown transactions by extracted topics"""
         unknown_transactions = [
             tx for tx in self.transactions 
-            if tx.category.lower() in ['unknown', 'uncategorized', 'other']
+            if tx.category.lower() in UNKNOWN_CATEGORIES
         ]
         
-        # Extract keywords from all unknown transactions
-        keyword_freq = Counter()
-        tx_keywords = {}
-        
-        for tx in unknown_transactions:
-            keywords = self.extract_keywords(tx.description)
-            tx_keywords[tx] = keywords
-            keyword_freq.update(keywords)
-        
-        # Get top keywords (these become our sub-categories)
-        top_keywords = [word for word, count in keyword_freq.most_common(20) if count >= 3]
-        
-        # Group transactions by dominant keyword
-        grouped = defaultdict(list)
-        
-        for tx, keywords in tx_keywords.items():
-            # Find the most relevant top keyword for this transaction
-            assigned = False
-            for keyword in keywords:
-                if keyword in top_keywords:
-                    grouped[keyword.title()].append(tx)
-                    assigned = True
-                    break
-            
-            if not assigned:
-                grouped['Other'].append(tx)
-        
-        return dict(grouped)
+        # Top keywords (these become our sub-categories) are counted from the indexed keywords,
+        # each transaction goes to the top keyword appearing first in its description (posting lists)
+        index, positions = self._index_positions(unknown_transactions)
+        return index.topics(positions, top_n=20, min_count=3)
     
     def get_enhanced_category_analysis(self) -> Dict:
         """Get spending by category with sub-categories for unknowns and broad categories"""
@@ -87,7 +65,8 @@ class EnhancedTransactionAnalysis:
         for category, transactions in category_transactions.items():
             if category.lower() in broad_categories:
                 # Break down into sub-categories
-                if category.lower() in ['unknown', 'uncategorized', 'other']:
+                if category.lower() in UNKNOWN_CATEGORIES:
+                    # Same breakdown for every unknown category, served from the index's topic cache
                     sub_analysis = self.analyze_unknown_transactions()
                 else:
                     # For other broad categories, analyze by merchant/description patterns
@@ -135,35 +114,21 @@ class EnhancedTransactionAnalysis:
         
         return filtered_groups
     
-    def get_correlation_matrix(self) -> Dict[str, Dict[str, float]]:
+    def get_correlation_matrix(self, top_k: int = None, min_support: int = 1) -> Dict[str, Dict[str, int]]:
         """Find correlations between transaction patterns"""
         #  could be expanded to find patterns like:
         # - Transactions that often occur together
         # - Time-based patterns
         # - Amount-based patterns
         
-        keyword_cooccurrence = defaultdict(lambda: defaultdict(int))
-        
-        # Group transactions by day
-        from collections import defaultdict
-        daily_transactions = defaultdict(list)
-        
-        for tx in self.transactions:
-            day_key = tx.date.date()
-            daily_transactions[day_key].append(tx)
-        
-        # Find keywords that appear together on the same day
-        for day, txs in daily_transactions.items():
-            day_keywords = set()
-            for tx in txs:
-                keywords = self.extract_keywords(tx.description)
-                day_keywords.update(keywords)
-            
-            # Count co-occurrences
-            keywords_list = list(day_keywords)
-            for i, kw1 in enumerate(keywords_list):
-                for kw2 in keywords_list[i+1:]:
-                    keyword_cooccurrence[kw1][kw2] += 1
-                    keyword_cooccurrence[kw2][kw1] += 1
-        
-        return dict(keyword_cooccurrence)
+        # Keywords that appear together on the same day, counted over days
+        # top_k / min_support prune the result for long histories (see KeywordCooccurrence)
+        return self.get_keyword_cooccurrence(min_support).to_dict(top_k=top_k)
+    
+    def get_keyword_cooccurrence(self, min_support: int = 1) -> KeywordCooccurrence:
+        """Sparse same-day keyword co-occurrence counts"""
+        return KeywordCooccurrence.build(
+            ((tx.date.date(), tx.description) for tx in self.transactions),
+            self.extract_keywords,
+            min_support=min_support
+        )
@@ -1,92 +1,235 @@
 # analysis/globals/category_grouper.py
 from typing import Dict, List, Tuple
 import re
-from collections import defaultdict
+import os
+import json
+import hashlib
+import asyncio
+import threading
+from collections import defaultdict, OrderedDict
+import database_async
+from ...globals.keyword_matcher import KeywordMatcher
+
+# Super-category mappings with keywords, earlier entries win when several match
+CATEGORY_MAPPINGS = {
+    'Health & Wellness': {
+        'keywords': ['health', 'medical', 'pharmacy', 'doctor', 'hospital', 'clinic', 
+                    'dental', 'optometry', 'therapy', 'insurance', 'medicare', 'gym', 
+                    'fitness', 'sport', 'wellness', 'vitamin', 'supplement'],
+        'exact_matches': ['Health Care Services', 'Health Insurance', 'General Insurance', 
+                        'Sports and Recreation', 'Pharmacies']
+    },
+    'Transportation': {
+        'keywords': ['transport', 'fuel', 'petrol', 'gas', 'parking', 'toll', 'uber', 
+                    'taxi', 'bus', 'train', 'metro', 'vehicle', 'automotive', 'car'],
+        'exact_matches': ['Fuel Retailing', 'Transportation Services', 'Public Transport',
+                        'Vehicle Maintenance', 'Parking']
+    },
+    'Food & Dining': {
+        'keywords': ['food', 'restaurant', 'cafe', 'coffee', 'takeaway', 'delivery',
+                    'dining', 'meal', 'lunch', 'dinner', 'breakfast', 'fast food',
+                    'bakery', 'bar', 'pub'],
+        'exact_matches': ['Cafes, Restaurants and Takeaway Food Services', 
+                        'Food Retailing', 'Supermarket and Grocery Stores']
+    },
+    'Shopping & Retail': {
+        'keywords': ['retail', 'shopping', 'store', 'shop', 'fashion', 'clothing',
+                    'electronics', 'hardware', 'department', 'online', 'ecommerce'],
+        'exact_matches': ['General Retailing', 'Clothing Retailing', 'Department Stores',
+                        'Online Shopping', 'Hardware Retailing']
+    },
+    'Financial Services': {
+        'keywords': ['bank', 'finance', 'loan', 'credit', 'mortgage', 'investment',
+                    'insurance', 'atm', 'withdrawal', 'deposit', 'transfer'],
+        'exact_matches': ['Non-Depository Financing', 'Banking Services', 
+                        'Investment Services', 'Financial Planning']
+    },
+    'Utilities & Services': {
+        'keywords': ['electricity', 'gas', 'water', 'internet', 'phone', 'mobile',
+                    'telecom', 'utility', 'council', 'rates'],
+        'exact_matches': ['Utilities', 'Telecommunications', 'Internet Services',
+                        'Council Services']
+    },
+    'Entertainment & Leisure': {
+        'keywords': ['entertainment', 'movie', 'cinema', 'gaming', 'music', 'streaming',
+                    'subscription', 'hobby', 'leisure', 'recreation'],
+        'exact_matches': ['Entertainment Services', 'Streaming Services', 
+                        'Gaming', 'Hobbies']
+    },
+    'Education & Professional': {
+        'keywords': ['education', 'school', 'university', 'course', 'training',
+                    'professional', 'conference', 'book', 'learning'],
+        'exact_matches': ['Education Services', 'Professional Services', 
+                        'Training and Development']
+    },
+    'Home & Living': {
+        'keywords': ['home', 'furniture', 'appliance', 'maintenance', 'repair',
+                    'cleaning', 'garden', 'hardware', 'renovation'],
+        'exact_matches': ['Home Maintenance', 'Furniture and Appliances', 
+                        'Home Services']
+    }
+}
+
+# Exact category name -> super category (first mapping listing a name wins, like the old loop)
+EXACT_MATCHES = {}
+for _super_cat, _rules in CATEGORY_MAPPINGS.items():
+    for _name in _rules['exact_matches']:
+        EXACT_MATCHES.setdefault(_name, _super_cat)
+
+# Every keyword compiled once, classify_category is a single pass over the category name
+KEYWORD_MATCHER = KeywordMatcher(
+    (super_cat, rules['keywords']) for super_cat, rules in CATEGORY_MAPPINGS.items()
+)
+
+
+# Hash of the rules above, stored with every persisted assignment so edits to the rules invalidate them
+RULES_VERSION = hashlib.sha1(json.dumps(CATEGORY_MAPPINGS, sort_keys=True).encode()).hexdigest()[:12]
+
+# Most category names memoized at once (least recently used dropped first)
+CATEGORY_CACHE_MAX_ENTRIES = int(os.getenv("CATEGORY_CACHE_MAX_ENTRIES", "4096"))
+
+# Keep learned assignments in the category_group_map table across restarts
+CATEGORY_MAP_PERSIST = os.getenv("CATEGORY_MAP_PERSIST", "true").lower() in ("1", "true", "yes")
+
+# Seconds between writes of newly learned assignments
+CATEGORY_MAP_FLUSH_INTERVAL = float(os.getenv("CATEGORY_MAP_FLUSH_INTERVAL", "30"))
+
+
+class ClassificationCache:
+    # category name -> super category
+    # The set of Basiq/ANZSIC category titles is small and stable, so after the first few requests
+    # every classification is a dict hit. The DB map is read once at startup (load) and new assignments
+    # are written in batches by a background task (flush_periodically), never on the request path
+
+    def __init__(self, max_entries: int = CATEGORY_CACHE_MAX_ENTRIES, persist: bool = CATEGORY_MAP_PERSIST):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._pending = {}  # assignments not yet written to the DB
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.loaded_from_db = 0
+        self.saved_to_db = 0
+
+    async def load(self):
+        # Warms the cache from the category_group_map table, called once at startup
+        if not self.persist:
+            return
+
+        result = await database_async.get_category_group_map(RULES_VERSION)
+        if "error" in result:
+            print(f"Category map load error: {result['error']}")
+            return
+
+        mappings = list(result["mappings"].items())[:self.max_entries]
+        with self._lock:
+            for name, super_cat in mappings:
+                # Assignments made since startup are newer, keep them
+                self._entries.setdefault(name, super_cat)
+            self.loaded_from_db = len(mappings)
+
+    def get(self, category_name: str):
+        with self._lock:
+            super_cat = self._entries.get(category_name)
+            if super_cat is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(category_name)
+            self.hits += 1
+            return super_cat
+
+    def put(self, category_name: str, super_cat: str):
+        with self._lock:
+            self._entries[category_name] = super_cat
+            self._entries.move_to_end(category_name)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            # Capped like the entries in case the flush task isn't running (scripts)
+            if self.persist and len(self._pending) < self.max_entries:
+                self._pending[category_name] = super_cat
+
+    async def flush(self):
+        # Writes the assignments learned since the last flush
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+        result = await database_async.save_category_group_map(RULES_VERSION, pending)
+        if "error" in result:
+            print(f"Category map save error: {result['error']}")
+            return
+
+        with self._lock:
+            self.saved_to_db += len(pending)
+
+    async def flush_periodically(self, interval: float = CATEGORY_MAP_FLUSH_INTERVAL):
+        # Background task started at startup, cancelled (after a last flush) at shutdown
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print("Operation failed")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "rules_version": RULES_VERSION,
+                "persist": self.persist,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "loaded_from_db": self.loaded_from_db,
+                "saved_to_db": self.saved_to_db,
+                "pending": len(self._pending)
+            }
+
+
+classification_cache = ClassificationCache()
+
 
 class CategoryGrouper:
     """Groups transaction categories into super-categories using keyword matching and rules"""
     
     def __init__(self):
-        # Define super-category mappings with keywords
-        self.category_mappings = {
-            'Health & Wellness': {
-                'keywords': ['health', 'medical', 'pharmacy', 'doctor', 'hospital', 'clinic', 
-                            'dental', 'optometry', 'therapy', 'insurance', 'medicare', 'gym', 
-                            'fitness', 'sport', 'wellness', 'vitamin', 'supplement'],
-                'exact_matches': ['Health Care Services', 'Health Insurance', 'General Insurance', 
-                                'Sports and Recreation', 'Pharmacies']
-            },
-            'Transportation': {
-                'keywords': ['transport', 'fuel', 'petrol', 'gas', 'parking', 'toll', 'uber', 
-                            'taxi', 'bus', 'train', 'metro', 'vehicle', 'automotive', 'car'],
-                'exact_matches': ['Fuel Retailing', 'Transportation Services', 'Public Transport',
-                                'Vehicle Maintenance', 'Parking']
-            },
-            'Food & Dining': {
-                'keywords': ['food', 'restaurant', 'cafe', 'coffee', 'takeaway', 'delivery',
-                            'dining', 'meal', 'lunch', 'dinner', 'breakfast', 'fast food',
-                            'bakery', 'bar', 'pub'],
-                'exact_matches': ['Cafes, Restaurants and Takeaway Food Services', 
-                                'Food Retailing', 'Supermarket and Grocery Stores']
-            },
-            'Shopping & Retail': {
-                'keywords': ['retail', 'shopping', 'store', 'shop', 'fashion', 'clothing',
-                            'electronics', 'hardware', 'department', 'online', 'ecommerce'],
-                'exact_matches': ['General Retailing', 'Clothing Retailing', 'Department Stores',
-                                'Online Shopping', 'Hardware Retailing']
-            },
-            'Financial Services': {
-                'keywords': ['bank', 'finance', 'loan', 'credit', 'mortgage', 'investment',
-                            'insurance', 'atm', 'withdrawal', 'deposit', 'transfer'],
-                'exact_matches': ['Non-Depository Financing', 'Banking Services', 
-                                'Investment Services', 'Financial Planning']
-            },
-            'Utilities & Services': {
-                'keywords': ['electricity', 'gas', 'water', 'internet', 'phone', 'mobile',
-                            'telecom', 'utility', 'council', 'rates'],
-                'exact_matches': ['Utilities', 'Telecommunications', 'Internet Services',
-                                'Council Services']
-            },
-            'Entertainment & Leisure': {
-                'keywords': ['entertainment', 'movie', 'cinema', 'gaming', 'music', 'streaming',
-                            'subscription', 'hobby', 'leisure', 'recreation'],
-                'exact_matches': ['Entertainment Services', 'Streaming Services', 
-                                'Gaming', 'Hobbies']
-            },
-            'Education & Professional': {
-                'keywords': ['education', 'school', 'university', 'course', 'training',
-                            'professional', 'conference', 'book', 'learning'],
-                'exact_matches': ['Education Services', 'Professional Services', 
-                                'Training and Development']
-            },
-            'Home & Living': {
-                'keywords': ['home', 'furniture', 'appliance', 'maintenance', 'repair',
-                            'cleaning', 'garden', 'hardware', 'renovation'],
-                'exact_matches': ['Home Maintenance', 'Furniture and Appliances', 
-                                'Home Services']
-            }
-        }
+        # Define super-category mappings with keywords (see CATEGORY_MAPPINGS)
+        self.category_mappings = CATEGORY_MAPPINGS
         
         # Categories that need special NLP processing
         self.special_categories = ['unknown', 'uncategorized', 'other', 'no category']
     
     def classify_category(self, category_name: str) -> str:
         """Classify a category into a super-category"""
-        category_lower = category_name.lower()
+        # Seen before (this process or a previous one)
+        super_cat = classification_cache.get(category_name)
+        if super_cat is not None:
+            return super_cat
         
+        super_cat = self._classify_uncached(category_name)
+        classification_cache.put(category_name, super_cat)
+        return super_cat
+    
+    def _classify_uncached(self, category_name: str) -> str:
         # Check exact matches first
-        for super_cat, rules in self.category_mappings.items():
-            if category_name in rules['exact_matches']:
-                return super_cat
-        
-        # Check keyword matches
-        for super_cat, rules in self.category_mappings.items():
-            for keyword in rules['keywords']:
-                if keyword in category_lower:
-                    return super_cat
+        super_cat = EXACT_MATCHES.get(category_name)
+        if super_cat is not None:
+            return super_cat
         
-        # If no match found, return 'Other'
-        return 'Other Services'
+        # Check keyword matches, if no match found, return 'Other'
+        return KEYWORD_MATCHER.match(category_name, default='Other Services')
     
     def group_categories(self, categories_data: List[Dict]) -> Dict[str, Dict]:
         """
@@ -4,6 +4,64 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 import re
 from typing import List, Dict, Any
+from ...globals.keyword_matcher import KeywordMatcher
+from ...globals.description_tokenizer import merchant_key
+
+# Common subscription keywords
+SUBSCRIPTION_KEYWORDS = [
+    'subscription', 'monthly', 'annual', 'membership', 'premium',
+    'pro', 'plus', 'prime', 'recurring', 'billing', 'renewal'
+]
+
+# Known subscription services
+KNOWN_SUBSCRIPTIONS = {
+    'spotify': {'category': 'Music Streaming', 'typical_range': (9, 20)},
+    'netflix': {'category': 'Video Streaming', 'typical_range': (10, 25)},
+    'apple': {'category': 'Various', 'typical_range': (0.99, 50)},
+    'google': {'category': 'Various', 'typical_range': (1.99, 50)},
+    'amazon prime': {'category': 'Shopping/Video', 'typical_range': (10, 15)},
+    'gym': {'category': 'Fitness', 'typical_range': (20, 200)},
+    'adobe': {'category': 'Software', 'typical_range': (10, 60)},
+    'microsoft': {'category': 'Software', 'typical_range': (5, 30)},
+    'dropbox': {'category': 'Storage', 'typical_range': (10, 20)},
+    'linkedin': {'category': 'Professional', 'typical_range': (30, 60)},
+    'audible': {'category': 'Audiobooks', 'typical_range': (15, 25)},
+    'disney': {'category': 'Video Streaming', 'typical_range': (8, 15)},
+    'hulu': {'category': 'Video Streaming', 'typical_range': (8, 20)},
+    'youtube': {'category': 'Video Streaming', 'typical_range': (12, 25)},
+    'patreon': {'category': 'Content Support', 'typical_range': (1, 100)},
+    'news': {'category': 'News/Media', 'typical_range': (5, 40)},
+    'times': {'category': 'News/Media', 'typical_range': (5, 40)},
+    'post': {'category': 'News/Media', 'typical_range': (5, 40)},
+}
+
+# Category keywords mapping
+CATEGORY_KEYWORDS = {
+    'Streaming': ['stream', 'tv', 'video', 'movie', 'watch', 'entertainment'],
+    'Music': ['music', 'audio', 'song', 'playlist', 'radio'],
+    'Software': ['software', 'app', 'cloud', 'saas', 'tool', 'platform'],
+    'Gaming': ['game', 'gaming', 'xbox', 'playstation', 'steam', 'nintendo'],
+    'Fitness': ['gym', 'fitness', 'workout', 'yoga', 'health', 'training'],
+    'Food': ['meal', 'food', 'delivery', 'kitchen', 'recipe'],
+    'News/Media': ['news', 'magazine', 'journal', 'times', 'post', 'media'],
+    'Storage': ['storage', 'backup', 'drive', 'cloud'],
+    'Professional': ['professional', 'business', 'linkedin', 'career'],
+    'Education': ['course', 'learning', 'education', 'tutorial', 'masterclass'],
+    'Shopping': ['prime', 'membership', 'delivery', 'shopping'],
+    'Other': []
+}
+
+# Keyword tables compiled once (see analysis/globals/keyword_matcher.py)
+SUBSCRIPTION_KEYWORD_MATCHER = KeywordMatcher([('subscription', SUBSCRIPTION_KEYWORDS)])
+KNOWN_SERVICE_MATCHER = KeywordMatcher([('known', KNOWN_SUBSCRIPTIONS.keys())])
+
+# _detect_category order: known services, then category keywords, then generic subscription words
+CATEGORY_MATCHER = KeywordMatcher(
+    [(info['category'], [service]) for service, info in KNOWN_SUBSCRIPTIONS.items()]
+    + list(CATEGORY_KEYWORDS.items())
+    + [('Other Subscription', SUBSCRIPTION_KEYWORDS)]
+)
+
 
 class SubscriptionDetector:
     """
@@ -12,32 +70,10 @@ class SubscriptionDetector:
     
     def __init__(self):
         # Common subscription keywords
-        self.subscription_keywords = [
-            'subscription', 'monthly', 'annual', 'membership', 'premium',
-            'pro', 'plus', 'prime', 'recurring', 'billing', 'renewal'
-        ]
+        self.subscription_keywords = SUBSCRIPTION_KEYWORDS
         
         # Known subscription services
-        self.known_subscriptions = {
-            'spotify': {'category': 'Music Streaming', 'typical_range': (9, 20)},
-            'netflix': {'category': 'Video Streaming', 'typical_range': (10, 25)},
-            'apple': {'category': 'Various', 'typical_range': (0.99, 50)},
-            'google': {'category': 'Various', 'typical_range': (1.99, 50)},
-            'amazon prime': {'category': 'Shopping/Video', 'typical_range': (10, 15)},
-            'gym': {'category': 'Fitness', 'typical_range': (20, 200)},
-            'adobe': {'category': 'Software', 'typical_range': (10, 60)},
-            'microsoft': {'category': 'Software', 'typical_range': (5, 30)},
-            'dropbox': {'category': 'Storage', 'typical_range': (10, 20)},
-            'linkedin': {'category': 'Professional', 'typical_range': (30, 60)},
-            'audible': {'category': 'Audiobooks', 'typical_range': (15, 25)},
-            'disney': {'category': 'Video Streaming', 'typical_range': (8, 15)},
-            'hulu': {'category': 'Video Streaming', 'typical_range': (8, 20)},
-            'youtube': {'category': 'Video Streaming', 'typical_range': (12, 25)},
-            'patreon': {'category': 'Content Support', 'typical_range': (1, 100)},
-            'news': {'category': 'News/Media', 'typical_range': (5, 40)},
-            'times': {'category': 'News/Media', 'typical_range': (5, 40)},
-            'post': {'category': 'News/Media', 'typical_range': (5, 40)},
-        }
+        self.known_subscriptions = KNOWN_SUBSCRIPTIONS
         
     def detect_subscriptions(self, transactions: List[Any]) -> List[Dict[str, Any]]:
         """
@@ -89,23 +125,9 @@ class SubscriptionDetector:
         """
         Normalize transaction description for grouping
         """
-        # Convert to lowercase
-        normalized = description.lower()
-        
-        # Remove common transaction codes and numbers
-        normalized = re.sub(r'\b\d{4,}\b', '', normalized)  # Remove long numbers
-        normalized = re.sub(r'#\d+', '', normalized)  # Remove reference numbers
-        normalized = re.sub(r'\*\d+', '', normalized)  # Remove masked numbers
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)  # Remove special chars
-        
-        # Extract key merchant name (usually first meaningful words)
-        words = normalized.split()
-        if words:
-            # Take first 2-3 meaningful words
-            meaningful_words = [w for w in words if len(w) > 2][:3]
-            normalized = ' '.join(meaningful_words)
-        
-        return normalized.strip()
+        # Lowercase, transaction codes removed, first 3 meaningful words
+        # (cached per description, see description_tokenizer)
+        return merchant_key(description)
     
     def _analyze_recurrence_pattern(self, transactions: List[Dict]) -> Dict[str, Any]:
         """
@@ -187,41 +209,8 @@ class SubscriptionDetector:
         """
         Detect subscription category using AI logic
         """
-        desc_lower = description.lower()
-        
-        # Check against known subscriptions
-        for service, info in self.known_subscriptions.items():
-            if service in desc_lower:
-                return info['category']
-        
-        # Category keywords mapping
-        category_keywords = {
-            'Streaming': ['stream', 'tv', 'video', 'movie', 'watch', 'entertainment'],
-            'Music': ['music', 'audio', 'song', 'playlist', 'radio'],
-            'Software': ['software', 'app', 'cloud', 'saas', 'tool', 'platform'],
-            'Gaming': ['game', 'gaming', 'xbox', 'playstation', 'steam', 'nintendo'],
-            'Fitness': ['gym', 'fitness', 'workout', 'yoga', 'health', 'training'],
-            'Food': ['meal', 'food', 'delivery', 'kitchen', 'recipe'],
-            'News/Media': ['news', 'magazine', 'journal', 'times', 'post', 'media'],
-            'Storage': ['storage', 'backup', 'drive', 'cloud'],
-            'Professional': ['professional', 'business', 'linkedin', 'career'],
-            'Education': ['course', 'learning', 'education', 'tutorial', 'masterclass'],
-            'Shopping': ['prime', 'membership', 'delivery', 'shopping'],
-            'Other': []
-        }
-        
-        # Check each category
-        for category, keywords in category_keywords.items():
-            for keyword in keywords:
-                if keyword in desc_lower:
-                    return category
-        
-        # Check for subscription keywords
-        for keyword in self.subscription_keywords:
-            if keyword in desc_lower:
-                return 'Other Subscription'
-        
-        return 'Other'
+        # Known services, category keywords and subscription keywords in one pass
+        return CATEGORY_MATCHER.match(description, default='Other')
     
     def _calculate_confidence(self, subscription_info: Dict, transactions: List[Dict]) -> float:
         """
@@ -245,12 +234,12 @@ class SubscriptionDetector:
         desc_lower = transactions[0]['description'].lower()
         
         # Check for subscription keywords
-        keyword_found = any(keyword in desc_lower for keyword in self.subscription_keywords)
+        keyword_found = SUBSCRIPTION_KEYWORD_MATCHER.contains_any(desc_lower)
         if keyword_found:
             confidence += 0.2
         
         # Check if it's a known service
-        known_service = any(service in desc_lower for service in self.known_subscriptions.keys())
+        known_service = KNOWN_SERVICE_MATCHER.contains_any(desc_lower)
         if known_service:
             confidence += 0.1
         
@@ -0,0 +1,645 @@
+# Dashboard panel computations
+# Moved out of main.py so the endpoints, the analytics snapshot (analysis/globals/analytics_snapshot.py)
+# and the dashboard batch endpoint all share the same code. Every function takes an already loaded User.
+
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from analysis.globals.transactions import AllTransactions
+from analysis.globals.normalizer import SPECIAL_CATEGORIES
+
+
+def period_label_for(period: str, now: datetime) -> str:
+    if period == "month":
+        return f"{now.strftime('%B %Y')}"
+    if period == "year":
+        return f"{now.year}"
+    return "All Time"
+
+
+def spending_by_category(user) -> dict:
+    # Category totals for recharts (deepAnalysis.subscriptionDetectorspendingByCategory)
+    allTransactions = user.get_transaction_group()
+    categories, amounts = allTransactions.category_total_points()
+
+    print(f"Categories found: {len(categories)}")
+
+    # Handle empty data
+    if not categories or not amounts:
+        return {
+            "categories": [],
+            "total": 0,
+            "highest": {
+                "category": "No data",
+                "amount": 0
+            },
+            "message": "No transactions found"
+        }
+
+    # Calculate totals
+    total = sum(amounts)
+    max_amount = max(amounts)
+    max_index = amounts.index(max_amount)
+
+    return {
+        "categories": [
+            {"name": cat, "amount": amt}
+            for cat, amt in zip(categories, amounts)
+        ],
+        "total": total,
+        "highest": {
+            "category": categories[max_index],
+            "amount": max_amount
+        }
+    }
+
+
+def enhanced_spending_by_category(user) -> dict:
+    # Category totals + subcategories for unknown or broad categories
+    allTransactions = user.get_transaction_group()
+    categories, amounts = allTransactions.category_total_points()
+
+    # Enhanced analysis
+    from analysis.transactionAnalysis.deepAnalysis.categoryAssigner import EnhancedTransactionAnalysis
+    enhanced_analyzer = EnhancedTransactionAnalysis(user.transactions, keyword_index=allTransactions.keyword_index)
+    enhanced_data = enhanced_analyzer.get_enhanced_category_analysis()
+
+    total = sum(amounts) if amounts else 0
+
+    # Prepare enhanced categories (ones that have subcategories)
+    enhanced_categories = {}
+    for cat, data in enhanced_data.items():
+        if data['subcategories']:
+            enhanced_categories[cat] = {
+                'total': data['total'],
+                'count': data['transaction_count'],
+                'subcategories': [
+                    {
+                        'name': subcat,
+                        'amount': subdata['amount'],
+                        'count': subdata['count']
+                    }
+                    for subcat, subdata in data['subcategories'].items()
+                ]
+            }
+
+    return {
+        "categories": [
+            {"name": cat, "amount": amt}
+            for cat, amt in zip(categories, amounts)
+        ],
+        "enhanced_categories": enhanced_categories,
+        "total": total,
+        "insights": {
+            "unknown_ratio": enhanced_data.get('Unknown', {}).get('total', 0) / total if total > 0 else 0,
+            "categories_with_subcategories": list(enhanced_categories.keys())
+        }
+    }
+
+
+def grouped_spending_by_period(user, period: str = "month", group_categories: bool = True,
+                               account_id: str = None, account_name: str = None) -> dict:
+    # Spending for the period, optionally grouped into super categories
+    # With account_id only that account's debits are used (the user should be loaded without filters)
+    now = datetime.now()
+    period_label = period_label_for(period, now)
+
+    if account_id:
+        account_group = user.get_transaction_group().account(account_id)
+        filtered_transactions = [
+            tx for tx in account_group.period_slice(period, now)
+            if tx.direction == "debit"
+        ]
+    else:
+        filtered_transactions = user.get_transaction_group().period_slice(period, now)
+
+    print(f"Filtered transactions count: {len(filtered_transactions)}")
+
+    # Standard analysis
+    filtered_group = AllTransactions(filtered_transactions)
+    categories, amounts = filtered_group.category_total_points()
+
+    print(f"Categories found: {len(categories)}")
+
+    if not categories:
+        return {
+            "categories": [],
+            "grouped_categories": [],
+            "enhanced_categories": {},
+            "total": 0,
+            "period": period,
+            "period_label": period_label,
+            "num_transactions": 0,
+            "account_name": account_name,
+            "message": f"No transactions found for {period_label}"
+        }
+
+    # Prepare category data
+    category_data = [
+        {"name": cat, "amount": amt}
+        for cat, amt in zip(categories, amounts)
+    ]
+
+    total_spending = sum(amounts)
+
+    # Group categories if requested
+    grouped_categories_array = []
+    category_insights = {}
+
+    if group_categories:
+        try:
+            from analysis.transactionAnalysis.deepAnalysis.categoryGrouper import CategoryGrouper
+            grouper = CategoryGrouper()
+
+            print(f"Grouping {len(category_data)} categories")
+            grouped_dict = grouper.group_categories(category_data)
+
+            # Convert to array format
+            for group_name, group_info in grouped_dict.items():
+                grouped_categories_array.append({
+                    'name': group_name,
+                    'total': group_info['total'],
+                    'percentage': group_info['percentage'],
+                    'categories': group_info['subcategories']
+                })
+
+            # Sort by total descending
+            grouped_categories_array.sort(key=lambda x: x['total'], reverse=True)
+
+            # Get category insights
+            if hasattr(grouper, 'get_category_insights'):
+                category_insights = grouper.get_category_insights(grouped_dict)
+
+            print(f"Created {len(grouped_categories_array)} groups")
+
+        except Exception as e:
+            print("Operation failed")
+            import traceback
+            traceback.print_exc()
+            grouped_categories_array = []
+
+    # Enhanced analysis for unknown categories
+    enhanced_categories = {}
+    try:
+        from analysis.transactionAnalysis.deepAnalysis.categoryAssigner import EnhancedTransactionAnalysis
+
+        for cat_name in categories:
+            if cat_name.lower() in SPECIAL_CATEGORIES:
+                cat_transactions = [
+                    tx for tx in filtered_transactions
+                    if tx.category.lower() == cat_name.lower()
+                ]
+
+                if cat_transactions:
+                    # The user's keyword index already holds these transactions
+                    analyzer = EnhancedTransactionAnalysis(
+                        cat_transactions, keyword_index=user.get_transaction_group().keyword_index
+                    )
+                    unknown_analysis = analyzer.analyze_unknown_transactions()
+
+                    subcats = []
+                    for subcat_name, subcat_txs in unknown_analysis.items():
+                        subcats.append({
+                            'name': subcat_name,
+                            'amount': sum(tx.amount for tx in subcat_txs),
+                            'count': len(subcat_txs)
+                        })
+
+                    if subcats:
+                        enhanced_categories[cat_name] = {
+                            'total': sum(tx.amount for tx in cat_transactions),
+                            'count': len(cat_transactions),
+                            'subcategories': sorted(subcats, key=lambda x: x['amount'], reverse=True)
+                        }
+    except Exception as e:
+        print("Operation failed")
+
+    # Calculate monthly stats
+    monthly_totals = defaultdict(float)
+    for tx in filtered_transactions:
+        month_key = tx.date.strftime('%Y-%m')
+        monthly_totals[month_key] += tx.amount
+
+    num_months = len(monthly_totals) if monthly_totals else 1
+    avg_monthly = total_spending / num_months if num_months > 0 else 0
+
+    return {
+        "categories": category_data,
+        "grouped_categories": grouped_categories_array,
+        "enhanced_categories": enhanced_categories,
+        "total": total_spending,
+        "period": period,
+        "period_label": period_label,
+        "average_monthly": avg_monthly,
+        "num_transactions": len(filtered_transactions),
+        "account_name": account_name,
+        "insights": {
+            "category_insights": category_insights,
+            "num_months": num_months,
+            "total_categories": len(categories),
+            "total_groups": len(grouped_categories_array),
+            "has_uncategorized": any(cat.lower() in SPECIAL_CATEGORIES for cat in categories) if categories else False
+        }
+    }
+
+
+def spending_trends(user, months: int = 6, account_id: str = None) -> dict:
+    # Monthly totals over the last `months` months with a simple linear prediction
+    import numpy as np
+
+    # Narrowed to one account through the per-account index if requested
+    transaction_group = user.get_transaction_group()
+    if account_id:
+        transaction_group = transaction_group.account(account_id)
+
+    monthly_data = defaultdict(lambda: defaultdict(float))
+    category_totals = defaultdict(float)
+
+    # Calculate date range
+    end_date = datetime.now()
+    start_date = end_date - relativedelta(months=months)
+
+    # Filter and group transactions
+    for tx in transaction_group.slice(start_date):
+        month_key = tx.date.strftime('%Y-%m')
+        monthly_data[month_key][tx.category] += tx.amount
+        category_totals[tx.category] += tx.amount
+
+    # Sort months chronologically
+    sorted_months = sorted(monthly_data.keys())
+
+    # Prepare trend data
+    trends = []
+    for month in sorted_months:
+        month_total = sum(monthly_data[month].values())
+        trends.append({
+            "month": month,
+            "total": month_total,
+            "categories": dict(monthly_data[month])
+        })
+
+    # Calculate statistics and predictions
+    if len(trends) >= 3:
+        # Simple linear regression for prediction
+        x = np.array(range(len(trends)))
+        y = np.array([t["total"] for t in trends])
+
+        # Calculate trend line
+        A = np.vstack([x, np.ones(len(x))]).T
+        m, c = np.linalg.lstsq(A, y, rcond=None)[0]
+
+        # Predict next month
+        next_month_prediction = m * len(trends) + c
+
+        # Calculate volatility (standard deviation)
+        volatility = np.std(y)
+
+        insights = {
+            "trend": "increasing" if m > 0 else "decreasing",
+            "average_monthly": float(np.mean(y)),
+            "next_month_prediction": float(max(0, next_month_prediction)),
+            "volatility": float(volatility),
+            "volatility_rating": "high" if volatility > np.mean(y) * 0.3 else "moderate" if volatility > np.mean(y) * 0.15 else "low",
+            "change_rate": float(m),
+            "months_analyzed": len(trends)
+        }
+    else:
+        insights = {
+            "message": "Not enough data for trend analysis",
+            "months_analyzed": len(trends)
+        }
+
+    # Identify spending patterns
+    patterns = []
+
+    # Seasonal patterns
+    if len(trends) >= 12:
+        monthly_averages = defaultdict(list)
+        for trend in trends:
+            month_num = int(trend["month"].split("-")[1])
+            monthly_averages[month_num].append(trend["total"])
+
+        # Find high spending months
+        avg_by_month = {k: np.mean(v) for k, v in monthly_averages.items()}
+        overall_avg = np.mean(list(avg_by_month.values()))
+
+        high_months = [k for k, v in avg_by_month.items() if v > overall_avg * 1.2]
+        if high_months:
+            patterns.append({
+                "type": "seasonal",
+                "description": f"Higher spending typically in months: {high_months}"
+            })
+
+    # Category growth patterns
+    category_trends = defaultdict(list)
+    for trend in trends:
+        for cat, amount in trend["categories"].items():
+            category_trends[cat].append(amount)
+
+    growing_categories = []
+    declining_categories = []
+
+    for cat, amounts in category_trends.items():
+        if len(amounts) >= 3:
+            x = np.array(range(len(amounts)))
+            y = np.array(amounts)
+            A = np.vstack([x, np.ones(len(x))]).T
+            m, _ = np.linalg.lstsq(A, y, rcond=None)[0]
+
+            if m > np.mean(amounts) * 0.1:  # Growing by more than 10% of average
+                growing_categories.append(cat)
+            elif m < -np.mean(amounts) * 0.1:  # Declining by more than 10% of average
+                declining_categories.append(cat)
+
+    if growing_categories:
+        patterns.append({
+            "type": "category_growth",
+            "description": f"Increasing spending in: {', '.join(growing_categories[:3])}"
+        })
+
+    if declining_categories:
+        patterns.append({
+            "type": "category_decline",
+            "description": f"Decreasing spending in: {', '.join(declining_categories[:3])}"
+        })
+
+    return {
+        "trends": trends,
+        "insights": insights,
+        "patterns": patterns,
+        "top_categories": sorted(
+            [(cat, total) for cat, total in category_totals.items()],
+            key=lambda x: x[1],
+            reverse=True
+        )[:5]
+    }
+
+
+def savings_opportunities(user, account_id: str = None) -> dict:
+    # Savings opportunities from the last 3 months of spending
+    transaction_group = user.get_transaction_group()
+    if account_id:
+        transaction_group = transaction_group.account(account_id)
+
+    three_months_ago = datetime.now() - timedelta(days=90)
+    recent_transactions = transaction_group.slice(three_months_ago)
+
+    # Group by category and merchant
+    category_spending = defaultdict(float)
+    merchant_frequency = defaultdict(int)
+    merchant_spending = defaultdict(float)
+    subscription_candidates = []
+
+    for tx in recent_transactions:
+        category_spending[tx.category] += tx.amount
+        merchant_frequency[tx.description] += 1
+        merchant_spending[tx.description] += tx.amount
+
+        # Identify potential subscriptions (recurring similar amounts)
+        if 5 <= tx.amount <= 200:  # Typical subscription range
+            subscription_candidates.append(tx)
+
+    opportunities = []
+
+    # 1. High frequency small purchases (e.g., daily coffee)
+    for merchant, frequency in merchant_frequency.items():
+        if frequency >= 10:  # More than 3 times a month average
+            avg_amount = merchant_spending[merchant] / frequency
+            if 2 <= avg_amount <= 20:  # Small purchase range
+                monthly_total = (frequency / 3) * avg_amount  # Average per month
+                opportunities.append({
+                    "type": "high_frequency",
+                    "category": "Reduce frequent small purchases",
+                    "description": f"You spend ~${monthly_total:.0f}/month at {merchant[:30]}",
+                    "suggestion": f"Reducing by 50% could save ${monthly_total * 0.5:.0f}/month",
+                    "savings_potential": monthly_total * 0.5,
+                    "difficulty": "easy"
+                })
+
+    # 2. Category overspending (compared to typical budgets)
+    typical_budget_percentages = {
+        "eating out": 0.10,  # 10% of income
+        "entertainment": 0.05,
+        "shopping": 0.10,
+        "groceries": 0.15
+    }
+
+    total_spending = sum(category_spending.values())
+
+    for category, amount in category_spending.items():
+        percentage = amount / total_spending if total_spending > 0 else 0
+
+        for budget_cat, typical_pct in typical_budget_percentages.items():
+            if budget_cat.lower() in category.lower() and percentage > typical_pct * 1.5:
+                monthly_amount = amount / 3  # 3 months of data
+                excess = monthly_amount - (total_spending / 3 * typical_pct)
+
+                opportunities.append({
+                    "type": "category_overspending",
+                    "category": f"Reduce {category} spending",
+                    "description": f"You spend {percentage*100:.0f}% on {category} (typical: {typical_pct*100:.0f}%)",
+                    "suggestion": f"Reducing to typical levels could save ${excess:.0f}/month",
+                    "savings_potential": excess,
+                    "difficulty": "moderate"
+                })
+
+    # 3. Subscription audit
+    from analysis.transactionAnalysis.deepAnalysis.subscriptionDetector import SubscriptionDetector
+    detector = SubscriptionDetector()
+    detected_subscriptions = detector.detect_subscriptions(subscription_candidates)
+
+    for sub in detected_subscriptions:
+        opportunities.append({
+            "type": "subscription",
+            "category": "Review subscriptions",
+            "description": f"Recurring charge: {sub['name']} - ${sub['amount']}/month",
+            "suggestion": "Consider if this subscription is still needed",
+            "savings_potential": sub['amount'],
+            "difficulty": "easy"
+        })
+
+    # 4. Peak spending times
+    time_based_spending = defaultdict(float)
+    for tx in recent_transactions:
+        hour = tx.date.hour
+        if 22 <= hour or hour <= 4:  # Late night
+            time_based_spending["late_night"] += tx.amount
+        elif 6 <= hour <= 9:  # Morning
+            time_based_spending["morning"] += tx.amount
+
+    if time_based_spending["late_night"] > total_spending * 0.1:
+        monthly_late_night = time_based_spending["late_night"] / 3
+        opportunities.append({
+            "type": "behavioral",
+            "category": "Reduce late-night spending",
+            "description": f"You spend ${monthly_late_night:.0f}/month between 10pm-4am",
+            "suggestion": "Late-night purchases are often impulsive",
+            "savings_potential": monthly_late_night * 0.7,
+            "difficulty": "moderate"
+        })
+
+    # Sort by savings potential
+    opportunities.sort(key=lambda x: x["savings_potential"], reverse=True)
+
+    # Calculate total potential savings
+    total_savings = sum(opp["savings_potential"] for opp in opportunities[:5])  # Top 5 realistic
+
+    return {
+        "opportunities": opportunities[:10],  # Return top 10
+        "total_savings_potential": total_savings,
+        "analysis_period": "Last 3 months",
+        "personalized_tips": generate_savings_tips(opportunities)
+    }
+
+
+def generate_savings_tips(opportunities):
+    """Generate personalized tips based on identified opportunities"""
+    tips = []
+
+    # Check what types of opportunities were found
+    opportunity_types = {opp["type"] for opp in opportunities}
+
+    if "high_frequency" in opportunity_types:
+        tips.append({
+            "title": "Batch your purchases",
+            "description": "Consider buying in bulk or preparing at home to reduce frequent small purchases"
+        })
+
+    if "subscription" in opportunity_types:
+        tips.append({
+            "title": "Subscription audit",
+            "description": "Set a monthly reminder to review all subscriptions and cancel unused ones"
+        })
+
+    if "category_overspending" in opportunity_types:
+        tips.append({
+            "title": "Set category budgets",
+            "description": "Use the 50/30/20 rule: 50% needs, 30% wants, 20% savings"
+        })
+
+    if "behavioral" in opportunity_types:
+        tips.append({
+            "title": "Implement cooling-off periods",
+            "description": "Wait 24 hours before making non-essential purchases"
+        })
+
+    return tips
+
+
+def recent_payments(user, limit: int = 20) -> dict:
+    # Recent payment transactions for price comparison, limit=None returns all of them
+    transactions = user.transactions
+
+    print(f"Total transactions: {len(transactions)}")
+
+    payment_transactions = []
+
+    # Categories that are likely to be product purchases
+    product_categories = [
+        'supermarket', 'grocery', 'store', 'shop', 'retail',
+        'electronics', 'clothing', 'department', 'pharmacy',
+        'hardware', 'sporting', 'recreation', 'entertainment',
+        'cafe', 'restaurant', 'takeaway', 'food', 'dining',
+        'online', 'marketplace', 'merchant'
+    ]
+
+    # Keywords to exclude
+    exclude_keywords = [
+        'transfer', 'withdrawal', 'deposit', 'interest', 'fee',
+        'insurance', 'rent', 'mortgage', 'utility', 'bill'
+    ]
+
+    for tx in transactions:
+        # Check if it's a payment
+        if tx.mode == "payment" and 3 < tx.amount < 1000:
+            description_lower = tx.description.lower()
+            category_lower = tx.category.lower()
+
+            # Skip if it contains exclude keywords
+            if any(keyword in description_lower for keyword in exclude_keywords):
+                continue
+
+            # Include if category matches product categories
+            is_product_category = any(cat in category_lower for cat in product_categories)
+
+            # Include if it's a likely product purchase
+            if is_product_category or tx.amount < 200:  # Small amounts likely products
+                # Generate ID
+                tx_id = hashlib.md5(f"{tx.description}{tx.date}{tx.amount}".encode()).hexdigest()[:10]
+
+                payment_transactions.append({
+                    "id": tx_id,
+                    "description": tx.description,
+                    "amount": tx.amount,
+                    "date": tx.date.strftime('%Y-%m-%d'),
+                    "category": tx.category
+                })
+
+    # Sort by date (most recent first)
+    payment_transactions.sort(key=lambda x: x['date'], reverse=True)
+
+    print(f"Found {len(payment_transactions)} payment transactions")
+
+    return {
+        "transactions": payment_transactions[:limit] if limit is not None else payment_transactions,
+        "total": len(payment_transactions)
+    }
+
+
+def connection_list(connections_result) -> list:
+    # database.get_user_basiq_connections result -> list of connections (empty on any error)
+    if connections_result is None:
+        return []
+    if isinstance(connections_result, str):
+        print(f"Connections query returned string: {connections_result}")
+        return []
+    if isinstance(connections_result, dict):
+        if "error" in connections_result:
+            print(f"Connections error: {connections_result['error']}")
+            return []
+        return connections_result.get("connections", [])
+    return []
+
+
+def accounts_overview(account_rows: list, connections_list: list) -> dict:
+    # Stored account rows (database.get_accounts) formatted for the frontend account picker
+    formatted_accounts = []
+    for account in account_rows:
+        # Only include active accounts or if status field doesn't exist
+        if (account["status"] or "active") == "closed":
+            continue
+
+        formatted_accounts.append({
+            "id": account["id"],
+            "name": account["name"] or "Unknown Account",
+            "accountNo": account["account_no"] or "****",
+            "balance": float(account["balance"] or 0),
+            "availableBalance": float(account["available_balance"] or 0),
+            "accountType": account["account_type"] or "Unknown",
+            "institution": account["institution"] or "Unknown Bank",
+            "status": account["status"] or "active",
+            "lastUpdated": account["last_updated"] or ""
+        })
+
+    # Determine default account ID
+    default_account_id = None
+    if formatted_accounts:
+        # Use the first account as default
+        default_account_id = formatted_accounts[0]["id"]
+
+        # Or use the first account ID from connections if available
+        if connections_list and len(connections_list) > 0:
+            first_connection = connections_list[0]
+            if isinstance(first_connection, dict):
+                account_ids = first_connection.get("account_ids", [])
+                if account_ids and len(account_ids) > 0:
+                    default_account_id = account_ids[0]
+
+    return {
+        "accounts": formatted_accounts,
+        "defaultAccountId": default_account_id,
+        "message": "Success"
+    }
@@ -0,0 +1,118 @@
+# Benchmark: compiled KeywordMatcher vs the original per-keyword loops
+# Run from Quo/backend: python benchmarks/keyword_matching.py
+# Checks both give the same answer on every generated input, then times them
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.transactionAnalysis.deepAnalysis.categoryGrouper import (
+    CategoryGrouper, CATEGORY_MAPPINGS, classification_cache
+)
+from analysis.transactionAnalysis.deepAnalysis.subscriptionDetector import (
+    SubscriptionDetector, KNOWN_SUBSCRIPTIONS, CATEGORY_KEYWORDS, SUBSCRIPTION_KEYWORDS
+)
+
+
+# ---- The loops as they were before the matcher ----
+
+def classify_category_loop(category_name: str) -> str:
+    category_lower = category_name.lower()
+    for super_cat, rules in CATEGORY_MAPPINGS.items():
+        if category_name in rules['exact_matches']:
+            return super_cat
+    for super_cat, rules in CATEGORY_MAPPINGS.items():
+        for keyword in rules['keywords']:
+            if keyword in category_lower:
+                return super_cat
+    return 'Other Services'
+
+
+def detect_category_loop(description: str) -> str:
+    desc_lower = description.lower()
+    for service, info in KNOWN_SUBSCRIPTIONS.items():
+        if service in desc_lower:
+            return info['category']
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in desc_lower:
+                return category
+    for keyword in SUBSCRIPTION_KEYWORDS:
+        if keyword in desc_lower:
+            return 'Other Subscription'
+    return 'Other'
+
+
+# ---- Inputs ----
+
+WORDS = [
+    'woolworths', 'metro', 'petrol', 'sydney', 'pty', 'ltd', 'cafe', 'online', 'store', 'netflix.com',
+    'spotify', 'gym', 'bupa', 'transfer', 'to', 'xx1234', 'amazon', 'prime', 'video', 'uber', 'eats',
+    'council', 'rates', 'apple.com/bill', 'google', 'youtube', 'premium', 'times', 'post', 'office',
+    'hardware', 'bunnings', 'pharmacy', 'chemist', 'warehouse', 'school', 'fees', 'transport', 'nsw'
+]
+
+ANZSIC = [
+    'Supermarket and Grocery Stores', 'Cafes, Restaurants and Takeaway Food Services', 'Fuel Retailing',
+    'Health Insurance', 'Banking Services', 'Non-Depository Financing', 'Clothing Retailing',
+    'Electricity Supply', 'Telecommunications Services', 'Sports and Physical Recreation Activities',
+    'Motor Vehicle Parts Retailing', 'Pharmaceutical and Other Store-Based Retailing', 'Unknown',
+    'Other Store-Based Retailing', 'Hairdressing and Beauty Services', 'Car Parking', 'Taxi Transport'
+]
+
+
+def make_descriptions(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).upper()
+        for _ in range(n)
+    ]
+
+
+def make_categories(n: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    categories = []
+    for _ in range(n):
+        if rng.random() < 0.6:
+            categories.append(rng.choice(ANZSIC))
+        else:
+            categories.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title())
+    return categories
+
+
+def timed(fn, items, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compare(label: str, old, new, items):
+    mismatches = [item for item in items if old(item) != new(item)]
+    if mismatches:
+        raise SystemExit(f"{label}: {len(mismatches)} mismatches, e.g. {mismatches[:3]}")
+
+    old_time = timed(old, items)
+    new_time = timed(new, items)
+    print(f"{label:<30} loops {old_time * 1000:8.1f} ms   matcher {new_time * 1000:8.1f} ms   "
+          f"x{old_time / new_time:.1f}   ({len(items)} inputs, identical results)")
+
+
+if __name__ == "__main__":
+    grouper = CategoryGrouper()
+    detector = SubscriptionDetector()
+
+    # Memo cache in memory only, the benchmark doesn't touch the database
+    classification_cache.persist = False
+
+    categories = make_categories(50000)
+    compare("classify_category (matcher)", classify_category_loop, grouper._classify_uncached, categories)
+    compare("classify_category (memo)", classify_category_loop, grouper.classify_category, categories)
+    compare("_detect_category", detect_category_loop, detector._detect_category, make_descriptions(50000))
@@ -1,10 +1,300 @@
 # All database Operations
 # Has all database logic
 import os
+import queue
 import sqlite3
 import hashlib
+import threading
+import time
 from config import get_db_path # Flexibility
 
+# ==================================================== #
+#                  Connection pool                     #
+# ==================================================== #
+
+# Every function below opens a connection and closes it in finally, the pool keeps those
+# connections open and hands them out again instead of reconnecting on every call
+
+# Connections kept open per process (shared by the event loop and FastAPI's worker threads)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+
+# How long to wait for a free pooled connection before opening a temporary extra one (seconds)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "2"))
+
+# Prepared statements kept per connection, pooled connections live long enough for this to pay off
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+# Pragmas applied to every new connection
+# WAL lets readers run while a write is in progress, NORMAL sync is safe with WAL,
+# cache_size is negative = KiB of page cache per connection
+DB_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{int(os.getenv('DB_CACHE_KIB', '16000'))}",
+    f"PRAGMA mmap_size = {int(os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)))}",
+    f"PRAGMA busy_timeout = {int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))}",
+    "PRAGMA temp_store = MEMORY"
+]
+
+
+class PooledConnection:
+    # Wraps a pooled sqlite3 connection, close() hands it back to the pool instead of closing it
+    # Everything else (cursor, commit, execute...) goes straight to the real connection
+
+    def __init__(self, pool, conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+
+class ConnectionPool:
+    # Thread safe pool of sqlite3 connections for one database file
+
+    def __init__(self, db_path: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # most recently used first, its pages are still warm
+        self._lock = threading.Lock()
+        self._open = 0  # pooled connections created (idle + in use)
+
+        self.created = 0
+        self.reused = 0
+        self.waits = 0
+        self.overflow = 0
+        self.in_use = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False, a connection is only ever used by one caller at a time
+        # but that caller may be on a different thread than the one that opened it
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE)
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        try:
+            conn = self._idle.get_nowait()
+            self._count(reused=True)
+            return PooledConnection(self, conn)
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.size
+            if can_open:
+                self._open += 1
+
+        if can_open:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._open -= 1
+                raise
+            self._count(created=True)
+            return PooledConnection(self, conn)
+
+        # Pool is at its limit, wait for a connection to come back
+        with self._lock:
+            self.waits += 1
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+            self._count(reused=True)
+            return PooledConnection(self, conn)
+        except queue.Empty:
+            # Still nothing free, use a one-off connection rather than failing the request
+            conn = self._connect()
+            with self._lock:
+                self.overflow += 1
+                self.in_use += 1
+            return PooledConnection(self, _Overflow(conn))
+
+    def _count(self, created: bool = False, reused: bool = False):
+        with self._lock:
+            self.in_use += 1
+            if created:
+                self.created += 1
+            if reused:
+                self.reused += 1
+
+    def release(self, conn):
+        with self._lock:
+            self.in_use -= 1
+
+        if isinstance(conn, _Overflow):
+            conn.conn.close()
+            return
+
+        # Don't hand out a connection with a half finished transaction (error paths skip commit)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._open -= 1
+            return
+
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._open -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "database_file": self.db_path,
+                "size": self.size,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "in_use": self.in_use,
+                "created": self.created,
+                "reused": self.reused,
+                "waits": self.waits,
+                "overflow": self.overflow
+            }
+
+
+class _Overflow:
+    # One-off connection opened while the pool was exhausted, closed for real on release
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    # One pool per process, recreated if the database path changes
+    global _pool
+    db_path = get_db_path()
+    if _pool is None or _pool.db_path != db_path:
+        with _pool_lock:
+            if _pool is None or _pool.db_path != db_path:
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(db_path)
+    return _pool
+
+
+def close_pool():
+    # Called on shutdown
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
+def get_pool_stats() -> dict:
+    return get_pool().stats()
+
+
+# ==================================================== #
+#                  User record cache                   #
+# ==================================================== #
+
+# get_user_by_id runs for verify_token and every analysis endpoint, a dashboard load asks for the
+# same user several times a second. Records are cached per user id for a few seconds and dropped
+# as soon as the user's Basiq connection is written
+
+# Seconds a cached user record is served
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+
+# Most users kept at once (oldest entry dropped first)
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class UserRecordCache:
+    # user id -> (expires_at, record), only successful lookups are cached
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        # Bumped on every invalidate, a lookup that started before a write can't cache its old result
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(user_id) -> str:
+        # Endpoints pass the id as str, the connection functions as int
+        return str(user_id)
+
+    def get(self, user_id):
+        key = self.make_key(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry[0]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Copy so a caller changing the dict doesn't change the cached record
+            return dict(entry[1])
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, user_id, record: dict, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[self.make_key(user_id)] = (time.monotonic() + self.ttl, dict(record))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(self.make_key(user_id), None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+user_cache = UserRecordCache()
+
 def init_database():
     # Initialises db file and tables when server starts
     # call this f(x) once server startup
@@ -13,7 +303,7 @@ def init_database():
     db_dir = os.path.dirname(db_path)
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir)
-    conn = sqlite3.connect(db_path)
+    conn = get_connection()
 
     # Creates database file in case it does not exist
 
@@ -39,25 +329,189 @@ def init_database():
             user_id INTEGER NOT NULL,
             basiq_user_id TEXT,
             institution_name TEXT,
-            account_ids TEXT,
+            account_ids TEXT, -- legacy comma joined ids, replaced by basiq_account (migration 1)
             connection_status TEXT DEFAULT 'active',
             connected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id)
         )
     """)
 
+    # BASIQ TRANSACTION STORE
+    # Local copy of each user's Basiq transactions so analysis doesn't re-download the full history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            basiq_user_id TEXT NOT NULL,
+            account_id TEXT,
+            description TEXT,
+            category TEXT,
+            amount REAL NOT NULL,
+            class TEXT,
+            direction TEXT,
+            status TEXT,
+            post_date TEXT NOT NULL,
+            transaction_date TEXT
+        )
+    """)
+    # amount is signed exactly as Basiq reports it
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+        ON transactions (basiq_user_id, post_date)
+    """)
+
+    # BASIQ ACCOUNTS
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS accounts (
+            id TEXT PRIMARY KEY,
+            basiq_user_id TEXT NOT NULL,
+            name TEXT,
+            account_no TEXT,
+            balance REAL,
+            available_balance REAL,
+            account_type TEXT,
+            institution TEXT,
+            status TEXT,
+            last_updated TEXT
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_accounts_user
+        ON accounts (basiq_user_id)
+    """)
+
+    # SYNC STATE (one row per Basiq user, watermark for incremental syncs)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS basiq_sync_state (
+            basiq_user_id TEXT PRIMARY KEY,
+            last_post_date TEXT,
+            last_synced_at REAL
+        )
+    """)
+
+    # ANALYTICS SNAPSHOTS (one precomputed dashboard per Basiq user, rebuilt after each sync)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_snapshots (
+            basiq_user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL,
+            schema_version INTEGER NOT NULL,
+            built_at REAL NOT NULL,
+            data TEXT NOT NULL
+        )
+    """)
+    # version goes up by one on every rebuild, data is the JSON encoded panels
+
     conn.commit()
     # Save changes
 
+    # Schema changes on top of the tables above (tracked in PRAGMA user_version)
+    run_migrations(conn)
+
     conn.close()
     # Close connections
 
     print("database initialised")
 
 
+# ==================================================== #
+#                  Migrations                          #
+# ==================================================== #
+
+# Each migration runs once, in order, inside its own transaction
+# PRAGMA user_version holds the number of migrations applied so far
+
+def migration_basiq_connection_accounts(cursor):
+    # 1: one connection row per user, indexed by user_id, account ids in a child table
+
+    # Older code could insert a second row for the same user, keep the newest one
+    cursor.execute("""
+        DELETE FROM basiq_connection
+        WHERE id NOT IN (SELECT MAX(id) FROM basiq_connection GROUP BY user_id)
+    """)
+
+    # Serves every WHERE user_id = ? lookup and makes INSERT ... ON CONFLICT(user_id) possible
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_basiq_connection_user
+        ON basiq_connection (user_id)
+    """)
+
+    # Account ids of a connection, position keeps the order Basiq returned them in
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS basiq_account (
+            connection_id INTEGER NOT NULL,
+            account_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (connection_id, account_id),
+            FOREIGN KEY (connection_id) REFERENCES basiq_connection (id) ON DELETE CASCADE
+        )
+    """)
+
+    # Move the comma joined ids over
+    cursor.execute("SELECT id, account_ids FROM basiq_connection WHERE account_ids IS NOT NULL AND account_ids != ''")
+    rows = []
+    for connection_id, account_ids in cursor.fetchall():
+        for position, account_id in enumerate(account_ids.split(',')):
+            if account_id:
+                rows.append((connection_id, account_id, position))
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO basiq_account (connection_id, account_id, position)
+        VALUES (?, ?, ?)
+    """, rows)
+
+    cursor.execute("UPDATE basiq_connection SET account_ids = NULL")
+
+
+def migration_category_group_map(cursor):
+    # 2: learned category title -> super category assignments of the CategoryGrouper
+
+    # rules_version is a hash of the grouper's rules, rows written under older rules are ignored
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS category_group_map (
+            category_name TEXT PRIMARY KEY,
+            super_category TEXT NOT NULL,
+            rules_version TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+
+def migration_resync_normalized_categories(cursor):
+    # 3: rows stored before the shared normalizer (analysis/globals/normalizer.py) kept their old category
+    # The raw payloads aren't stored, so the watermarks are cleared and the next sync of every user
+    # refetches their whole history, the upsert then rewrites each row with the normalized fields
+    cursor.execute("UPDATE basiq_sync_state SET last_post_date = NULL, last_synced_at = NULL")
+
+
+MIGRATIONS = [
+    migration_basiq_connection_accounts,
+    migration_category_group_map,
+    migration_resync_normalized_categories
+]
+
+
+def run_migrations(conn):
+    cursor = conn.cursor()
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            cursor.execute("BEGIN")
+            migration(cursor)
+            # PRAGMA can't take a bound parameter, number is always our own int
+            cursor.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+            print(f"Applied database migration {number}: {migration.__name__}")
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Database migration {number} failed: {e}")
+            raise
+
+
 def get_connection():
-    # Connect to database
-    return sqlite3.connect(get_db_path())
+    # Pooled connection to the database, conn.close() returns it to the pool
+    return get_pool().acquire()
 
 def hash_password(password: str):
     # Convert password to hash
@@ -243,25 +697,16 @@ def update_user_basiq_id(user_id: str, basiq_user_id: str):
     cursor = conn.cursor()
     
     try:
-        # Check if user already has a Basiq connection record
-        cursor.execute("SELECT id FROM basiq_connection WHERE user_id = ?", (user_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing record
-            cursor.execute("""
-                UPDATE basiq_connection 
-                SET basiq_user_id = ? 
-                WHERE user_id = ?
-            """, (basiq_user_id, user_id))
-        else:
-            # Create new record
-            cursor.execute("""
-                INSERT INTO basiq_connection (user_id, basiq_user_id) 
-                VALUES (?, ?)
-            """, (user_id, basiq_user_id))
+        # Create the connection record or update the existing one in a single statement
+        cursor.execute("""
+            INSERT INTO basiq_connection (user_id, basiq_user_id) 
+            VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET basiq_user_id = excluded.basiq_user_id
+        """, (user_id, basiq_user_id))
         
         conn.commit()
+        # The cached record still has the old connection
+        user_cache.invalidate(user_id)
         return {"success": True}
         
     except sqlite3.Error as e:
@@ -271,6 +716,21 @@ def update_user_basiq_id(user_id: str, basiq_user_id: str):
 
 def get_user_by_id(user_id: str):
     """Get user data including Basiq user ID"""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    return load_user_by_id(user_id)
+
+def load_user_by_id(user_id: str):
+    # Cache miss path, queries the record and caches it
+    generation = user_cache.generation()
+    result = _query_user_by_id(user_id)
+    if "error" not in result:
+        user_cache.put(user_id, result, generation)
+    return result
+
+def _query_user_by_id(user_id: str):
+    # users + basiq_connection lookup behind the user cache
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -310,30 +770,35 @@ def save_basiq_connection(user_id: int, basiq_user_id: str, institution_name: st
     cursor = conn.cursor()
     
     try:
-        # Convert account_ids list to string for storage
-        account_ids_str = ','.join(account_ids) if account_ids else ''
+        # Create or refresh the user's connection (one row per user, see migration 1)
+        cursor.execute("""
+            INSERT INTO basiq_connection 
+            (user_id, basiq_user_id, institution_name, connection_status) 
+            VALUES (?, ?, ?, 'active')
+            ON CONFLICT(user_id) DO UPDATE SET
+                basiq_user_id = excluded.basiq_user_id,
+                institution_name = excluded.institution_name,
+                connection_status = 'active',
+                connected_at = CURRENT_TIMESTAMP
+        """, (user_id, basiq_user_id, institution_name))
         
-        # Check if connection already exists
         cursor.execute("SELECT id FROM basiq_connection WHERE user_id = ?", (user_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing connection
-            cursor.execute("""
-                UPDATE basiq_connection 
-                SET basiq_user_id = ?, institution_name = ?, account_ids = ?, 
-                    connection_status = 'active', connected_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            """, (basiq_user_id, institution_name, account_ids_str, user_id))
-        else:
-            # Create new connection
-            cursor.execute("""
-                INSERT INTO basiq_connection 
-                (user_id, basiq_user_id, institution_name, account_ids, connection_status) 
-                VALUES (?, ?, ?, ?, 'active')
-            """, (user_id, basiq_user_id, institution_name, account_ids_str))
+        connection_id = cursor.fetchone()[0]
+        
+        # Replace the connection's account ids
+        cursor.execute("DELETE FROM basiq_account WHERE connection_id = ?", (connection_id,))
+        cursor.executemany("""
+            INSERT OR IGNORE INTO basiq_account (connection_id, account_id, position)
+            VALUES (?, ?, ?)
+        """, [(connection_id, account_id, position) for position, account_id in enumerate(account_ids or []) if account_id])
+        
+        # A new bank connection can bring history older than our sync watermark,
+        # so the next sync for this user starts from scratch
+        cursor.execute("DELETE FROM basiq_sync_state WHERE basiq_user_id = ?", (basiq_user_id,))
         
         conn.commit()
+        # The cached record still has the old connection
+        user_cache.invalidate(user_id)
         return {"success": True}
         
     except sqlite3.Error as e:
@@ -348,27 +813,31 @@ def get_user_basiq_connections(user_id: int):
     cursor = conn.cursor()
     
     try:
+        # One row per (connection, account), accounts in their saved order
         cursor.execute("""
-            SELECT basiq_user_id, institution_name, account_ids, 
-                   connection_status, connected_at
-            FROM basiq_connection 
-            WHERE user_id = ? AND connection_status = 'active'
+            SELECT bc.id, bc.basiq_user_id, bc.institution_name, 
+                   bc.connection_status, bc.connected_at, ba.account_id
+            FROM basiq_connection bc
+            LEFT JOIN basiq_account ba ON ba.connection_id = bc.id
+            WHERE bc.user_id = ? AND bc.connection_status = 'active'
+            ORDER BY bc.id, ba.position
         """, (user_id,))
         
-        connections = cursor.fetchall()
-        
-        connection_list = []
-        for conn_data in connections:
-            account_ids = conn_data[2].split(',') if conn_data[2] else []
-            connection_list.append({
-                "basiq_user_id": conn_data[0],
-                "institution_name": conn_data[1],
-                "account_ids": account_ids,
-                "connection_status": conn_data[3],
-                "connected_at": conn_data[4]
-            })
+        connections = {}
+        for conn_data in cursor.fetchall():
+            connection = connections.get(conn_data[0])
+            if connection is None:
+                connection = connections[conn_data[0]] = {
+                    "basiq_user_id": conn_data[1],
+                    "institution_name": conn_data[2],
+                    "account_ids": [],
+                    "connection_status": conn_data[3],
+                    "connected_at": conn_data[4]
+                }
+            if conn_data[5] is not None:
+                connection["account_ids"].append(conn_data[5])
         
-        return {"connections": connection_list}
+        return {"connections": list(connections.values())}
         
     except sqlite3.Error as e:
         return {"error": f"Database error: {e}"}
@@ -398,3 +867,298 @@ def has_basiq_user(user_id: int):
         conn.close()
 
 
+# ==================================================== #
+#              Transaction Store Functions             #
+# ==================================================== #
+
+def upsert_transactions(basiq_user_id: str, transactions: list):
+    # Bulk insert/update of synced Basiq transactions, keyed by the Basiq transaction id
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.executemany("""
+            INSERT INTO transactions 
+            (id, basiq_user_id, account_id, description, category, amount, 
+             class, direction, status, post_date, transaction_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                account_id = excluded.account_id,
+                description = excluded.description,
+                category = excluded.category,
+                amount = excluded.amount,
+                class = excluded.class,
+                direction = excluded.direction,
+                status = excluded.status,
+                post_date = excluded.post_date,
+                transaction_date = excluded.transaction_date
+        """, [
+            (tx["id"], basiq_user_id, tx.get("account_id"), tx.get("description"), tx.get("category"),
+             tx["amount"], tx.get("class"), tx.get("direction"), tx.get("status"),
+             tx["post_date"], tx.get("transaction_date"))
+            for tx in transactions
+        ])
+        
+        conn.commit()
+        return {"success": True, "count": len(transactions)}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def get_transactions(basiq_user_id: str, exclude_classes: list = None):
+    # All stored transactions for a Basiq user, newest first (same order Basiq returns them)
+    # exclude_classes lets callers drop e.g. transfers or loan repayments in SQL
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        query = """
+            SELECT id, account_id, description, category, amount, class, 
+                   direction, status, post_date, transaction_date
+            FROM transactions 
+            WHERE basiq_user_id = ?
+        """
+        params = [basiq_user_id]
+        
+        if exclude_classes:
+            placeholders = ", ".join("?" for _ in exclude_classes)
+            query += f" AND (class IS NULL OR class NOT IN ({placeholders}))"
+            params.extend(exclude_classes)
+        
+        query += " ORDER BY post_date DESC"
+        cursor.execute(query, params)
+        
+        transaction_list = []
+        for row in cursor.fetchall():
+            transaction_list.append({
+                "id": row[0],
+                "account_id": row[1],
+                "description": row[2],
+                "category": row[3],
+                "amount": row[4],
+                "class": row[5],
+                "direction": row[6],
+                "status": row[7],
+                "post_date": row[8],
+                "transaction_date": row[9]
+            })
+        
+        return {"transactions": transaction_list}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def upsert_accounts(basiq_user_id: str, accounts: list):
+    # Stores the latest snapshot of a user's Basiq accounts
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.executemany("""
+            INSERT INTO accounts 
+            (id, basiq_user_id, name, account_no, balance, available_balance, 
+             account_type, institution, status, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                name = excluded.name,
+                account_no = excluded.account_no,
+                balance = excluded.balance,
+                available_balance = excluded.available_balance,
+                account_type = excluded.account_type,
+                institution = excluded.institution,
+                status = excluded.status,
+                last_updated = excluded.last_updated
+        """, [
+            (acc["id"], basiq_user_id, acc.get("name"), acc.get("account_no"), acc.get("balance"),
+             acc.get("available_balance"), acc.get("account_type"), acc.get("institution"),
+             acc.get("status"), acc.get("last_updated"))
+            for acc in accounts
+        ])
+        
+        conn.commit()
+        return {"success": True, "count": len(accounts)}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def get_accounts(basiq_user_id: str):
+    # Stored Basiq accounts for a user
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT id, name, account_no, balance, available_balance, 
+                   account_type, institution, status, last_updated
+            FROM accounts 
+            WHERE basiq_user_id = ?
+        """, (basiq_user_id,))
+        
+        account_list = []
+        for row in cursor.fetchall():
+            account_list.append({
+                "id": row[0],
+                "name": row[1],
+                "account_no": row[2],
+                "balance": row[3],
+                "available_balance": row[4],
+                "account_type": row[5],
+                "institution": row[6],
+                "status": row[7],
+                "last_updated": row[8]
+            })
+        
+        return {"accounts": account_list}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def get_sync_state(basiq_user_id: str):
+    # Watermark of the last successful sync (None values if the user was never synced)
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT last_post_date, last_synced_at 
+            FROM basiq_sync_state WHERE basiq_user_id = ?
+        """, (basiq_user_id,))
+        
+        result = cursor.fetchone()
+        return {
+            "last_post_date": result[0] if result else None,
+            "last_synced_at": result[1] if result else None
+        }
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def update_sync_state(basiq_user_id: str, last_synced_at: float):
+    # Records a finished sync, the post date watermark is taken from the stored rows
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO basiq_sync_state (basiq_user_id, last_post_date, last_synced_at)
+            VALUES (?, (SELECT MAX(post_date) FROM transactions WHERE basiq_user_id = ?), ?)
+            ON CONFLICT(basiq_user_id) DO UPDATE SET
+                last_post_date = excluded.last_post_date,
+                last_synced_at = excluded.last_synced_at
+        """, (basiq_user_id, basiq_user_id, last_synced_at))
+        
+        conn.commit()
+        return {"success": True}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def save_analytics_snapshot(basiq_user_id: str, schema_version: int, built_at: float, data: str):
+    # Stores a freshly built snapshot, version is bumped from the previous one
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            INSERT INTO analytics_snapshots (basiq_user_id, version, schema_version, built_at, data)
+            VALUES (?, 1, ?, ?, ?)
+            ON CONFLICT(basiq_user_id) DO UPDATE SET
+                version = analytics_snapshots.version + 1,
+                schema_version = excluded.schema_version,
+                built_at = excluded.built_at,
+                data = excluded.data
+        """, (basiq_user_id, schema_version, built_at, data))
+        
+        cursor.execute("SELECT version FROM analytics_snapshots WHERE basiq_user_id = ?", (basiq_user_id,))
+        version = cursor.fetchone()[0]
+        
+        conn.commit()
+        return {"success": True, "version": version}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def get_analytics_snapshot(basiq_user_id: str):
+    # Latest snapshot of a Basiq user, snapshot is None if none was built yet
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT version, schema_version, built_at, data
+            FROM analytics_snapshots WHERE basiq_user_id = ?
+        """, (basiq_user_id,))
+        
+        result = cursor.fetchone()
+        if not result:
+            return {"snapshot": None}
+        
+        return {
+            "snapshot": {
+                "version": result[0],
+                "schema_version": result[1],
+                "built_at": result[2],
+                "data": result[3]
+            }
+        }
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def get_category_group_map(rules_version: str):
+    # Stored category -> super category assignments made under the given rules
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT category_name, super_category
+            FROM category_group_map WHERE rules_version = ?
+        """, (rules_version,))
+        
+        return {"mappings": dict(cursor.fetchall())}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
+
+def save_category_group_map(rules_version: str, mappings: dict):
+    # Upserts category -> super category assignments in one transaction
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        updated_at = time.time()
+        cursor.executemany("""
+            INSERT INTO category_group_map (category_name, super_category, rules_version, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(category_name) DO UPDATE SET
+                super_category = excluded.super_category,
+                rules_version = excluded.rules_version,
+                updated_at = excluded.updated_at
+        """, [(name, super_cat, rules_version, updated_at) for name, super_cat in mappings.items()])
+        
+        conn.commit()
+        return {"success": True, "saved": len(mappings)}
+        
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {e}"}
+    finally:
+        conn.close()
@@ -0,0 +1,108 @@
+# Async access to database.py for the FastAPI handlers
+# The sqlite3 calls in database.py block, calling them straight from an async def endpoint stalls
+# the event loop for every query. Here each function runs on a small dedicated DB thread pool instead
+# and is awaited, the functions keep the same names, arguments and {"error": ...} results
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import database
+
+# DB worker threads, matching the connection pool so a worker never waits for a connection
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(database.DB_POOL_SIZE)))
+
+# Calls allowed to queue up for the workers at once, the rest wait on the event loop
+DB_MAX_PENDING = int(os.getenv("DB_MAX_PENDING", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="quo-db")
+_semaphore = None
+
+_stats = {"calls": 0, "waited": 0, "in_flight": 0}
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Created on first use so it belongs to the running event loop
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(DB_MAX_PENDING)
+    return _semaphore
+
+
+async def run(fn, *args, **kwargs):
+    # Runs any blocking database function on the DB threads
+    semaphore = _get_semaphore()
+    _stats["calls"] += 1
+    if semaphore.locked():
+        _stats["waited"] += 1
+
+    async with semaphore:
+        _stats["in_flight"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+        finally:
+            _stats["in_flight"] -= 1
+
+
+def _wrap(fn):
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+
+
+def stats() -> dict:
+    return {
+        "workers": DB_EXECUTOR_WORKERS,
+        "max_pending": DB_MAX_PENDING,
+        **_stats
+    }
+
+
+# ==================================================== #
+#                  Async versions                      #
+# ==================================================== #
+
+# Users
+create_user = _wrap(database.create_user)
+verify_user = _wrap(database.verify_user)
+get_all_users = _wrap(database.get_all_users)
+get_database_stats = _wrap(database.get_database_stats)
+
+
+async def get_user_by_id(user_id: str):
+    # Cached records are returned straight away, only misses go to the DB threads
+    cached = database.user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    return await run(database.load_user_by_id, user_id)
+
+
+# Basiq connections
+update_user_basiq_id = _wrap(database.update_user_basiq_id)
+save_basiq_connection = _wrap(database.save_basiq_connection)
+get_user_basiq_connections = _wrap(database.get_user_basiq_connections)
+has_basiq_user = _wrap(database.has_basiq_user)
+
+# Transaction store
+upsert_transactions = _wrap(database.upsert_transactions)
+get_transactions = _wrap(database.get_transactions)
+upsert_accounts = _wrap(database.upsert_accounts)
+get_accounts = _wrap(database.get_accounts)
+get_sync_state = _wrap(database.get_sync_state)
+update_sync_state = _wrap(database.update_sync_state)
+
+# Analytics snapshots
+save_analytics_snapshot = _wrap(database.save_analytics_snapshot)
+get_analytics_snapshot = _wrap(database.get_analytics_snapshot)
+
+# Category group map
+get_category_group_map = _wrap(database.get_category_group_map)
+save_category_group_map = _wrap(database.save_category_group_map)
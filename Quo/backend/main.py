@@ -16,23 +16,36 @@ from typing import Optional
 
 
 # analysis imports
-from analysis.globals.users import User, UserManager
+from analysis.globals.users import User, UserManager, user_flight
+from analysis.globals.transaction_sync import sync_user_data, sync_flight, get_account_name, add_sync_listener
+from analysis.globals.analytics_snapshot import get_snapshot_panel, on_demand_meta, schedule_snapshot, snapshot_flight
+from analysis.transactionAnalysis.dashboard import build_dashboard, DEFAULT_PANELS
+from analysis.transactionAnalysis.panels import (
+    spending_by_category, enhanced_spending_by_category, grouped_spending_by_period,
+    spending_trends, savings_opportunities, recent_payments, connection_list, accounts_overview
+)
+from analysis.globals.transaction_cache import transaction_cache
+from analysis.transactionAnalysis.deepAnalysis.categoryGrouper import classification_cache
+from analysis.globals.basiq_async import AsyncBasiqAPI
+from analysis.globals.basiq_transport import basiq_transport, async_basiq_transport
 # from analysis.transactionAnalysis.graphs import Graphs
 from analysis.globals.transactions import *
+from analysis.globals.normalizer import SPECIAL_CATEGORIES
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import hashlib
+import asyncio
 
 
 # Basiq Token Gen
-import requests
 import base64
 import os
 
 # Import modules from other files
 import config
 import database
-from models import SignupRequest, LoginRequest, BasiqConnectionReq, BasiqTokenRequest, BasiqTokenResponse
+import database_async
+from models import SignupRequest, LoginRequest, BasiqConnectionReq, BasiqTokenRequest, BasiqTokenResponse, DashboardRequest
 
 # Quo initialisation
 app = FastAPI(title=config.API_TITLE, version=config.API_VERSION) # Better than hardcoding, incase future edits refer to config.py
@@ -55,15 +68,39 @@ app.add_middleware(
 #                  Startup Quo                         #
 # ==================================================== #
 
+# Background task writing learned category assignments (see ClassificationCache)
+category_map_task = None
+
 @app.on_event("startup")
-def startup():
+async def startup():
     # When server initialises
+    global category_map_task
     
     print("Financial thingy working..")
 
     database.init_database() # referencing a method from database
     # Creates database tables
 
+    # Rebuild the analytics snapshot after every successful sync
+    add_sync_listener(schedule_snapshot)
+
+    # Category -> super category map learned by earlier runs, then persisted in the background
+    await classification_cache.load()
+    category_map_task = asyncio.create_task(classification_cache.flush_periodically())
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Release pooled Basiq connections
+    basiq_transport.close()
+    await async_basiq_transport.close()
+    # Write the last learned category assignments
+    if category_map_task is not None:
+        category_map_task.cancel()
+    await classification_cache.flush()
+    # Stop the DB threads, then close pooled SQLite connections
+    database_async.shutdown()
+    database.close_pool()
+
 # ==================================================== #
 #                  Auth Endpoints                      #
 # ==================================================== #
@@ -85,7 +122,7 @@ async def signup(user_data: SignupRequest): # user data is auto validated by Sig
     # Auto validated via SignupRequest model 
     # print(f"Signup lodged: {user_data.email}") # since we look at data via email we print just this
 
-    result = database.create_user(
+    result = await database_async.create_user(
           user_data.email,
           user_data.password,
           user_data.firstName,
@@ -138,52 +175,20 @@ async def create_basiq_user(email: str, firstName: str, lastName: str):
     if not basiq_api_key:
         raise Exception("Basiq API key not configured")
     
-    # Use the same format as your working code
-    auth_string = basiq_api_key
-       
-    # First get a SERVER_ACCESS token - COPY YOUR WORKING HEADERS
-    token_response = requests.post(
-        "https://au-api.basiq.io/token",
-        headers={
-            "accept": "application/json",
-            "content-type": "application/x-www-form-urlencoded",  # CHANGE THIS!
-            "Authorization": f"Basic {auth_string}",
-            "basiq-version": "3.0"  # ADD THIS!
-        },
-        data={  # CHANGE FROM json= TO data=
-            "scope": "SERVER_ACCESS"
-        }
-    )
-    
-    if token_response.status_code != 200:
-        print(f"❌ Server token error in main function of basiq account creation")
-        raise Exception("Failed to get Basiq server token")
-    
-    server_token = token_response.json()["access_token"]
-    print(f"✅ Got server token")
-    
-    # Now create the Basiq user
-    user_response = requests.post(
-        "https://au-api.basiq.io/users",
-        headers={
-            "accept": "application/json",
-            "content-type": "application/json",
-            "authorization": f"Bearer {server_token}",
-            "basiq-version": "3.0"  # ADD THIS HERE TOO
-        },
-        json={
-            "email": email,
-            "firstName": firstName,
-            "lastName": lastName
-        }
-    )
+    # Token + user creation both go through the async client
+    basiq_api = AsyncBasiqAPI(basiq_api_key)
+    basiq_user = await basiq_api.create_account({
+        "email": email,
+        "firstName": firstName,
+        "lastName": lastName
+    })
     
-    if user_response.status_code != 201:
+    if not basiq_user:
         print(f"❌ User creation error in main")
         raise Exception(f"Failed to create Basiq user")
     
     print(f"✅ Created Basiq user successfully")
-    return user_response.json()# Login endpoint
+    return basiq_user# Login endpoint
 
 @app.post("/api/auth/login")
 async def login(credentials: LoginRequest): # credentials is auto validated by LoginRequest method in model
@@ -191,7 +196,7 @@ async def login(credentials: LoginRequest): # credentials is auto validated by L
     print(f"login lodged")
 
     # call DB functions
-    result = database.verify_user(credentials.email, credentials.password) # Checks if the email/pass fits
+    result = await database_async.verify_user(credentials.email, credentials.password) # Checks if the email/pass fits
 
     if "error" in result:
         # wrong password or user not found
@@ -239,7 +244,7 @@ async def verify_token(authorization: Optional[str] = Header(None)):
         user_id = token.replace("jwt_token_", "")
         
         # Get user data from database using the existing function
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -269,13 +274,41 @@ async def verify_token(authorization: Optional[str] = Header(None)):
 
 @app.get("/api/debug/users")
 async def get_all_users():
-    result = database.get_all_users()
+    result = await database_async.get_all_users()
     
     return {
         "user total": result["total"],
         "users": result["users"]
     }
 
+@app.get("/api/debug/transaction-cache")
+async def get_transaction_cache_stats():
+    # Hit/miss counters for the in-memory transaction cache + how many fetches were coalesced
+    return {
+        "cache": transaction_cache.stats(),
+        "single_flight": [user_flight.stats(), sync_flight.stats(), snapshot_flight.stats()]
+    }
+
+@app.get("/api/debug/db-pool")
+async def get_db_pool_stats():
+    # SQLite connection pool usage (reused vs newly opened connections, waits, overflow), DB thread queue
+    # and user record cache hit rate
+    return {
+        "pool": database.get_pool_stats(),
+        "executor": database_async.stats(),
+        "user_cache": database.user_cache.stats()
+    }
+
+@app.get("/api/debug/category-cache")
+async def get_category_cache_stats():
+    # CategoryGrouper memo cache (hit rate, assignments loaded from / saved to category_group_map)
+    # and the description tokenizer cache
+    from analysis.globals import description_tokenizer
+    return {
+        "classification": classification_cache.stats(),
+        "descriptions": description_tokenizer.cache_stats()
+    }
+
 @app.get("/api/debug/test-category-grouper")
 async def test_category_grouper():
     """Test the CategoryGrouper with sample data"""
@@ -333,7 +366,7 @@ async def save_basiq_connection(connection_data: BasiqConnectionReq):
         print(f"Saving connection for user")
         
         # Save to database
-        result = database.save_basiq_connection(
+        result = await database_async.save_basiq_connection(
             user_id=int(connection_data.userId),
             basiq_user_id=connection_data.basiqUserId,
             institution_name=connection_data.institutionName,
@@ -342,6 +375,9 @@ async def save_basiq_connection(connection_data: BasiqConnectionReq):
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
+
+        # New accounts mean new transactions, drop anything cached for this Basiq user
+        transaction_cache.invalidate(connection_data.basiqUserId)
         
         return {
             "success": True,
@@ -359,7 +395,7 @@ async def check_user_connection(user_id: str):
 
     try:
         # Get user connections from database
-        connections = database.get_user_basiq_connections(int(user_id))
+        connections = await database_async.get_user_basiq_connections(int(user_id))
         
         if "error" in connections:
             raise HTTPException(status_code=500, detail=connections["error"])
@@ -385,7 +421,7 @@ async def get_client_token(userId: str):
     # Get client token
     # Important in order to operate Basiq Functions
     try:
-        user_data = database.get_user_by_id(userId)
+        user_data = await database_async.get_user_by_id(userId)
 
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -398,13 +434,11 @@ async def get_client_token(userId: str):
         basiq_api_key = os.getenv("BASIQ_API_KEY")
         auth_string = basiq_api_key
                 
-        response = requests.post(
-            "https://au-api.basiq.io/token",
+        response = await async_basiq_transport.post(
+            "/token",
             headers={
-                "accept": "application/json",
                 "content-type": "application/x-www-form-urlencoded",
-                "Authorization": f"Basic {auth_string}",
-                "basiq-version": "3.0"
+                "Authorization": f"Basic {auth_string}"
             },
             data={  # CHANGE FROM json= TO data=
                 "scope": "CLIENT_ACCESS",
@@ -444,7 +478,7 @@ async def getSpendByCat(user_id: str):
 
         # user creation
     try:
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
 
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -465,8 +499,13 @@ async def getSpendByCat(user_id: str):
 
         print(f"DEBUG Getting spending analysis for user {user_id} with Basiq ID: {basiq_user_id}")
 
+        # Precomputed after the last sync (see analytics_snapshot.py)
+        cached = await get_snapshot_panel(basiq_user_id, "spendingByCategory")
+        if cached:
+            return {**cached["data"], "snapshot": cached["meta"]}
+
         # Create user instance with the Basiq user ID
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
      
         
         # Check if transactions were fetched successfully
@@ -482,43 +521,8 @@ async def getSpendByCat(user_id: str):
                 "message": "Unable to fetch transaction data"
             }
 
-        # Get all transactions
-        allTransactions = user.get_transaction_group()
-        
-        # Get category totals
-        categories, amounts = allTransactions.category_total_points()
-        
-        print(f"Categories found: {len(categories)}")
-
-        # Handle empty data
-        if not categories or not amounts:
-            return {
-                "categories": [],
-                "total": 0,
-                "highest": {
-                    "category": "No data",
-                    "amount": 0
-                },
-                "message": "No transactions found"
-            }
-        
-        # Calculate totals
-        total = sum(amounts)
-        max_amount = max(amounts)
-        max_index = amounts.index(max_amount)
-        
         # Return format for recharts
-        return {
-            "categories": [
-                {"name": cat, "amount": amt}
-                for cat, amt in zip(categories, amounts)
-            ],
-            "total": total,
-            "highest": {
-                "category": categories[max_index],
-                "amount": max_amount
-            }
-        }
+        return {**await asyncio.to_thread(spending_by_category, user), "snapshot": on_demand_meta()}
         
     except HTTPException:
         raise
@@ -537,7 +541,7 @@ async def getEnhancedSpendByCat(user_id: str):
     # Get Enhanced spending analysis with subcats for unknown or broad categories
     try:
         # Get user's Basiq ID
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -552,8 +556,12 @@ async def getEnhancedSpendByCat(user_id: str):
                 "message": "No bank account connected"
             }
         
+        cached = await get_snapshot_panel(basiq_user_id, "enhancedSpendingByCategory")
+        if cached:
+            return {**cached["data"], "snapshot": cached["meta"]}
+        
         # Create user instance
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
         if isinstance(user.transactions, str):
             return {
@@ -563,49 +571,8 @@ async def getEnhancedSpendByCat(user_id: str):
                 "message": "Unable to fetch transaction data"
             }
         
-        # Standard analysis
-        allTransactions = user.get_transaction_group()
-        categories, amounts = allTransactions.category_total_points()
-        
-        # Enhanced analysis
-        from analysis.transactionAnalysis.deepAnalysis.categoryAssigner import EnhancedTransactionAnalysis
-        enhanced_analyzer = EnhancedTransactionAnalysis(user.transactions)
-        enhanced_data = enhanced_analyzer.get_enhanced_category_analysis()
-        
-        # Format response
-        total = sum(amounts) if amounts else 0
-        
-        # Prepare enhanced categories (ones that have subcategories)
-        enhanced_categories = {}
-        for cat, data in enhanced_data.items():
-            if data['subcategories']:
-                enhanced_categories[cat] = {
-                    'total': data['total'],
-                    'count': data['transaction_count'],
-                    'subcategories': [
-                        {
-                            'name': subcat,
-                            'amount': subdata['amount'],
-                            'count': subdata['count']
-                        }
-                        for subcat, subdata in data['subcategories'].items()
-                    ]
-                }
-       
-
-
-        return {
-            "categories": [
-                {"name": cat, "amount": amt}
-                for cat, amt in zip(categories, amounts)
-            ],
-            "enhanced_categories": enhanced_categories,
-            "total": total,
-            "insights": {
-                "unknown_ratio": enhanced_data.get('Unknown', {}).get('total', 0) / total if total > 0 else 0,
-                "categories_with_subcategories": list(enhanced_categories.keys())
-            }
-        }
+        # CPU work (keyword index on first use), kept off the event loop
+        return {**await asyncio.to_thread(enhanced_spending_by_category, user), "snapshot": on_demand_meta()}
         
     except Exception as e:
         print("Operation failed")
@@ -622,15 +589,13 @@ async def getGroupedSpendingByPeriod(
     account_id: Optional[str] = None
 ):
     # Spending analysis via filtering by period 
-
-    from datetime import datetime, timedelta
     try:
         print(f"=== Starting grouped spending analysis ===")
         print(f"User ID: {user_id}, Period: {period}, Group: {group_categories}, Account: {account_id}")
         
         
         # Get user's Basiq ID
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -650,158 +615,22 @@ async def getGroupedSpendingByPeriod(
         
         if account_id:
             print(f"=====CHECKING ACCOUNT ID ==== {account_id}")
-            # Fetch account-specific transactions from Basiq
-            
-            # Get Basiq token
-            basiq_api_key = os.getenv("BASIQ_API_KEY")
-            auth_string = basiq_api_key
-            
-            token_response = requests.post(
-                "https://au-api.basiq.io/token",
-                headers={
-                    "accept": "application/json",
-                    "content-type": "application/x-www-form-urlencoded",
-                    "Authorization": f"Basic {auth_string}",
-                    "basiq-version": "3.0"
-                },
-                data={"scope": "SERVER_ACCESS"}
-            )
-            
-            if token_response.status_code != 200:
-                raise HTTPException(status_code=500, detail="Failed to get Basiq token")
-            
-            server_token = token_response.json()["access_token"]
+            # Served from the user's already synced transactions through the per-account index, no Basiq calls
+            # (transfers/loans kept, every debit from the account counts like the old Basiq account filter)
+            user = await User.acreate(basiq_user_id, filter_transfer=False, filter_loans=False)
             
-            # Fetch transactions for specific account
-            transactions_url = f"https://au-api.basiq.io/users/{basiq_user_id}/transactions?filter=account.id.eq('{account_id}')"
-            
-            print(f"=== BASIQ API REQUEST ===")
-            print(f"URL: {transactions_url}")
-            print(f"Requesting transactions for account: {account_id}")
-            
-            transactions_response = requests.get(
-                transactions_url,
-                headers={
-                    "Authorization": f"Bearer {server_token}",
-                    "Accept": "application/json",
-                    "basiq-version": "3.0"
-                }
-            )
-            
-            if transactions_response.status_code != 200:
-                print(f"❌ Basiq API Error: {transactions_response.status_code}")
-                print(f"Response: {transactions_response.text}")
-                raise HTTPException(status_code=500, detail="Failed to fetch transactions")
-            
-            transactions_data = transactions_response.json()
-            raw_transactions = transactions_data.get("data", [])
-
-            print(f"=== ACCOUNT FILTERING DEBUG ===")
-            print(f"Account ID: {account_id}")
-            print(f"Total raw transactions from Basiq: {len(raw_transactions)}")
-            
-            # Check if transactions are actually from the requested account
-            account_ids_in_response = set()
-            for tx in raw_transactions[:10]:  # Check first 10 transactions
-                tx_account_id = tx.get("account", {}).get("id") if isinstance(tx.get("account"), dict) else tx.get("account")
-                account_ids_in_response.add(tx_account_id)
-                print(f"  Transaction: {tx.get('description', 'N/A')[:30]} | Account: {tx_account_id}")
-
-            if len(account_ids_in_response) == 1 and account_id in account_ids_in_response:
-                print(f"✅ Filter working correctly - all transactions from account: {account_id}")
-            else:
-                print(f"⚠️ Filter issue - found accounts: {account_ids_in_response}")
-            print(f"==============================")
-
-            print(f"Unique account IDs in response: {account_ids_in_response}")
-            print(f"All transactions from requested account? {account_ids_in_response == {account_id}}")
-            print(f"==============================")
-
-            # Convert Basiq transactions to Transaction objects
-            from analysis.globals.transactions import Transaction 
-
-            filtered_transactions = []
-            for tx in raw_transactions:
-
-                # Only include expenses
-                if float(tx.get("amount", 0)) < 0:
-                    tx_date_str = tx.get("postDate") or tx.get("transactionDate")
-                    
-                    # Fix: Check if it's already a datetime object
-                    if isinstance(tx_date_str, datetime):
-                        tx_date = tx_date_str
-                    elif isinstance(tx_date_str, str):
-                        tx_date = datetime.strptime(tx_date_str[:10], "%Y-%m-%d")
-                    else:
-                        tx_date = datetime.now()
-                    
-                    # Apply period filter
-                    now = datetime.now()
-                    include_tx = False
-                    
-                    if period == "month":
-                        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                        include_tx = tx_date >= start_of_month
-                    elif period == "year":
-                        start_of_year = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-                        include_tx = tx_date >= start_of_year
-                    else:  # "all"
-                        include_tx = True
-                    
-                    if include_tx:
-                        # Extract category
-                        category_name = "Uncategorized"
-                        
-                        # Try enriched data
-                        enrich = tx.get("enrich", {})
-                        if enrich:
-                            category_data = enrich.get("category", {})
-                            if category_data:
-                                anzsic = category_data.get("anzsic", {})
-                                if anzsic:
-                                    class_data = anzsic.get("class", {})
-                                    if class_data:
-                                        category_name = class_data.get("title", "Uncategorized")
-                        
-                        # Fallback to subClass
-                        if category_name == "Uncategorized":
-                            subclass_obj = tx.get("subClass", {})
-                            if subclass_obj:
-                                category_name = subclass_obj.get("title", "Uncategorized")
-                        
-                        trans_obj = Transaction(
-                            description=tx.get("description", ""),  # First parameter
-                            category=category_name,                  # Second parameter
-                            date=tx_date.strftime('%Y-%m-%dT%H:%M:%SZ'),  # Third parameter (as string!)
-                            amount=abs(float(tx.get("amount", 0))),  # Fourth parameter
-                            mode="expense"                           # Fifth parameter
-                        )
-
-                        filtered_transactions.append(trans_obj)
-            print(f"Filtered transactions (after date/expense filter): {len(filtered_transactions)}")
-            print(f"==============================")
             # Get account name
-            account_name = account_id
-            try:
-                account_response = requests.get(
-                    f"https://au-api.basiq.io/users/{basiq_user_id}/accounts/{account_id}",
-                    headers={
-                        "Authorization": f"Bearer {server_token}",
-                        "Accept": "application/json",
-                        "basiq-version": "3.0"
-                    }
-                )
-                if account_response.status_code == 200:
-                    account_data = account_response.json()
-                    account_name = account_data.get("name", account_id)
-            except:
-                pass
-            
-            period_label = f"{now.strftime('%B %Y')}" if period == "month" else str(now.year) if period == "year" else "All Time"
+            account_name = await get_account_name(basiq_user_id, account_id, default=account_id)
             
         else:
+            # The snapshot holds every period with grouped categories for all accounts
+            if group_categories:
+                cached = await get_snapshot_panel(basiq_user_id, f"groupedSpendingByPeriod:{period}")
+                if cached:
+                    return {**cached["data"], "snapshot": cached["meta"]}
+            
             # Use existing logic for all accounts
-            user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+            user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
             
             if isinstance(user.transactions, str):
                 return {
@@ -812,168 +641,17 @@ async def getGroupedSpendingByPeriod(
                     "message": "Unable to fetch transaction data"
                 }
             
-            # Filter transactions by date
-            from datetime import datetime, timedelta
-            now = datetime.now()
-            
-            if period == "month":
-                start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                filtered_transactions = [
-                    tx for tx in user.transactions 
-                    if tx.date >= start_of_month
-                ]
-                period_label = f"{now.strftime('%B %Y')}"
-            elif period == "year":
-                start_of_year = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-                filtered_transactions = [
-                    tx for tx in user.transactions 
-                    if tx.date >= start_of_year
-                ]
-                period_label = f"{now.year}"
-            else:  # "all"
-                filtered_transactions = user.transactions
-                period_label = "All Time"
-            
             account_name = None
         
-        print(f"Filtered transactions count: {len(filtered_transactions)}")
-        
-        # Standard analysis
-        from analysis.globals.transactions import AllTransactions
-        filtered_group = AllTransactions(filtered_transactions)
-        categories, amounts = filtered_group.category_total_points()
-        
-        print(f"Categories found: {len(categories)}")
-        
-        if not categories:
-            return {
-                "categories": [],
-                "grouped_categories": [],
-                "enhanced_categories": {},
-                "total": 0,
-                "period": period,
-                "period_label": period_label,
-                "num_transactions": 0,
-                "account_name": account_name,
-                "message": f"No transactions found for {period_label}"
-            }
-        
-        # Prepare category data
-        category_data = [
-            {"name": cat, "amount": amt}
-            for cat, amt in zip(categories, amounts)
-        ]
-        
-        total_spending = sum(amounts)
-        
-        # Group categories if requested
-        grouped_categories_array = []
-        category_insights = {}
-        
-        if group_categories:
-            try:
-                print("Attempting to group categories...")
-                
-                from analysis.transactionAnalysis.deepAnalysis.categoryGrouper import CategoryGrouper
-                grouper = CategoryGrouper()
-                
-                print(f"Grouping {len(category_data)} categories")
-                grouped_dict = grouper.group_categories(category_data)
-                
-                print(f"group_categories returned type: {type(grouped_dict)}")
-                print(f"Grouped into {len(grouped_dict)} groups")
-                
-                # Convert to array format
-                for group_name, group_info in grouped_dict.items():
-                    grouped_categories_array.append({
-                        'name': group_name,
-                        'total': group_info['total'],
-                        'percentage': group_info['percentage'],
-                        'categories': group_info['subcategories']
-                    })
-                
-                # Sort by total descending
-                grouped_categories_array.sort(key=lambda x: x['total'], reverse=True)
-                
-                # Get category insights
-                if hasattr(grouper, 'get_category_insights'):
-                    category_insights = grouper.get_category_insights(grouped_dict)
-                
-                print(f"Created {len(grouped_categories_array)} groups")
-                
-            except Exception as e:
-                print("Operation failed")
-                import traceback
-                traceback.print_exc()
-                grouped_categories_array = []
-        
-        # Enhanced analysis for unknown categories
-        enhanced_categories = {}
-        try:
-            from analysis.transactionAnalysis.deepAnalysis.categoryAssigner import EnhancedTransactionAnalysis
-            
-            special_categories = ['unknown', 'uncategorized', 'other', 'no category']
-            
-            for cat_name in categories:
-                if cat_name.lower() in special_categories:
-                    cat_transactions = [
-                        tx for tx in filtered_transactions 
-                        if tx.category.lower() == cat_name.lower()
-                    ]
-                    
-                    if cat_transactions:
-                        analyzer = EnhancedTransactionAnalysis(cat_transactions)
-                        unknown_analysis = analyzer.analyze_unknown_transactions()
-                        
-                        subcats = []
-                        for subcat_name, subcat_txs in unknown_analysis.items():
-                            subcats.append({
-                                'name': subcat_name,
-                                'amount': sum(tx.amount for tx in subcat_txs),
-                                'count': len(subcat_txs)
-                            })
-                        
-                        if subcats:
-                            enhanced_categories[cat_name] = {
-                                'total': sum(tx.amount for tx in cat_transactions),
-                                'count': len(cat_transactions),
-                                'subcategories': sorted(subcats, key=lambda x: x['amount'], reverse=True)
-                            }
-        except Exception as e:
-            print("Operation failed")
-        
-        # Calculate monthly stats
-        from collections import defaultdict
-        monthly_totals = defaultdict(float)
-        for tx in filtered_transactions:
-            month_key = tx.date.strftime('%Y-%m')
-            monthly_totals[month_key] += tx.amount
-        
-        num_months = len(monthly_totals) if monthly_totals else 1
-        avg_monthly = total_spending / num_months if num_months > 0 else 0
-        
-        response = {
-            "categories": category_data,
-            "grouped_categories": grouped_categories_array,
-            "enhanced_categories": enhanced_categories,
-            "total": total_spending,
-            "period": period,
-            "period_label": period_label,
-            "average_monthly": avg_monthly,
-            "num_transactions": len(filtered_transactions),
-            "account_name": account_name,
-            "insights": {
-                "category_insights": category_insights,
-                "num_months": num_months,
-                "total_categories": len(categories),
-                "total_groups": len(grouped_categories_array),
-                "has_uncategorized": any(cat.lower() in ['unknown', 'uncategorized', 'other', 'no category'] for cat in categories) if categories else False
-            }
-        }
+        # CPU work (keyword index on first use), kept off the event loop
+        response = await asyncio.to_thread(
+            grouped_spending_by_period,
+            user, period, group_categories, account_id=account_id, account_name=account_name
+        )
         
-        print(f"=== Returning response with {len(grouped_categories_array)} groups ===")
+        print(f"=== Returning response with {len(response['grouped_categories'])} groups ===")
         
-        return response
+        return {**response, "snapshot": on_demand_meta()}
         
     except HTTPException:
         raise
@@ -994,7 +672,7 @@ async def get_user_accounts(user_id: str):
         print(f"Fetching accounts for user: {user_id}")
         
         # First, get user data to ensure user exists and has basiq_user_id
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         # Handle different return types from database
         if user_data is None:
@@ -1023,64 +701,14 @@ async def get_user_accounts(user_id: str):
             }
         
         # Get user's connections from database
-        connections_result = database.get_user_basiq_connections(int(user_id))
-        
-        # Handle different return types for connections
-        if connections_result is None:
-            connections_list = []
-        elif isinstance(connections_result, str):
-            print(f"Connections query returned string: {connections_result}")
-            connections_list = []
-        elif isinstance(connections_result, dict):
-            if "error" in connections_result:
-                print(f"Connections error: {connections_result['error']}")
-                connections_list = []
-            else:
-                connections_list = connections_result.get("connections", [])
-        else:
-            connections_list = []
-        
-        # Get Basiq API key
-        basiq_api_key = os.getenv("BASIQ_API_KEY")
-        if not basiq_api_key:
-            raise HTTPException(status_code=500, detail="Basiq API key not configured")
-            
-        auth_string = basiq_api_key
-        
-        # Get server token
-        print("Getting Basiq server token...")
-        token_response = requests.post(
-            "https://au-api.basiq.io/token",
-            headers={
-                "accept": "application/json",
-                "content-type": "application/x-www-form-urlencoded",
-                "Authorization": f"Basic {auth_string}",
-                "basiq-version": "3.0"
-            },
-            data={"scope": "SERVER_ACCESS"}
-        )
-        
-        if token_response.status_code != 200:
-            print(f"Failed to get Basiq token: {token_response.status_code} - {token_response.text}")
-            raise HTTPException(status_code=500, detail="Failed to get Basiq token")
-        
-        server_token = token_response.json()["access_token"]
+        connections_list = connection_list(await database_async.get_user_basiq_connections(int(user_id)))
         
-        # Get accounts from Basiq
-        print(f"Fetching accounts from Basiq for user: {basiq_user_id}")
-        accounts_response = requests.get(
-            f"https://au-api.basiq.io/users/{basiq_user_id}/accounts",
-            headers={
-                "accept": "application/json",
-                "authorization": f"Bearer {server_token}",
-                "basiq-version": "3.0"
-            }
-        )
+        # Accounts are read from the local store, the incremental sync refreshes them from Basiq
+        await sync_user_data(basiq_user_id)
+        stored_accounts = await database_async.get_accounts(basiq_user_id)
         
-        print(f"Basiq accounts response status: {accounts_response.status_code}")
-        
-        if accounts_response.status_code != 200:
-            print(f"Failed to fetch accounts from Basiq: {accounts_response.text}")
+        if "error" in stored_accounts:
+            print(f"Account store error: {stored_accounts['error']}")
             # Return empty accounts list instead of failing
             return {
                 "accounts": [],
@@ -1088,91 +716,14 @@ async def get_user_accounts(user_id: str):
                 "defaultAccountId": None
             }
         
-        # Parse the response
-        try:
-            accounts_data = accounts_response.json()
-            print(f"Basiq response structure: {accounts_data.keys() if isinstance(accounts_data, dict) else type(accounts_data)}")
-            
-            # Basiq API typically returns data in a 'data' field
-            accounts_list = accounts_data.get("data", [])
-            print(f"Found {len(accounts_list)} accounts from Basiq")
-            
-            # Debug: print first account structure if available
-            if accounts_list and len(accounts_list) > 0:
-                print(f"First account keys: {accounts_list[0].keys()}")
-                
-        except Exception as e:
-            print("Operation failed")
-            print(f"Raw response: {accounts_response.text[:500]}")  # First 500 chars
-            return {
-                "accounts": [],
-                "message": "Error parsing account data",
-                "defaultAccountId": None
-            }
+        print(f"Found {len(stored_accounts['accounts'])} stored accounts")
         
         # Format accounts for frontend
-        formatted_accounts = []
-        for account in accounts_list:
-            try:
-                # Debug the account structure
-                print(f"Processing account: {account.get('id', 'no-id')}")
-                
-                # Extract account details - adjust field names based on actual Basiq response
-                account_data = {
-                    "id": account.get("id", ""),
-                    "name": account.get("name") or account.get("accountName") or "Unknown Account",
-                    "accountNo": account.get("accountNo") or account.get("accountNumber") or "****",
-                    "balance": float(account.get("balance", 0)),
-                    "availableBalance": float(account.get("availableBalance") or account.get("available", 0)),
-                    "accountType": account.get("type") or account.get("class", {}).get("type", "Unknown"),
-                    "institution": "",  # Will be filled below
-                    "status": account.get("status", "active"),
-                    "lastUpdated": account.get("lastUpdated") or account.get("lastRefreshed", "")
-                }
-                
-                # Handle institution data (might be nested)
-                institution = account.get("institution", {})
-                if isinstance(institution, dict):
-                    account_data["institution"] = institution.get("name", "Unknown Bank")
-                elif isinstance(institution, str):
-                    account_data["institution"] = institution
-                else:
-                    # Try to get institution from connection
-                    connection = account.get("connection", {})
-                    if isinstance(connection, dict):
-                        inst = connection.get("institution", {})
-                        if isinstance(inst, dict):
-                            account_data["institution"] = inst.get("name", "Unknown Bank")
-                
-                # Only include active accounts or if status field doesn't exist
-                if account.get("status", "active") != "closed":
-                    formatted_accounts.append(account_data)
-                    
-            except Exception as e:
-                print("Operation failed")
-                continue
-        
-        # Determine default account ID
-        default_account_id = None
-        if formatted_accounts:
-            # Use the first account as default
-            default_account_id = formatted_accounts[0]["id"]
-            
-            # Or use the first account ID from connections if available
-            if connections_list and len(connections_list) > 0:
-                first_connection = connections_list[0]
-                if isinstance(first_connection, dict):
-                    account_ids = first_connection.get("account_ids", [])
-                    if account_ids and len(account_ids) > 0:
-                        default_account_id = account_ids[0]
+        response = accounts_overview(stored_accounts["accounts"], connections_list)
         
-        print(f"Returning {len(formatted_accounts)} accounts")
+        print(f"Returning {len(response['accounts'])} accounts")
         
-        return {
-            "accounts": formatted_accounts,
-            "defaultAccountId": default_account_id,
-            "message": "Success"
-        }
+        return response
         
     except HTTPException:
         raise
@@ -1196,7 +747,7 @@ async def getSpendingByAccount(
     try:
         print(f"Getting spending for user {user_id}, account {account_id}, period {period}")
         
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1210,105 +761,21 @@ async def getSpendingByAccount(
                 "message": "No bank account connected"
             }
         
-        # Get Basiq token
-        basiq_api_key = os.getenv("BASIQ_API_KEY")
-        auth_string = basiq_api_key
-        
-        token_response = requests.post(
-            "https://au-api.basiq.io/token",
-            headers={
-                "accept": "application/json",
-                "content-type": "application/x-www-form-urlencoded",
-                "Authorization": f"Basic {auth_string}",
-                "basiq-version": "3.0"
-            },
-            data={"scope": "SERVER_ACCESS"}
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to get Basiq token")
-        
-        server_token = token_response.json()["access_token"]
-        
-        # Set up the request URL
-        transactions_url = f"https://au-api.basiq.io/users/{basiq_user_id}/transactions"
-        
-        # Simple query parameters
-        params = {
-            "limit": 500,
-            "account.id": account_id  # Direct parameter instead of filter
-        }
-        
-        print(f"Fetching from: {transactions_url}")
-        print(f"With params: {params}")
-        
-        # Make the request
-        transactions_response = requests.get(
-            transactions_url,
-            headers={
-                "Authorization": f"Bearer {server_token}",
-                "Accept": "application/json",
-                "basiq-version": "3.0"
-            },
-            params=params
-        )
-        
-        print(f"Basiq response status: {transactions_response.status_code}")
-        
-        if transactions_response.status_code != 200:
-            print(f"Basiq error: {transactions_response.text}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Failed to fetch transactions: {transactions_response.status_code}"
-            )
+        # Same period boundaries as the other endpoints ("month", "year", anything else is all time)
+        from datetime import datetime
+        now = datetime.now()
+        start_date = period_start(period, now)
         
-        transactions_data = transactions_response.json()
-        raw_transactions = transactions_data.get("data", [])
+        print(f"Reading transactions for account {account_id} from {start_date}")
         
-        print(f"Fetched {len(raw_transactions)} transactions for account {account_id}")
+        # Served from the already synced transactions through the per-account index, no Basiq calls
+        user = await User.acreate(basiq_user_id, filter_transfer=False, filter_loans=False)
+        account_transactions = user.get_transaction_group().account(account_id).slice(start_date)
+        account_name = await get_account_name(basiq_user_id, account_id, default=account_id)
         
-        # Apply date filtering in Python since we're not using the filter parameter
-        from datetime import datetime, timedelta
-        now = datetime.now()
+        print(f"Found {len(account_transactions)} transactions for account {account_id}")
         
-        if period != "all":
-            if period == "month":
-                start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            elif period == "year":
-                start_date = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            else:
-                start_date = now - timedelta(days=365)
-            
-            # Filter transactions by date
-            filtered_transactions = []
-            for tx in raw_transactions:
-                tx_date_str = tx.get("postDate") or tx.get("transactionDate")
-                if tx_date_str:
-                    tx_date = datetime.strptime(tx_date_str[:10], "%Y-%m-%d")
-                    if tx_date >= start_date:
-                        filtered_transactions.append(tx)
-            
-            raw_transactions = filtered_transactions
-            print(f"After date filtering: {len(raw_transactions)} transactions")
-        
-        if not raw_transactions:
-            # Get account name for better UX
-            account_name = "Unknown Account"
-            try:
-                account_response = requests.get(
-                    f"https://au-api.basiq.io/users/{basiq_user_id}/accounts/{account_id}",
-                    headers={
-                        "Authorization": f"Bearer {server_token}",
-                        "Accept": "application/json",
-                        "basiq-version": "3.0"
-                    }
-                )
-                if account_response.status_code == 200:
-                    account_data = account_response.json()
-                    account_name = account_data.get("name", "Unknown Account")
-            except:
-                pass
-            
+        if not account_transactions:
             return {
                 "categories": [],
                 "total": 0,
@@ -1323,70 +790,13 @@ async def getSpendingByAccount(
         # Process transactions by category
         from collections import defaultdict
         category_totals = defaultdict(float)
+        expenses_by_category = defaultdict(list)
         
-        # Debug: Let's see what the transaction data looks like
-        if raw_transactions:
-           # print(f"Sample transaction: {raw_transactions[0]}")
-            print(f"Category field: {raw_transactions[0].get('category')}")
-            print(f"SubClass field: {raw_transactions[0].get('subClass')}")
-        
-        for tx in raw_transactions:
-            # Get transaction details
-            amount = abs(float(tx.get("amount", 0)))
-            
-            # Get category - use the enriched data first
-            category_name = "Uncategorized"  # Default
-            
-            # Try enriched category data first (most accurate)
-            enrich = tx.get("enrich", {})
-            if enrich and isinstance(enrich, dict):
-                category_data = enrich.get("category", {})
-                if category_data and isinstance(category_data, dict):
-                    anzsic = category_data.get("anzsic", {})
-                    if anzsic and isinstance(anzsic, dict):
-                        # Try class first, then group, then subdivision
-                        class_data = anzsic.get("class", {})
-                        if class_data and isinstance(class_data, dict):
-                            category_name = class_data.get("title", "Uncategorized")
-                        elif anzsic.get("group", {}).get("title"):
-                            category_name = anzsic["group"]["title"]
-                        elif anzsic.get("subdivision", {}).get("title"):
-                            category_name = anzsic["subdivision"]["title"]
-            
-            # If still uncategorized, try subClass
-            if category_name == "Uncategorized":
-                subclass_obj = tx.get("subClass", {})
-                if subclass_obj and isinstance(subclass_obj, dict):
-                    title = subclass_obj.get("title")
-                    if title:
-                        category_name = title
-            
-            # If still uncategorized, use class field with better names
-            if category_name == "Uncategorized":
-                class_name = tx.get("class")
-                if class_name:
-                    # Convert class to readable format
-                    category_map = {
-                        "bank-fee": "Bank Fees",
-                        "payment": "General Payment",
-                        "cash-withdrawal": "Cash Withdrawal",
-                        "transfer": "Transfers",
-                        "loan-interest": "Loan Interest",
-                        "refund": "Refunds",
-                        "direct-credit": "Income",
-                        "interest": "Interest Earned",
-                        "loan-repayment": "Loan Repayment"
-                    }
-                    category_name = category_map.get(class_name, class_name.replace("-", " ").title())
-            
-            # Debug first few transactions
-            if len(category_totals) < 5:
-               # print(f"TX: {tx.get('description')[:40]} | Cat: {category_name} | Amount: ${amount}")
-                pass
-            
-            # Only count expenses (negative amounts)
-            if float(tx.get("amount", 0)) < 0:
-                category_totals[category_name] += amount
+        for tx in account_transactions:
+            # Only count expenses (money out)
+            if tx.direction == "debit":
+                category_totals[tx.category] += tx.amount
+                expenses_by_category[tx.category].append(tx)
         
         # Convert to expected format
         category_data = [
@@ -1397,6 +807,8 @@ async def getSpendingByAccount(
         # Sort by amount
         category_data.sort(key=lambda x: x["amount"], reverse=True)
         
+        total_amount = sum(cat["amount"] for cat in category_data)
+        
         # Apply grouping
         grouped_categories = {}
         grouped_categories_array = []  # Array format for frontend
@@ -1405,7 +817,8 @@ async def getSpendingByAccount(
             from analysis.transactionAnalysis.deepAnalysis.categoryGrouper import CategoryGrouper
             grouper = CategoryGrouper()
             if category_data:  # Only group if we have categories
-                grouped_categories = grouper.group_categories(category_data)
+                # Rule matching over every category, run in a worker thread like the other panels
+                grouped_categories = await asyncio.to_thread(grouper.group_categories, category_data)
                 # print(f"Grouped categories result: {grouped_categories}")
                 
                 # Convert grouped categories to array format for frontend
@@ -1433,75 +846,22 @@ async def getSpendingByAccount(
         # Enhanced analysis for unknown categories
         enhanced_categories = {}
         try:
-            # Convert Basiq transactions to Transaction objects for analysis
-            from analysis.globals.transactions import Transaction
+            # The expenses were already grouped by category above
             from analysis.transactionAnalysis.deepAnalysis.categoryAssigner import EnhancedTransactionAnalysis
             
-            special_categories = ['unknown', 'uncategorized', 'other', 'no category']
+            # Index of just this account's rows, built in a worker thread on first use
+            # and kept by the cached account group for later requests
+            keyword_index = None
+            if any(cat_name.lower() in SPECIAL_CATEGORIES for cat_name in expenses_by_category):
+                keyword_index = await asyncio.to_thread(
+                    lambda: user.get_transaction_group().account(account_id).keyword_index
+                )
             
-            for cat_name in category_totals.keys():
-                if cat_name.lower() in special_categories:
-                    # Get all transactions for this category
-                    cat_transactions = []
-                    for tx in raw_transactions:
-                        # Extract category using the same logic
-                        tx_cat = "Uncategorized"
-                        
-                        # Try enriched category data first
-                        enrich = tx.get("enrich", {})
-                        if enrich and isinstance(enrich, dict):
-                            category_data = enrich.get("category", {})
-                            if category_data and isinstance(category_data, dict):
-                                anzsic = category_data.get("anzsic", {})
-                                if anzsic and isinstance(anzsic, dict):
-                                    class_data = anzsic.get("class", {})
-                                    if class_data and isinstance(class_data, dict):
-                                        tx_cat = class_data.get("title", "Uncategorized")
-                                    elif anzsic.get("group", {}).get("title"):
-                                        tx_cat = anzsic["group"]["title"]
-                        
-                        # Try subClass if still uncategorized
-                        if tx_cat == "Uncategorized":
-                            subclass_obj = tx.get("subClass", {})
-                            if subclass_obj and isinstance(subclass_obj, dict):
-                                title = subclass_obj.get("title")
-                                if title:
-                                    tx_cat = title
-                        
-                        # Use class field as last resort
-                        if tx_cat == "Uncategorized":
-                            class_name = tx.get("class")
-                            if class_name:
-                                category_map = {
-                                    "bank-fee": "Bank Fees",
-                                    "payment": "General Payment",
-                                    "cash-withdrawal": "Cash Withdrawal",
-                                    "transfer": "Transfers",
-                                    "loan-interest": "Loan Interest",
-                                    "refund": "Refunds",
-                                    "direct-credit": "Income",
-                                    "interest": "Interest Earned",
-                                    "loan-repayment": "Loan Repayment"
-                                }
-                                tx_cat = category_map.get(class_name, class_name.replace("-", " ").title())
-                        
-                        if tx_cat.lower() == cat_name.lower() and float(tx.get("amount", 0)) < 0:
-                            # Convert to Transaction object
-                            tx_date_str = tx.get("postDate") or tx.get("transactionDate")
-                            tx_date = datetime.strptime(tx_date_str[:10], "%Y-%m-%d") if tx_date_str else datetime.now()
-                            
-                            trans_obj = Transaction(
-                                amount=abs(float(tx.get("amount", 0))),
-                                date=tx_date,
-                                description=tx.get("description", ""),
-                                category=tx_cat,
-                                mode="expense"  # Add the required mode parameter
-                            )
-                            cat_transactions.append(trans_obj)
-                    
+            for cat_name, cat_transactions in expenses_by_category.items():
+                if cat_name.lower() in SPECIAL_CATEGORIES:
                     if cat_transactions:
-                        analyzer = EnhancedTransactionAnalysis(cat_transactions)
-                        unknown_analysis = analyzer.analyze_unknown_transactions()
+                        analyzer = EnhancedTransactionAnalysis(cat_transactions, keyword_index=keyword_index)
+                        unknown_analysis = await asyncio.to_thread(analyzer.analyze_unknown_transactions)
                         
                         subcats = []
                         for subcat_name, subcat_txs in unknown_analysis.items():
@@ -1520,36 +880,13 @@ async def getSpendingByAccount(
         except Exception as e:
             print("Operation failed")
         
-        total_amount = sum(cat["amount"] for cat in category_data)
-        
-        # Get account name
-        account_name = account_id  # Default
-        try:
-            account_response = requests.get(
-                f"https://au-api.basiq.io/users/{basiq_user_id}/accounts/{account_id}",
-                headers={
-                    "Authorization": f"Bearer {server_token}",
-                    "Accept": "application/json",
-                    "basiq-version": "3.0"
-                }
-            )
-            if account_response.status_code == 200:
-                account_data = account_response.json()
-                account_name = account_data.get("name", account_id)
-        except:
-            pass
-        
         # Calculate monthly average
         num_months = 1
         if period == "year":
             num_months = 12
-        elif period == "all" and raw_transactions:
+        elif period == "all" and account_transactions:
             # Calculate based on date range
-            dates = []
-            for tx in raw_transactions:
-                tx_date_str = tx.get("postDate") or tx.get("transactionDate")
-                if tx_date_str:
-                    dates.append(datetime.strptime(tx_date_str[:10], "%Y-%m-%d"))
+            dates = [tx.date for tx in account_transactions]
             if dates:
                 min_date = min(dates)
                 max_date = max(dates)
@@ -1564,11 +901,11 @@ async def getSpendingByAccount(
             "total": total_amount,
             "account_id": account_id,
             "account_name": account_name,
-            "transaction_count": len(raw_transactions),
+            "transaction_count": len(account_transactions),
             "period": period,
             "period_label": f"{now.strftime('%B %Y')}" if period == "month" else str(now.year) if period == "year" else "All Time",
             "average_monthly": avg_monthly,
-            "num_transactions": len(raw_transactions),
+            "num_transactions": len(account_transactions),
             "insights": {
                 "total_categories": len(category_data),
                 "has_uncategorized": any(cat["name"].lower() in ['unknown', 'uncategorized', 'other', 'no category', 'general payment'] for cat in category_data),
@@ -1592,21 +929,14 @@ async def fallback_account_analysis(user_id: str, basiq_user_id: str, account_id
     try:
         # Use the existing analysis but note it's for all accounts
         from analysis.globals.users import User
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
         # Get all transactions
         from datetime import datetime
         now = datetime.now()
         
         # Filter by period
-        if period == "month":
-            start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            filtered_transactions = [tx for tx in user.transactions if tx.date >= start_date]
-        elif period == "year":
-            start_date = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-            filtered_transactions = [tx for tx in user.transactions if tx.date >= start_date]
-        else:
-            filtered_transactions = user.transactions
+        filtered_transactions = user.get_transaction_group().period_slice(period, now)
         
         # Analyze
         from analysis.globals.transactions import AllTransactions
@@ -1621,7 +951,7 @@ async def fallback_account_analysis(user_id: str, basiq_user_id: str, account_id
         # Group categories
         from analysis.transactionAnalysis.deepAnalysis.categoryGrouper import CategoryGrouper
         grouper = CategoryGrouper()
-        grouped_categories = grouper.group_categories(category_data) if category_data else {}
+        grouped_categories = await asyncio.to_thread(grouper.group_categories, category_data) if category_data else {}
         
         return {
             "categories": category_data,
@@ -1654,7 +984,7 @@ async def getSpendingTrends(
 ):
     """Get spending trends over time with predictive insights"""
     try:
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1664,202 +994,16 @@ async def getSpendingTrends(
         if not basiq_user_id:
             return {"error": "No bank account connected"}
         
-        # Create user instance
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
-        
-        # Get all transactions (account filtering not supported in trends yet)
-        transactions = user.transactions
-        
-        # Note: Account filtering would require fetching from Basiq API directly
-        if account_id:
-            print(f"Note: Account filtering not implemented in trends endpoint yet")
-            # For now, show all transactions with a note
-            pass
-        
-        # Group transactions by month
-        from collections import defaultdict
-        from datetime import datetime, timedelta
-        from dateutil.relativedelta import relativedelta
-        
-        monthly_data = defaultdict(lambda: defaultdict(float))
-        category_totals = defaultdict(float)
-        
-        # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - relativedelta(months=months)
-        
-        # Filter and group transactions
-        for tx in transactions:
-            if tx.date >= start_date:
-                month_key = tx.date.strftime('%Y-%m')
-                monthly_data[month_key][tx.category] += tx.amount
-                category_totals[tx.category] += tx.amount
-        
-        # Sort months chronologically
-        sorted_months = sorted(monthly_data.keys())
-        
-        # Prepare trend data
-        trends = []
-        for month in sorted_months:
-            month_total = sum(monthly_data[month].values())
-            trends.append({
-                "month": month,
-                "total": month_total,
-                "categories": dict(monthly_data[month])
-            })
-        
-        # Calculate statistics and predictions
-        if len(trends) >= 3:
-            try:
-                # Try to import numpy for predictions
-                import numpy as np
-                
-                # Simple linear regression for prediction
-                x = np.array(range(len(trends)))
-                y = np.array([t["total"] for t in trends])
-                
-                # Calculate trend line
-                A = np.vstack([x, np.ones(len(x))]).T
-                m, c = np.linalg.lstsq(A, y, rcond=None)[0]
-                
-                # Predict next month
-                next_month_prediction = m * len(trends) + c
-                
-                # Calculate volatility (standard deviation)
-                volatility = np.std(y)
-                
-                insights = {
-                    "trend": "increasing" if m > 0 else "decreasing",
-                    "average_monthly": np.mean(y),
-                    "next_month_prediction": max(0, next_month_prediction),
-                    "volatility": volatility,
-                    "volatility_rating": "high" if volatility > np.mean(y) * 0.3 else "moderate" if volatility > np.mean(y) * 0.15 else "low",
-                    "change_rate": m,
-                    "months_analyzed": len(trends)
-                }
-            except ImportError as e:
-                print("Operation failed")
-                # Fallback calculations without numpy
-                totals = [t["total"] for t in trends]
-                avg_monthly = sum(totals) / len(totals)
-                
-                # Simple trend detection
-                first_half_avg = sum(totals[:len(totals)//2]) / (len(totals)//2)
-                second_half_avg = sum(totals[len(totals)//2:]) / (len(totals) - len(totals)//2)
-                
-                insights = {
-                    "trend": "increasing" if second_half_avg > first_half_avg else "decreasing",
-                    "average_monthly": avg_monthly,
-                    "next_month_prediction": avg_monthly,  # Simple prediction
-                    "volatility": 0,
-                    "volatility_rating": "unknown",
-                    "change_rate": 0,
-                    "months_analyzed": len(trends)
-                }
-        else:
-            insights = {
-                "message": "Not enough data for trend analysis",
-                "months_analyzed": len(trends)
-            }
+        # Only the default 6 month view of all accounts is precomputed
+        if months == 6 and not account_id:
+            cached = await get_snapshot_panel(basiq_user_id, "trends")
+            if cached:
+                return {**cached["data"], "snapshot": cached["meta"]}
         
-        # Identify spending patterns
-        patterns = []
-        
-        # Seasonal patterns
-        if len(trends) >= 12:
-            try:
-                import numpy as np
-                monthly_averages = defaultdict(list)
-                for trend in trends:
-                    month_num = int(trend["month"].split("-")[1])
-                    monthly_averages[month_num].append(trend["total"])
-                
-                # Find high spending months
-                avg_by_month = {k: np.mean(v) for k, v in monthly_averages.items()}
-                overall_avg = np.mean(list(avg_by_month.values()))
-                
-                high_months = [k for k, v in avg_by_month.items() if v > overall_avg * 1.2]
-                if high_months:
-                    patterns.append({
-                        "type": "seasonal",
-                        "description": f"Higher spending typically in months: {high_months}"
-                    })
-            except ImportError:
-                # Simple seasonal detection without numpy
-                monthly_averages = defaultdict(list)
-                for trend in trends:
-                    month_num = int(trend["month"].split("-")[1])
-                    monthly_averages[month_num].append(trend["total"])
-                
-                # Calculate averages manually
-                avg_by_month = {}
-                for k, v in monthly_averages.items():
-                    avg_by_month[k] = sum(v) / len(v) if v else 0
-                
-                if avg_by_month:
-                    overall_avg = sum(avg_by_month.values()) / len(avg_by_month)
-                    high_months = [k for k, v in avg_by_month.items() if v > overall_avg * 1.2]
-                    if high_months:
-                        patterns.append({
-                            "type": "seasonal",
-                            "description": f"Higher spending typically in months: {high_months}"
-                        })
-        
-        # Category growth patterns
-        category_trends = defaultdict(list)
-        for trend in trends:
-            for cat, amount in trend["categories"].items():
-                category_trends[cat].append(amount)
-        
-        growing_categories = []
-        declining_categories = []
-        
-        for cat, amounts in category_trends.items():
-            if len(amounts) >= 3:
-                try:
-                    import numpy as np
-                    x = np.array(range(len(amounts)))
-                    y = np.array(amounts)
-                    A = np.vstack([x, np.ones(len(x))]).T
-                    m, _ = np.linalg.lstsq(A, y, rcond=None)[0]
-                    
-                    if m > np.mean(amounts) * 0.1:  # Growing by more than 10% of average
-                        growing_categories.append(cat)
-                    elif m < -np.mean(amounts) * 0.1:  # Declining by more than 10% of average
-                        declining_categories.append(cat)
-                except ImportError:
-                    # Simple trend detection without numpy
-                    first_half = sum(amounts[:len(amounts)//2]) / (len(amounts)//2) if len(amounts)//2 > 0 else 0
-                    second_half = sum(amounts[len(amounts)//2:]) / (len(amounts) - len(amounts)//2) if (len(amounts) - len(amounts)//2) > 0 else 0
-                    avg = sum(amounts) / len(amounts) if amounts else 0
-                    
-                    if second_half > first_half * 1.1:  # Growing
-                        growing_categories.append(cat)
-                    elif second_half < first_half * 0.9:  # Declining
-                        declining_categories.append(cat)
-        
-        if growing_categories:
-            patterns.append({
-                "type": "category_growth",
-                "description": f"Increasing spending in: {', '.join(growing_categories[:3])}"
-            })
-        
-        if declining_categories:
-            patterns.append({
-                "type": "category_decline",
-                "description": f"Decreasing spending in: {', '.join(declining_categories[:3])}"
-            })
+        # Create user instance
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
-        return {
-            "trends": trends,
-            "insights": insights,
-            "patterns": patterns,
-            "top_categories": sorted(
-                [(cat, total) for cat, total in category_totals.items()],
-                key=lambda x: x[1],
-                reverse=True
-            )[:5]
-        }
+        return {**await asyncio.to_thread(spending_trends, user, months, account_id=account_id), "snapshot": on_demand_meta()}
         
     except Exception as e:
         print("Operation failed")
@@ -1871,7 +1015,7 @@ async def getSpendingTrends(
 async def getSavingsOpportunities(user_id: str, account_id: Optional[str] = None):
     """Identify potential savings opportunities using AI analysis"""
     try:
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -1881,173 +1025,19 @@ async def getSavingsOpportunities(user_id: str, account_id: Optional[str] = None
         if not basiq_user_id:
             return {"opportunities": [], "total_savings_potential": 0}
         
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
-        
-        # Get all transactions (account filtering not supported at transaction level)
-        transactions = user.transactions
-        
-        # Note: If account_id is provided, we can't filter at this level
-        # since the Transaction class doesn't have account_id
-        if account_id:
-            print(f"Note: Account-specific filtering not available for savings analysis")
-        
-        # Analyze last 3 months
-        from datetime import datetime, timedelta
-        from collections import defaultdict
-        
-        three_months_ago = datetime.now() - timedelta(days=90)
-        recent_transactions = [tx for tx in transactions if tx.date >= three_months_ago]
-        
-        # Group by category and merchant
-        category_spending = defaultdict(float)
-        merchant_frequency = defaultdict(int)
-        merchant_spending = defaultdict(float)
-        subscription_candidates = []
-        
-        for tx in recent_transactions:
-            category_spending[tx.category] += tx.amount
-            merchant_frequency[tx.description] += 1
-            merchant_spending[tx.description] += tx.amount
-            
-            # Identify potential subscriptions (recurring similar amounts)
-            if 5 <= tx.amount <= 200:  # Typical subscription range
-                subscription_candidates.append(tx)
-        
-        opportunities = []
-        
-        # 1. High frequency small purchases (e.g., daily coffee)
-        for merchant, frequency in merchant_frequency.items():
-            if frequency >= 10:  # More than 3 times a month average
-                avg_amount = merchant_spending[merchant] / frequency
-                if 2 <= avg_amount <= 20:  # Small purchase range
-                    monthly_total = (frequency / 3) * avg_amount  # Average per month
-                    opportunities.append({
-                        "type": "high_frequency",
-                        "category": "Reduce frequent small purchases",
-                        "description": f"You spend ~${monthly_total:.0f}/month at {merchant[:30]}",
-                        "suggestion": f"Reducing by 50% could save ${monthly_total * 0.5:.0f}/month",
-                        "savings_potential": monthly_total * 0.5,
-                        "difficulty": "easy"
-                    })
-        
-        # 2. Category overspending (compared to typical budgets)
-        typical_budget_percentages = {
-            "eating out": 0.10,  # 10% of income
-            "entertainment": 0.05,
-            "shopping": 0.10,
-            "groceries": 0.15
-        }
-        
-        total_spending = sum(category_spending.values())
-        
-        for category, amount in category_spending.items():
-            percentage = amount / total_spending if total_spending > 0 else 0
-            
-            for budget_cat, typical_pct in typical_budget_percentages.items():
-                if budget_cat.lower() in category.lower() and percentage > typical_pct * 1.5:
-                    monthly_amount = amount / 3  # 3 months of data
-                    excess = monthly_amount - (total_spending / 3 * typical_pct)
-                    
-                    opportunities.append({
-                        "type": "category_overspending",
-                        "category": f"Reduce {category} spending",
-                        "description": f"You spend {percentage*100:.0f}% on {category} (typical: {typical_pct*100:.0f}%)",
-                        "suggestion": f"Reducing to typical levels could save ${excess:.0f}/month",
-                        "savings_potential": excess,
-                        "difficulty": "moderate"
-                    })
-        
-        # 3. Subscription audit
-        from analysis.transactionAnalysis.deepAnalysis.subscriptionDetector import SubscriptionDetector
-        detector = SubscriptionDetector()
-        detected_subscriptions = detector.detect_subscriptions(subscription_candidates)
-        
-        for sub in detected_subscriptions:
-            opportunities.append({
-                "type": "subscription",
-                "category": "Review subscriptions",
-                "description": f"Recurring charge: {sub['name']} - ${sub['amount']}/month",
-                "suggestion": "Consider if this subscription is still needed",
-                "savings_potential": sub['amount'],
-                "difficulty": "easy"
-            })
-        
-        # 4. Peak spending times
-        time_based_spending = defaultdict(float)
-        for tx in recent_transactions:
-            hour = tx.date.hour
-            if 22 <= hour or hour <= 4:  # Late night
-                time_based_spending["late_night"] += tx.amount
-            elif 6 <= hour <= 9:  # Morning
-                time_based_spending["morning"] += tx.amount
-        
-        if time_based_spending["late_night"] > total_spending * 0.1:
-            monthly_late_night = time_based_spending["late_night"] / 3
-            opportunities.append({
-                "type": "behavioral",
-                "category": "Reduce late-night spending",
-                "description": f"You spend ${monthly_late_night:.0f}/month between 10pm-4am",
-                "suggestion": "Late-night purchases are often impulsive",
-                "savings_potential": monthly_late_night * 0.7,
-                "difficulty": "moderate"
-            })
-        
-        # Sort by savings potential
-        opportunities.sort(key=lambda x: x["savings_potential"], reverse=True)
-        
-        # Calculate total potential savings
-        total_savings = sum(opp["savings_potential"] for opp in opportunities[:5])  # Top 5 realistic
-        
-        # Add note about account filtering if requested
-        response = {
-            "opportunities": opportunities[:10],  # Return top 10
-            "total_savings_potential": total_savings,
-            "analysis_period": "Last 3 months",
-            "personalized_tips": generate_savings_tips(opportunities)
-        }
+        if not account_id:
+            cached = await get_snapshot_panel(basiq_user_id, "savingsOpportunities")
+            if cached:
+                return {**cached["data"], "snapshot": cached["meta"]}
         
-        if account_id:
-            response["note"] = "Analysis includes all accounts (account-specific filtering not available)"
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
-        return response
+        return {**await asyncio.to_thread(savings_opportunities, user, account_id=account_id), "snapshot": on_demand_meta()}
         
     except Exception as e:
         print("Operation failed")
         raise HTTPException(status_code=500, detail=str(e))
 
-def generate_savings_tips(opportunities):
-    """Generate personalized tips based on identified opportunities"""
-    tips = []
-    
-    # Check what types of opportunities were found
-    opportunity_types = {opp["type"] for opp in opportunities}
-    
-    if "high_frequency" in opportunity_types:
-        tips.append({
-            "title": "Batch your purchases",
-            "description": "Consider buying in bulk or preparing at home to reduce frequent small purchases"
-        })
-    
-    if "subscription" in opportunity_types:
-        tips.append({
-            "title": "Subscription audit",
-            "description": "Set a monthly reminder to review all subscriptions and cancel unused ones"
-        })
-    
-    if "category_overspending" in opportunity_types:
-        tips.append({
-            "title": "Set category budgets",
-            "description": "Use the 50/30/20 rule: 50% needs, 30% wants, 20% savings"
-        })
-    
-    if "behavioral" in opportunity_types:
-        tips.append({
-            "title": "Implement cooling-off periods",
-            "description": "Wait 24 hours before making non-essential purchases"
-        })
-    
-    return tips
-
 
 # Add this new model class to your models.py
 from pydantic import BaseModel
@@ -2065,7 +1055,7 @@ async def generateBudgetRecommendations(
 ):
     """Generate AI-powered budget recommendations based on spending patterns"""
     try:
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -2075,17 +1065,16 @@ async def generateBudgetRecommendations(
         if not basiq_user_id:
             return {"error": "No bank account connected"}
         
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
         # Get last 3 months of spending
         from datetime import datetime, timedelta
         three_months_ago = datetime.now() - timedelta(days=90)
         
-        transactions = user.transactions
+        transaction_group = user.get_transaction_group()
         if account_id:
-            transactions = [tx for tx in transactions if tx.account_id == account_id]
-        
-        recent_transactions = [tx for tx in transactions if tx.date >= three_months_ago]
+            transaction_group = transaction_group.account(account_id)
+        recent_transactions = transaction_group.slice(three_months_ago)
         
         # Analyze spending patterns
         from collections import defaultdict
@@ -2213,7 +1202,7 @@ async def getRecentPayments(
     try:
         print(f"Getting recent payments for user: {user_id}")
         
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -2223,72 +1212,56 @@ async def getRecentPayments(
         if not basiq_user_id:
             return {"transactions": [], "message": "No bank account connected"}
         
-        from analysis.globals.users import User
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+        # The snapshot keeps every payment, only the limit is applied here
+        cached = await get_snapshot_panel(basiq_user_id, "recentPayments")
+        if cached:
+            return {
+                "transactions": cached["data"]["transactions"][:limit],
+                "total": cached["data"]["total"],
+                "snapshot": cached["meta"]
+            }
+        
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
         if isinstance(user.transactions, str):
             print(f"Error getting transactions: {user.transactions}")
             return {"transactions": [], "message": "Unable to fetch transactions"}
         
-        print(f"Total transactions: {len(user.transactions)}")
-        
-        payment_transactions = []
+        return {**await asyncio.to_thread(recent_payments, user, limit), "snapshot": on_demand_meta()}
         
-        # Categories that are likely to be product purchases
-        product_categories = [
-            'supermarket', 'grocery', 'store', 'shop', 'retail',
-            'electronics', 'clothing', 'department', 'pharmacy',
-            'hardware', 'sporting', 'recreation', 'entertainment',
-            'cafe', 'restaurant', 'takeaway', 'food', 'dining',
-            'online', 'marketplace', 'merchant'
-        ]
+    except Exception as e:
+        print("Operation failed")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/analysis/dashboard/{user_id}")
+async def getDashboard(user_id: str, request: DashboardRequest):
+    # Every requested dashboard panel in one round trip
+    # The user is resolved once and each panel is computed concurrently on the same loaded transactions
+    try:
+        user_data = await database_async.get_user_by_id(user_id)
         
-        # Keywords to exclude
-        exclude_keywords = [
-            'transfer', 'withdrawal', 'deposit', 'interest', 'fee',
-            'insurance', 'rent', 'mortgage', 'utility', 'bill'
-        ]
+        if "error" in user_data:
+            raise HTTPException(status_code=404, detail="User not found")
         
-        for tx in user.transactions:
-            # Check if it's a payment
-            if tx.mode == "payment" and 3 < tx.amount < 1000:
-                description_lower = tx.description.lower()
-                category_lower = tx.category.lower()
-                
-                # Skip if it contains exclude keywords
-                if any(keyword in description_lower for keyword in exclude_keywords):
-                    continue
-                
-                # Include if category matches product categories
-                is_product_category = any(cat in category_lower for cat in product_categories)
-                
-                # Include if it's a likely product purchase
-                if is_product_category or tx.amount < 200:  # Small amounts likely products
-                    # Generate ID
-                    tx_id = hashlib.md5(f"{tx.description}{tx.date}{tx.amount}".encode()).hexdigest()[:10]
-                    
-                    payment_transactions.append({
-                        "id": tx_id,
-                        "description": tx.description,
-                        "amount": tx.amount,
-                        "date": tx.date.strftime('%Y-%m-%d'),
-                        "category": tx.category
-                    })
-                    
-                    # Debug log for first few
-                    if len(payment_transactions) <= 5:
-                        print(f"Added: {tx.description} | ${tx.amount} | {tx.category}")
+        basiq_user_id = user_data.get("basiq_user_id")
         
-        # Sort by date (most recent first)
-        payment_transactions.sort(key=lambda x: x['date'], reverse=True)
+        panel_requests = [
+            (panel.id or panel.name, panel.name, panel.params)
+            for panel in request.panels
+        ] or [(name, name, {}) for name in DEFAULT_PANELS]
         
-        print(f"Found {len(payment_transactions)} payment transactions")
+        if not basiq_user_id:
+            return {
+                "panels": {key: {"message": "No bank account connected"} for key, _, _ in panel_requests},
+                "message": "No bank account connected"
+            }
         
-        return {
-            "transactions": payment_transactions[:limit],
-            "total": len(payment_transactions)
-        }
+        return {"panels": await build_dashboard(user_id, basiq_user_id, panel_requests)}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print("Operation failed")
         import traceback
@@ -2306,7 +1279,7 @@ async def runPriceComparison(
         from analysis.productComparison.alibaba_scraper import scrape_alibaba
         from analysis.globals.users import User
         
-        user_data = database.get_user_by_id(user_id)
+        user_data = await database_async.get_user_by_id(user_id)
         
         if "error" in user_data:
             raise HTTPException(status_code=404, detail="User not found")
@@ -2317,7 +1290,7 @@ async def runPriceComparison(
             return {"results": [], "message": "No bank account connected"}
         
         # Get user transactions
-        user = User(basiq_user_id, filter_transfer=True, filter_loans=True)
+        user = await User.acreate(basiq_user_id, filter_transfer=True, filter_loans=True)
         
         if isinstance(user.transactions, str):
             return {"results": [], "message": "Unable to fetch transactions"}
@@ -2,6 +2,7 @@
 
 
 from pydantic import BaseModel
+from typing import Optional
 from pydantic_core.core_schema import str_schema # for checking data types
 
 
@@ -83,3 +84,17 @@ class BasiqTokenResponse(BaseModel):
     expires_in: int = 3600
 
 
+
+# ==================================================== #
+#                  ANALYSIS MODELS                     #
+# ==================================================== #
+
+class DashboardPanelRequest(BaseModel):
+    # one panel of the batch dashboard endpoint
+    name: str # e.g. "groupedSpendingByPeriod", see analysis/transactionAnalysis/dashboard.py
+    params: dict = {} # same query params as the single panel endpoint
+    id: Optional[str] = None # response key, lets the same panel be asked for twice with different params
+
+class DashboardRequest(BaseModel):
+    # Empty list = every panel with its default params
+    panels: list[DashboardPanelRequest] = []